@@ -9,40 +9,61 @@ bl_info = {
     "category" : "Generic"
 }
 
+import time
+_import_start = time.perf_counter()
+
 import bpy
+import os
 
 from bpy.utils import ( register_class, unregister_class )
 from bpy.props import PointerProperty
 
 from . camera_generator import CAMGEN_OT_CreateCam
 from . camera_generator import CAMGEN_OT_CreateCalibrationPattern
+from . camera_generator import CAMGEN_OT_RefreshLensList
 from . camera_generator import CAMGEN_OT_RunTests
 from . camera_generator import CAMGEN_OT_LoadConfig
 from . camera_generator import CAMGEN_OT_SaveConfig
+from . camera_generator import CAMGEN_OT_SaveIlluminationMap
 from . camgen_panel import CAMGEN_Properties
 from . camgen_panel import CAMGEN_PT_Main
 from . camgen_panel import CAMGEN_PT_Tests
 from . import data
+from . import startup
+from . import update
+
+startup.record('import modules', _import_start)
 
-from . import test_camera_generator
+# functions releasing the caches of the addon modules, called on unregister for all modules that were used
+cache_clear_functions = (('aiming', 'clear_aim_maps'), ('catalog', 'clear_lens_index'), ('create', 'clear_surface_meshes'),
+                         ('distortion', 'clear_distortion_tables'), ('focus', 'clear_focus_curves'), ('glass', 'clear_catalog'),
+                         ('illumination', 'clear_illumination_maps'), ('io', 'clear_parsed_files'))
 
-classes = (CAMGEN_OT_CreateCam, CAMGEN_OT_CreateCalibrationPattern, CAMGEN_OT_LoadConfig, CAMGEN_OT_SaveConfig, CAMGEN_Properties, CAMGEN_PT_Main)
+classes = (CAMGEN_OT_CreateCam, CAMGEN_OT_CreateCalibrationPattern, CAMGEN_OT_RefreshLensList, CAMGEN_OT_LoadConfig, CAMGEN_OT_SaveConfig, CAMGEN_OT_SaveIlluminationMap, CAMGEN_Properties, CAMGEN_PT_Main)
 
 def register():
-    # init data
-    data.init()
+    # init data - glass data and lens listings are read on first use
+    with startup.timed('init data'):
+        data.init()
 
     # register classes
-    for cls in classes:
-        register_class(cls)
+    with startup.timed('register classes'):
+        for cls in classes:
+            register_class(cls)
 
-    # register unit tests
-    if data.debug:
-        register_class(CAMGEN_PT_Tests)
-        register_class(CAMGEN_OT_RunTests)
+        # register unit tests
+        if data.debug:
+            register_class(CAMGEN_PT_Tests)
+            register_class(CAMGEN_OT_RunTests)
 
     # create properties
-    bpy.types.Scene.camera_generator = PointerProperty(type=CAMGEN_Properties)
+    with startup.timed('create properties'):
+        bpy.types.Scene.camera_generator = PointerProperty(type=CAMGEN_Properties)
+        bpy.app.handlers.load_post.append(update.load_post)
+
+    # print the startup timing report in debug mode or if requested by the environment variable CAMGEN_STARTUP_REPORT
+    if data.debug or os.environ.get('CAMGEN_STARTUP_REPORT'):
+        print(startup.report())
 
 def unregister():
     # unregister classes
@@ -55,3 +76,11 @@ def unregister():
         unregister_class(CAMGEN_OT_RunTests)
 
     del bpy.types.Scene.camera_generator
+    if update.load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(update.load_post)
+
+    # release cached meshes, tables and catalogs - modules that were never used have nothing cached
+    for module_name, function_name in cache_clear_functions:
+        module = startup.loaded_module(module_name)
+        if module is not None:
+            getattr(module, function_name)()
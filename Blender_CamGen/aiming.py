@@ -0,0 +1,236 @@
+# ------------------------------------------------------------------------
+#    Ray aiming - launch directions of rays hitting given points of the aperture
+# ------------------------------------------------------------------------
+
+import numpy as np
+
+from collections import OrderedDict
+
+from . import data
+from . import paraxial
+from . import raytracer
+
+# maximum number of cached aim maps - the least recently used map is dropped first
+max_cached_aim_maps = 256
+# number of pupil rings of the solved reference rays and polynomial degree of the fitted pupil mapping
+aim_ring_count = 6
+aim_degree = 5
+# Newton iterations and convergence threshold relative to the aperture radius
+aim_iterations = 12
+aim_tolerance = 1e-10
+
+# cached aim maps by lens system, wavelength index, field angle, object distance and aperture size
+aim_maps = OrderedDict()
+
+# ------------------------------------------------------------------------
+#    Entrance pupil
+# ------------------------------------------------------------------------
+
+# calculates the paraxial entrance pupil, i.e. the image of the aperture seen from object space - returns the pupil
+# position on the optical axis (relative to the aperture plane) and its semi diameter
+def entrance_pupil(lens_system=None, wavelength_index=0):
+    if lens_system is None:
+        lens_system = data.lens_system
+    (a, b), _ = paraxial.stop_matrix(lens_system)[wavelength_index]
+    # rays through the pupil center reach the aperture center, parallel rays are scaled by a
+    return float(lens_system.vertex[0] + b / a), float(data.semi_aperture / abs(a))
+
+
+# ------------------------------------------------------------------------
+#    Helper functions
+# ------------------------------------------------------------------------
+
+# evaluates all monomials y^i * z^j with i + j <= degree for the given points - returns (N, terms)
+def monomials(points, degree: int):
+    y, z = points[:, 0], points[:, 1]
+    return np.column_stack([y ** i * z ** (total - i) for total in range(degree + 1) for i in range(total + 1)])
+
+# evaluates the derivatives of all monomials with respect to y and z - returns two (N, terms) arrays
+def monomial_derivatives(points, degree: int):
+    y, z = points[:, 0], points[:, 1]
+    powers = [(i, total - i) for total in range(degree + 1) for i in range(total + 1)]
+    d_y = np.column_stack([i * y ** max(i - 1, 0) * z ** j for i, j in powers])
+    d_z = np.column_stack([j * y ** i * z ** max(j - 1, 0) for i, j in powers])
+    return d_y, d_z
+
+# calculates paraxial launch slopes of rays from the object point at the given height hitting the aperture points
+def paraxial_slopes(aperture_points, object_height: float, object_distance: float, stop_matrix_row):
+    a, b = stop_matrix_row
+    scale = 1.0 / (a * object_distance + b)
+    return np.column_stack(((aperture_points[:, 0] - a * object_height) * scale, aperture_points[:, 1] * scale))
+
+# maps normalized pupil points of the unit disk into the regular aperture polygon inscribed in it (oriented like
+# raytracer.inside_aperture_polygon) - every blade sector of the disk is mapped linearly onto the triangle of its
+# polygon edge, i.e. the mapping preserves equal areas and keeps the center and the edge midpoints in place
+def polygon_pupil_points(pupil_points, blades: int, angle_deg: float):
+    pupil_points = np.asarray(pupil_points, dtype=np.float64).reshape(-1, 2)
+    sector = 2.0 * np.pi / blades
+    first_edge_normal = 0.5 * np.pi + np.radians(angle_deg) + 0.5 * sector
+    radii = np.hypot(pupil_points[:, 0], pupil_points[:, 1])
+    relative_angles = np.mod(np.arctan2(pupil_points[:, 1], pupil_points[:, 0]) - first_edge_normal + 0.5 * sector, sector) - 0.5 * sector
+    normals = np.arctan2(pupil_points[:, 1], pupil_points[:, 0]) - relative_angles
+    # distance from the edge midpoint along the edge, proportional to the angle within the sector
+    apothem = np.cos(0.5 * sector)
+    along = relative_angles / (0.5 * sector) * np.sin(0.5 * sector)
+    y = apothem * np.cos(normals) - along * np.sin(normals)
+    z = apothem * np.sin(normals) + along * np.cos(normals)
+    return np.column_stack((radii * y, radii * z))
+
+# traces rays from the object point with the given (N, 2) launch slopes to the aperture plane
+def stop_points(slopes, object_point, lens_system, wavelength_index: int):
+    positions = np.broadcast_to(object_point, (len(slopes), 3))
+    directions = np.column_stack((np.ones(len(slopes)), slopes))
+    return raytracer.trace_to_stop_3d(positions, directions, lens_system, wavelength_index)
+
+# solves for the launch slopes of rays from the object point hitting the given aperture points by Newton's method with
+# finite difference Jacobians, all rays at once - returns the slopes and the mask of converged rays
+def solve_slopes(targets, slopes, object_point, lens_system, wavelength_index: int):
+    slopes = slopes.copy()
+    step = 1e-7
+    threshold = aim_tolerance * data.semi_aperture
+    converged = np.zeros(len(targets), dtype=bool)
+    for _ in range(aim_iterations):
+        points, valid = stop_points(slopes, object_point, lens_system, wavelength_index)
+        residuals = points - targets
+        converged = valid & (np.einsum('ni,ni->n', residuals, residuals) <= threshold * threshold)
+        if np.all(converged | ~valid):
+            break
+        dy_points, dy_valid = stop_points(slopes + [step, 0.0], object_point, lens_system, wavelength_index)
+        dz_points, dz_valid = stop_points(slopes + [0.0, step], object_point, lens_system, wavelength_index)
+        jacobians = np.stack(((dy_points - points) / step, (dz_points - points) / step), axis=2)
+        usable = valid & dy_valid & dz_valid & ~converged
+        usable &= np.abs(np.linalg.det(np.where(usable[:, None, None], jacobians, np.eye(2)))) > 0.0
+        updates = np.linalg.solve(np.where(usable[:, None, None], jacobians, np.eye(2)), -np.where(usable[:, None], residuals, 0.0)[:, :, None])[:, :, 0]
+        slopes += updates
+    return slopes, converged
+
+# calculates the object heights at the given distance from which real rays with the given field angles (in the x/y
+# plane) pass the aperture center, by secant iterations on all field angles at once starting at the paraxial solution
+# returns the heights and the mask of converged field angles - the paraxial heights are kept for the others
+def chief_ray_heights(field_angles, distance: float, lens_system, wavelength_index: int = 0):
+    field_angles = np.atleast_1d(np.asarray(field_angles, dtype=np.float64))
+    slopes = np.column_stack((np.tan(field_angles), np.zeros(len(field_angles))))
+    threshold = aim_tolerance * data.semi_aperture
+
+    # meridional offsets of the chief rays from the aperture center
+    def offsets(heights):
+        object_points = np.column_stack((np.full(len(heights), -distance), heights, np.zeros(len(heights))))
+        points, _ = raytracer.trace_to_stop_3d(object_points, np.column_stack((np.ones(len(heights)), slopes)), lens_system, wavelength_index)
+        return points[:, 0]
+
+    paraxial_heights = np.asarray(paraxial.chief_ray_height(field_angles, distance, lens_system, wavelength_index), dtype=np.float64)
+    previous_heights = paraxial_heights
+    heights = paraxial_heights + 1e-6 * np.maximum(np.abs(paraxial_heights), max(distance, 1.0))
+    previous_offsets = offsets(previous_heights)
+    current_offsets = offsets(heights)
+    for _ in range(aim_iterations):
+        active = np.isfinite(previous_offsets) & np.isfinite(current_offsets) & (current_offsets != previous_offsets)
+        active &= np.abs(current_offsets) > threshold
+        if not np.any(active):
+            break
+        with np.errstate(divide='ignore', invalid='ignore'):
+            steps = current_offsets * (heights - previous_heights) / (current_offsets - previous_offsets)
+        previous_heights, previous_offsets = heights, current_offsets
+        heights = np.where(active, heights - steps, heights)
+        current_offsets = np.where(active, offsets(heights), current_offsets)
+
+    aimed = np.isfinite(current_offsets) & (np.abs(current_offsets) <= 1e3 * threshold)
+    return np.where(aimed, heights, paraxial_heights), aimed
+
+
+# ------------------------------------------------------------------------
+#    Aim map
+# ------------------------------------------------------------------------
+
+# maps normalized pupil coordinates (aperture points divided by the aperture radius) to the launch directions of real
+# rays from the object point of one field angle in the x/y plane - the object point is chosen such that the real chief
+# ray with the field angle passes the aperture center, the mapping is a polynomial fitted to exactly aimed rays
+class AimMap:
+    def __init__(self, field_angle: float, distance: float, lens_system, wavelength_index: int = 0):
+        self.field_angle = float(field_angle)
+        self.distance = float(distance)
+        stop_row = paraxial.stop_matrix(lens_system)[wavelength_index][0]
+        object_distance = lens_system.vertex[0] + distance
+
+        # real chief ray through the aperture center
+        heights, aimed = chief_ray_heights(field_angle, distance, lens_system, wavelength_index)
+        self.chief_ray_aimed = bool(aimed[0])
+        self.object_height = float(heights[0])
+        self.object_point = np.array([-distance, self.object_height, 0.0])
+
+        # aim hexapolar reference rays exactly and fit the pupil mapping to the converged ones
+        pupil = [np.zeros((1, 2))]
+        for ring in range(1, aim_ring_count + 1):
+            angles = 2.0 * np.pi * np.arange(6 * ring) / (6 * ring)
+            pupil.append(ring / aim_ring_count * np.column_stack((np.cos(angles), np.sin(angles))))
+        pupil = np.concatenate(pupil)
+        targets = pupil * data.semi_aperture
+        slopes, converged = solve_slopes(targets, paraxial_slopes(targets, self.object_height, object_distance, stop_row),
+                                         self.object_point, lens_system, wavelength_index)
+        # the fraction of reference rays reaching the aperture, i.e. not blocked by the lenses in front of it
+        self.aimed_fraction = np.count_nonzero(converged) / len(pupil)
+        basis = monomials(pupil[converged], aim_degree)
+        if len(basis) >= basis.shape[1]:
+            self.coefficients = np.linalg.lstsq(basis, slopes[converged], rcond=None)[0]
+            self.fit_error = float(np.max(np.abs(basis @ self.coefficients - slopes[converged])))
+        else:
+            # too few rays reach the aperture for a fit - use the paraxial mapping
+            self.coefficients = None
+            self.fit_error = np.inf
+        self.object_distance = object_distance
+        self.stop_row = stop_row
+
+    # returns launch slopes (dy/dx, dz/dx) for the (N, 2) normalized pupil points
+    def slopes(self, pupil_points):
+        pupil_points = np.asarray(pupil_points, dtype=np.float64).reshape(-1, 2)
+        if self.coefficients is None:
+            return paraxial_slopes(pupil_points * data.semi_aperture, self.object_height, self.object_distance, self.stop_row)
+        return monomials(pupil_points, aim_degree) @ self.coefficients
+
+    # returns the (N, 2, 2) derivatives of the launch slopes with respect to the normalized pupil coordinates
+    def slope_jacobians(self, pupil_points):
+        pupil_points = np.asarray(pupil_points, dtype=np.float64).reshape(-1, 2)
+        if self.coefficients is None:
+            a, b = self.stop_row
+            scale = data.semi_aperture / (a * self.object_distance + b)
+            return np.broadcast_to(np.eye(2) * scale, (len(pupil_points), 2, 2)).copy()
+        d_y, d_z = monomial_derivatives(pupil_points, aim_degree)
+        return np.stack((d_y @ self.coefficients, d_z @ self.coefficients), axis=2)
+
+    # creates 3D rays from the object point hitting the aperture at the given normalized pupil points
+    def launch(self, pupil_points):
+        slopes = self.slopes(pupil_points)
+        directions = np.column_stack((np.ones(len(slopes)), slopes))
+        positions = np.empty_like(directions)
+        positions[:] = self.object_point
+        return positions, directions
+
+
+# ------------------------------------------------------------------------
+#    Cache access
+# ------------------------------------------------------------------------
+
+# returns the cached aim map for the configuration or builds it - lens systems are immutable and compared by identity
+def aim_map(field_angle: float, distance: float, lens_system=None, wavelength_index: int = 0) -> AimMap:
+    if lens_system is None:
+        lens_system = data.lens_system
+    key = (lens_system, wavelength_index, float(field_angle), float(distance), data.semi_aperture)
+    if key in aim_maps:
+        aim_maps.move_to_end(key)
+        return aim_maps[key]
+    aim = AimMap(field_angle, distance, lens_system, wavelength_index)
+    aim_maps[key] = aim
+    while len(aim_maps) > max_cached_aim_maps:
+        aim_maps.popitem(last=False)
+    return aim
+
+# removes all cached aim maps
+def clear_aim_maps():
+    aim_maps.clear()
+
+# creates 3D rays from the object point of the given field angle (in the x/y plane) and distance that hit the aperture
+# at the given normalized pupil points - real rays aimed with the cached aim map. The unit disk of pupil points is
+# mapped into the aperture polygon, i.e. equal area pupil samples stay equal area samples of the open stop
+def launch_rays_3d(field_angle: float, distance: float, pupil_points, lens_system=None, wavelength_index: int = 0):
+    pupil_points = polygon_pupil_points(pupil_points, data.aperture_blades, data.aperture_angle)
+    return aim_map(field_angle, distance, lens_system, wavelength_index).launch(pupil_points)
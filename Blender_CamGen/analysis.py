@@ -0,0 +1,231 @@
+# ------------------------------------------------------------------------
+#    Ray based image quality analyses
+# ------------------------------------------------------------------------
+
+import numpy as np
+
+from . import aiming
+from . import data
+from . import paraxial
+from . import raytracer
+from . import sampling
+
+# reference wavelength in um, i.e. the default prop_wavelength
+reference_wavelength = 0.5876
+
+# ------------------------------------------------------------------------
+#    Helper functions
+# ------------------------------------------------------------------------
+
+# creates count evenly spaced wavelengths in um between start and end (given in nm) and normalized spectral weights
+# uniform weights are used if none are given
+def spectrum(start: float = 400.0, end: float = 700.0, count: int = 31, weights=None):
+    wavelengths = np.linspace(start, end, count) / 1000.0
+    weights = np.ones(count) if weights is None else np.asarray(weights, dtype=np.float64)
+    return wavelengths, weights / np.sum(weights)
+
+# traces a meridional fan of on-axis rays starting at the given distance for all wavelengths of the lens system
+# returns the traced rays and the pupil weights of the fan rays (ring areas of a circular pupil)
+def trace_on_axis_fan(distance: float, lens_system, ray_count: int):
+    fractions = (np.arange(ray_count) + 0.5) / ray_count
+    angles = paraxial.marginal_angle(distance, lens_system) * fractions
+    rays = np.column_stack((np.full(ray_count, -distance), np.zeros(ray_count), angles))
+    positions, directions, valid = raytracer.trace_rays_polychromatic(rays, lens_system)
+    return positions, directions, valid, fractions
+
+# calculates the sensor position minimizing the weighted RMS height of meridional rays centered on the axis - the
+# height at sensor position x is linear in x, so the minimum has a closed form - works on the last axis of the arrays
+def best_focus(positions, directions, valid, weights, axis=None):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slopes = directions[..., 1] / directions[..., 0]
+    usable = valid & np.isfinite(slopes)
+    slopes = np.where(usable, slopes, 0.0)
+    offsets = np.where(usable, positions[..., 1] - positions[..., 0] * slopes, 0.0)
+    weights = np.where(usable, weights, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return -np.sum(weights * offsets * slopes, axis=axis) / np.sum(weights * slopes * slopes, axis=axis)
+
+# returns the index of the wavelength closest to the reference wavelength
+def reference_index(wavelengths) -> int:
+    return int(np.argmin(np.abs(np.asarray(wavelengths) - reference_wavelength)))
+
+
+# ------------------------------------------------------------------------
+#    Chromatic aberration
+# ------------------------------------------------------------------------
+
+# calculates the focus of every wavelength and the polychromatic best focus for objects at the given distance
+# returns a dict with the wavelengths, the best focus per wavelength, the longitudinal chromatic aberration (focus
+# relative to the polychromatic best focus) and the polychromatic best focus minimizing the weighted RMS spot
+def chromatic_focus(distance: float, wavelengths, spectral_weights, lens_system=None, ray_count: int = 32):
+    if lens_system is None:
+        lens_system = data.lens_system
+    polychromatic_system = lens_system.with_wavelengths(wavelengths)
+    positions, directions, valid, pupil_weights = trace_on_axis_fan(distance, polychromatic_system, ray_count)
+
+    focus = best_focus(positions, directions, valid, pupil_weights[None, :], axis=1)
+    weights = np.asarray(spectral_weights, dtype=np.float64)[:, None] * pupil_weights[None, :]
+    polychromatic_focus = float(best_focus(positions, directions, valid, weights))
+    return {
+        'wavelengths': np.asarray(wavelengths, dtype=np.float64),
+        'focus': focus,
+        'longitudinal': focus - polychromatic_focus,
+        'best_focus': polychromatic_focus
+    }
+
+# calculates the chief ray image heights on the sensor for the given field angles (in rad) and all wavelengths
+# returns a dict with the (wavelengths, fields) image heights and the lateral chromatic aberration relative to the
+# wavelength closest to the reference wavelength
+def lateral_color(field_angles, distance: float, sensor_position: float, wavelengths, lens_system=None):
+    if lens_system is None:
+        lens_system = data.lens_system
+    polychromatic_system = lens_system.with_wavelengths(wavelengths)
+    reference = reference_index(wavelengths)
+    field_angles = np.atleast_1d(np.asarray(field_angles, dtype=np.float64))
+
+    # chief rays are aimed through the aperture center at the reference wavelength
+    heights = paraxial.chief_ray_height(field_angles, distance, polychromatic_system, reference)
+    rays = np.column_stack((np.full(len(field_angles), -distance), heights, field_angles))
+    positions, directions, valid = raytracer.trace_rays_polychromatic(rays, polychromatic_system)
+    with np.errstate(invalid='ignore'):
+        image_heights = positions[..., 1] + (sensor_position - positions[..., 0]) * directions[..., 1] / directions[..., 0]
+    image_heights = np.where(valid, image_heights, np.nan)
+    return {
+        'field_angles': field_angles,
+        'image_heights': image_heights,
+        'lateral': image_heights - image_heights[reference]
+    }
+
+
+# ------------------------------------------------------------------------
+#    Spot diagrams
+# ------------------------------------------------------------------------
+
+# number of rays traced at once by the streaming analyses
+chunk_size = 1 << 16
+
+# number of Sobol rays over the full pupil that size the encircled energy range of the spot analysis
+pilot_ray_count = 1 << 10
+
+# accumulates spot statistics for several sensor positions chunk by chunk so that memory stays bounded - points are
+# given relative to a reference point per sensor position
+class SpotAccumulator:
+    def __init__(self, sensor_positions, max_radii, bins: int, spot_samples: int):
+        self.sensor_positions = np.asarray(sensor_positions, dtype=np.float64)
+        self.max_radii = np.asarray(max_radii, dtype=np.float64)
+        self.bins = bins
+        self.spot_samples = spot_samples
+        self.ray_count = 0
+        self.valid_count = 0
+        self.sums = np.zeros((len(self.sensor_positions), 2))
+        self.squared_sums = np.zeros(len(self.sensor_positions))
+        # radius histogram per sensor position - the last bin counts rays beyond the maximum radius
+        self.histogram = np.zeros((len(self.sensor_positions), bins + 1), dtype=np.int64)
+        self.samples = [np.zeros((0, 2)) for _ in self.sensor_positions]
+
+    # adds the (P, N, 2) sensor points of a chunk of N traced rays, of which the (N,) mask marks the valid ones
+    def add(self, points, valid):
+        self.ray_count += len(valid)
+        points = points[:, valid]
+        self.valid_count += points.shape[1]
+        self.sums += points.sum(axis=1)
+        squared_radii = np.einsum('pni,pni->pn', points, points)
+        self.squared_sums += squared_radii.sum(axis=1)
+        bin_ids = np.minimum((np.sqrt(squared_radii) / self.max_radii[:, None] * self.bins).astype(np.int64), self.bins)
+        for position_id in range(len(self.sensor_positions)):
+            self.histogram[position_id] += np.bincount(bin_ids[position_id], minlength=self.bins + 1)
+            missing = self.spot_samples - len(self.samples[position_id])
+            if missing > 0:
+                self.samples[position_id] = np.concatenate((self.samples[position_id], points[position_id, :missing]))
+
+    # returns the accumulated statistics as dict - RMS radii are taken around the centroid, the encircled energy around
+    # the reference point
+    def result(self, reference_points):
+        count = max(self.valid_count, 1)
+        centroids = self.sums / count
+        rms_radii = np.sqrt(np.maximum(self.squared_sums / count - np.einsum('pi,pi->p', centroids, centroids), 0.0))
+        return {
+            'sensor_positions': self.sensor_positions,
+            'ray_count': self.ray_count,
+            'transmission': self.valid_count / max(self.ray_count, 1),
+            'centroids': centroids + reference_points,
+            'rms_radii': rms_radii,
+            'radii': np.linspace(0.0, 1.0, self.bins + 1)[1:] * self.max_radii[:, None],
+            'encircled_energy': np.cumsum(self.histogram[:, :-1], axis=1) / count,
+            'spots': [samples + reference for samples, reference in zip(self.samples, reference_points)]
+        }
+
+# streams ray_count rays per field angle from the object distance through the lens system and collects spot diagrams,
+# RMS spot radii and encircled energy on each of the given sensor positions - the pupil is sampled with the given
+# sampling strategy, see sampling.strategies - returns one result dict per field angle
+def spot_analysis(field_angles, sensor_positions, distance: float, ray_count: int = 1000000, lens_system=None,
+                  wavelength_index: int = 0, seed: int = 0, bins: int = 64, spot_samples: int = 4096,
+                  strategy: str = 'random'):
+    if lens_system is None:
+        lens_system = data.lens_system
+    if ray_count < 1:
+        raise ValueError("The spot analysis needs at least one ray per field angle.")
+    sensor_positions = np.atleast_1d(np.asarray(sensor_positions, dtype=np.float64))
+    # pupil points are generated chunk by chunk, layouts are laid out for the requested ray count
+    layout_count = ray_count if strategy not in sampling.progressive_strategies else None
+    ray_count = sampling.layout_size(strategy, ray_count)
+    results = []
+
+    for field_angle in np.atleast_1d(field_angles):
+        # reference points are the chief ray intersections with the sensor planes
+        chief_positions, chief_directions = aiming.launch_rays_3d(field_angle, distance, np.zeros((1, 2)), lens_system, wavelength_index)
+        chief_positions, chief_directions, chief_valid = raytracer.trace_rays_3d(chief_positions, chief_directions, lens_system, wavelength_index)
+        if chief_valid[0]:
+            reference_points = np.array([raytracer.sensor_intersections_3d(chief_positions, chief_directions, position)[0] for position in sensor_positions])
+        else:
+            reference_points = np.zeros((len(sensor_positions), 2))
+
+        # the encircled energy is binned up to five times the RMS radius of a pilot that covers the full pupil, so that
+        # the range depends neither on the sampling strategy nor on the chunk size
+        pilot_positions, pilot_directions = aiming.launch_rays_3d(field_angle, distance, sampling.pupil_points('sobol', pilot_ray_count, seed),
+                                                                  lens_system, wavelength_index)
+        pilot_positions, pilot_directions, pilot_valid = raytracer.trace_rays_3d(pilot_positions, pilot_directions, lens_system, wavelength_index)
+        pilot = np.stack([raytracer.sensor_intersections_3d(pilot_positions[pilot_valid], pilot_directions[pilot_valid], position)
+                          for position in sensor_positions]) - reference_points[:, None, :]
+        pilot_rms = np.sqrt(np.mean(np.einsum('pni,pni->pn', pilot, pilot), axis=1)) if pilot.shape[1] > 0 else np.ones(len(sensor_positions))
+        accumulator = SpotAccumulator(sensor_positions, np.maximum(5.0 * pilot_rms, 1e-9), bins, spot_samples)
+
+        for start in range(0, ray_count, chunk_size):
+            count = min(chunk_size, ray_count - start)
+            pupil_points = sampling.pupil_points(strategy, count, seed, start, layout_count)
+            positions, directions = aiming.launch_rays_3d(field_angle, distance, pupil_points, lens_system, wavelength_index)
+            positions, directions, valid = raytracer.trace_rays_3d(positions, directions, lens_system, wavelength_index)
+            points = np.stack([raytracer.sensor_intersections_3d(positions, directions, position) for position in sensor_positions])
+            points -= reference_points[:, None, :]
+            accumulator.add(points, valid)
+
+        result = accumulator.result(reference_points)
+        result['field_angle'] = float(field_angle)
+        results.append(result)
+    return results
+
+# traces the given normalized pupil points for one field angle and returns the fraction of transmitted rays as well as
+# the RMS spot radius around the centroid on the sensor plane
+def spot_statistics(pupil_points, field_angle: float, sensor_position: float, distance: float, lens_system,
+                    wavelength_index: int = 0):
+    positions, directions = aiming.launch_rays_3d(field_angle, distance, pupil_points, lens_system, wavelength_index)
+    positions, directions, valid = raytracer.trace_rays_3d(positions, directions, lens_system, wavelength_index)
+    transmission = np.count_nonzero(valid) / max(len(valid), 1)
+    if not np.any(valid):
+        return transmission, np.nan
+    points = raytracer.sensor_intersections_3d(positions[valid], directions[valid], sensor_position)
+    points -= points.mean(axis=0)
+    return transmission, float(np.sqrt(np.mean(np.einsum('ni,ni->n', points, points))))
+
+# estimates the RMS spot radius ('RMS') or the transmission ('TRANSMISSION') of one field angle with as few rays as
+# needed - the pupil sample set grows until the estimate converges within the relative tolerance
+# returns the estimate and the number of traced rays
+def adaptive_spot_estimate(field_angle: float, sensor_position: float, distance: float, quantity: str = 'RMS',
+                           tolerance: float = 1e-3, strategy: str = 'sobol', lens_system=None,
+                           wavelength_index: int = 0, seed: int = 0, max_ray_count: int = 1 << 20):
+    if lens_system is None:
+        lens_system = data.lens_system
+    statistic = 0 if quantity == 'TRANSMISSION' else 1
+    return sampling.adaptive_estimate(
+        lambda points: spot_statistics(points, field_angle, sensor_position, distance, lens_system, wavelength_index)[statistic],
+        strategy, tolerance, max_count=max_ray_count, seed=seed)
@@ -3,73 +3,53 @@
 # ------------------------------------------------------------------------
 
 import math
+import numpy as np
 
-from . import data
-
-# calculates the IOR for the given material and wavelength based on the sellmeier equation
-def sellmeier_ior(material_name: str, wavelength: float) -> float:
-    B1, B2, B3, C1, C2, C3, _ior = data.sellmeier_data[material_name]
-    
-    w2 = math.pow(wavelength, 2)
-    a1 = (B1 * w2) / (w2 - C1)
-    a2 = (B2 * w2) / (w2 - C2)
-    a3 = (B3 * w2) / (w2 - C3)
-    
-    return math.sqrt(1 + a1 + a2 + a3)
-
-# calculates the IOR for the given material and wavelength based on the cauchy equation
-def cauchy_ior(material_name: str, wavelength: float) -> float:
-    C1, C2, C3, C4, C5, C6, _ior = data.cauchy_data[material_name]
-    
-    w2 = math.pow(wavelength, 2)
-    wm2 = math.pow(wavelength, -2)
-    wm4 = math.pow(wavelength, -4)
-    wm6 = math.pow(wavelength, -6)
-    wm8 = math.pow(wavelength, -8)
-    
-    return math.sqrt(C1 + C2*w2 + C3*wm2 + C4*wm4 + C5*wm6 + C6*wm8)
+from . import glass
 
 # calculates the IOR for the given material and wavelength if the material is known
 def ior(material_name: str, wavelength: float) -> float:
-    if material_name in data.sellmeier_data.keys():
-        return sellmeier_ior(material_name, wavelength)
-    if material_name in data.cauchy_data.keys():
-        return cauchy_ior(material_name, wavelength)
-    return None
+    return glass.ior(material_name, wavelength)
+
+# calculates the IORs of the given materials at the given wavelengths in um in one pass - returns a
+# (materials, wavelengths) table with 1.0 for air and NaN for unknown materials. With the design IORs (nd) and Abbe
+# numbers (vd) of the materials, glasses missing in the glass catalog are matched by nd and vd
+def ior_table(material_names, wavelengths, design_iors=None, abbe_numbers=None):
+    return glass.ior_table(material_names, wavelengths, design_iors, abbe_numbers)
 
-# calculates the ratio of the two material IORs for the refraction shader
-def shader_iors(objective):
-    for i in range(len(objective)-1, 0, -1):
-        objective[i]['ior_ratio'] = objective[i - 1]['ior_wavelength']/objective[i]['ior_wavelength']
-    objective[0]['ior_ratio'] = 1.0/objective[0]['ior_wavelength']
-    return objective
+# calculates the ratios of consecutive IORs for the refraction shader - works on (..., surfaces) arrays
+def ior_ratios(iors):
+    iors = np.asarray(iors, dtype=np.float64)
+    ratios = np.empty_like(iors)
+    ratios[..., 0] = 1.0 / iors[..., 0]
+    ratios[..., 1:] = iors[..., :-1] / iors[..., 1:]
+    return ratios
 
-# calculates the aperture position based on the lens data
-def aperture(objective):
-    aperture_index = -1
-    for i in range(0, len(objective)-1):
-        if objective[i]['material'] == "air" and objective[i+1]['material'] == "air":
-            aperture_index = i+1
-            break
+# finds the aperture, i.e. the first surface with air on both sides - returns -1 if there is none
+def aperture_index(materials) -> int:
+    for i in range(0, len(materials)-1):
+        if materials[i] == "air" and materials[i+1] == "air":
+            return i+1
+    return -1
+
+# calculates the sphere center positions of all surfaces relative to the aperture located at x = 0
+def surface_positions(radius, thickness, semi_aperture, aperture_index: int):
+    radius = np.asarray(radius, dtype=np.float64)
+    thickness = np.asarray(thickness, dtype=np.float64)
     aperture_position = 0.0
 
     if aperture_index != -1:
-        for i in range(0, aperture_index):
-            aperture_position = aperture_position + objective[i]['thickness']
+        aperture_position = float(np.sum(thickness[:aperture_index]))
     else:
-        if objective[0]['radius'] >= 0.0:
+        if radius[0] >= 0.0:
             aperture_position = -0.001
         else:
-            radius = objective[0]['radius']
-            height = objective[0]['semi_aperture']
-            aperture_position = min(-0.001, 1.1 * (radius + math.sqrt(radius*radius - height*height)))
-
-    for i in range(0, len(objective)):
-        objective[i]['position'] = objective[i]['radius'] - aperture_position
-        for j in range(0, i):
-            objective[i]['position'] = objective[i]['position'] + objective[j]['thickness']
+            height = semi_aperture[0]
+            aperture_position = min(-0.001, 1.1 * (radius[0] + math.sqrt(radius[0]*radius[0] - height*height)))
 
-    return objective, aperture_index
+    # vertex positions are the accumulated thicknesses of all previous surfaces
+    vertex_positions = np.concatenate(([0.0], np.cumsum(thickness[:-1])))
+    return radius - aperture_position + vertex_positions
 
 # calculates sagitta for a lens with the given parameters
 def sagitta(half_lens_height: float, surface_radius: float) -> float:
@@ -79,4 +59,60 @@ def sagitta(half_lens_height: float, surface_radius: float) -> float:
 
 # calculates the number of vertices
 def number_of_vertices(half_lens_height: float, surface_radius: float, vertex_count_height: int) -> int:
-    return int(vertex_count_height / (math.asin(half_lens_height / surface_radius) / math.pi) + 0.5) * 2
\ No newline at end of file
+    return int(vertex_count_height / (math.asin(half_lens_height / surface_radius) / math.pi) + 0.5) * 2
+
+# calculates the largest deviation of a revolved sphere cap from the true sphere - every facet between two profile
+# angles (from the tip) and two of the radial steps is a planar polygon inscribed in the sphere, i.e. it deviates from
+# the sphere by at most the sagitta of its circumcircle
+def revolved_cap_deviation(surface_radius: float, profile_angles, radial_steps: int) -> float:
+    profile_angles = np.asarray(profile_angles, dtype=np.float64)
+    if len(profile_angles) < 2:
+        return 0.0
+    step = 2.0 * math.pi / radial_steps
+    # three vertices per facet: both profile vertices at the first radial step and the outer one at the second
+    first = surface_radius * np.column_stack((np.cos(profile_angles[:-1]), np.sin(profile_angles[:-1]), np.zeros(len(profile_angles) - 1)))
+    second = surface_radius * np.column_stack((np.cos(profile_angles[1:]), np.sin(profile_angles[1:]), np.zeros(len(profile_angles) - 1)))
+    third = second * [1.0, math.cos(step), 0.0] + second[:, [0, 2, 1]] * [0.0, 0.0, math.sin(step)]
+    normals = np.cross(second - first, third - first)
+    # distance of the facet planes to the sphere center and radii of the circumcircles
+    distances = np.abs(np.einsum('ij,ij->i', normals, first)) / np.linalg.norm(normals, axis=1)
+    circumradius = math.sqrt(max(surface_radius * surface_radius - float(np.min(distances)) ** 2, 0.0))
+    return sagitta(circumradius, surface_radius)
+
+# calculates the profile angles and number of radial steps of a revolved sphere cap deviating at most max_deviation
+# from the sphere with the fewest triangles - returns the profile angles, the radial steps and the achieved deviation,
+# raises a ValueError if the deviation needs more than max_faces triangles
+def adaptive_tessellation(half_lens_height: float, surface_radius: float, max_deviation: float, max_steps: int = 4096,
+                          max_faces: int = 1 << 21):
+    surface_radius = abs(surface_radius)
+    cap_angle = math.asin(min(half_lens_height / surface_radius, 1.0))
+    # lower bounds: profile chords and the radial chords at the lens rim alone must stay within the bound
+    min_profile_steps = 1
+    while min_profile_steps < max_steps and sagitta(surface_radius * math.sin(0.5 * cap_angle / min_profile_steps), surface_radius) > max_deviation:
+        min_profile_steps += 1
+    min_radial_steps = 3
+    while min_radial_steps < max_steps and sagitta(min(half_lens_height, surface_radius) * math.sin(math.pi / min_radial_steps), surface_radius) > max_deviation:
+        min_radial_steps += 1
+
+    best = None
+    profile_steps = min_profile_steps
+    # 2 * profile_steps - 1 triangles per radial step (the tip facets are triangles)
+    while profile_steps <= max_steps and (2 * profile_steps - 1) * min_radial_steps <= min(max_faces, best[0] if best else max_faces):
+        profile_angles = np.linspace(0.0, cap_angle, profile_steps + 1)
+        # fewest radial steps meeting the bound within the face budget, the deviation decreases with the number of steps
+        low, high = min_radial_steps, min(max_steps, max_faces // (2 * profile_steps - 1))
+        if revolved_cap_deviation(surface_radius, profile_angles, high) <= max_deviation:
+            while low < high:
+                middle = (low + high) // 2
+                if revolved_cap_deviation(surface_radius, profile_angles, middle) <= max_deviation:
+                    high = middle
+                else:
+                    low = middle + 1
+            triangle_count = (2 * profile_steps - 1) * low
+            if best is None or triangle_count < best[0]:
+                best = (triangle_count, profile_angles, low)
+        profile_steps += 1
+
+    if best is None:
+        raise ValueError("Lens surface can not be tessellated within a deviation of " + str(round(1e6 * max_deviation, 4)) + " um with at most " + str(max_faces) + " faces.")
+    return best[1], best[2], revolved_cap_deviation(surface_radius, best[1], best[2])
@@ -1,14 +1,20 @@
 import bpy
+from bpy.props import BoolProperty
 from bpy_extras.io_utils import ExportHelper, ImportHelper
 import math
+import os
 
 from . import data
-from . import calc
-from . import create
 from . import delete
-from . import io
 from . import update
-from . test_camera_generator import test_main
+from . startup import lazy_import
+
+# modules depending on NumPy are loaded on first use to keep the addon registration fast
+create = lazy_import('create')
+illumination = lazy_import('illumination')
+io = lazy_import('io')
+lens_system = lazy_import('lens_system')
+test_camera_generator = lazy_import('test_camera_generator')
 
 from typing import Any, List, Dict, Tuple
 
@@ -17,6 +23,9 @@ from typing import Any, List, Dict, Tuple
 # ------------------------------------------------------------------------
 
 def set_aperture_parameters(scene):
+    # keep aperture shape for ray tracing
+    data.aperture_blades = scene.camera_generator.prop_aperture_blades
+    data.aperture_angle = scene.camera_generator.prop_aperture_angle
     # set opening rotation
     bpy.data.objects['Opening'].rotation_euler[0] = scene.camera_generator.prop_aperture_angle/180.0*math.pi
 
@@ -109,16 +118,20 @@ class CAMGEN_OT_CreateCam(bpy.types.Operator):
         # set cycles parameters, i.e. number of bounces, and deactivate clamping
         set_cycles_parameters(scene)
 
-        # get number of vertices and patch size for lens creation
+        # get number of vertices, patch size and max. deviation for lens creation
         lens_patch_size = scene.camera_generator.prop_lens_patch_size / 1000
         vertex_count_height = scene.camera_generator.prop_vertex_count_height
         vertex_count_radial = scene.camera_generator.prop_vertex_count_radial
+        max_deviation = scene.camera_generator.prop_lens_max_deviation / 1000000
 
         # read objective paramters
-        data.objective, data.glass_data_known = io.load_lens_file(data.lens_directory)
-        # camera setup: calculate IORs ratios and aperture position
-        data.objective = calc.shader_iors(data.objective)
-        data.objective, data.aperture_index = calc.aperture(data.objective)
+        data.objective_file = io.lens_file_path(data.lens_directory)
+        objective, data.glass_data_known = io.read_lens_file(data.objective_file)
+        # compile the objective for ray tracing and mesh creation - the lens system calculates the IOR ratios and the
+        # aperture position, the dict view of it is kept for the UI
+        data.lens_system = lens_system.LensSystem(objective)
+        data.objective = data.lens_system.as_objective()
+        data.aperture_index = data.lens_system.aperture_index
 
         # delete old camera and calibration pattern
         delete.old_camera()
@@ -129,8 +142,14 @@ class CAMGEN_OT_CreateCam(bpy.types.Operator):
         # set orthographic camera as render camera
         scene.camera = bpy.data.objects['Orthographic Camera']
 
-        # create lenses and save the outer vertices for housing creation
-        outer_vertices, outer_lens_index = create.lenses(lens_patch_size, vertex_count_height, vertex_count_radial, data.objective)
+        # create lenses and save the outer vertices for housing creation - surfaces exceeding the face budget of the
+        # adaptive tessellation cancel the creation
+        try:
+            outer_vertices, outer_lens_index = create.lenses(lens_patch_size, vertex_count_height, vertex_count_radial, max_deviation, data.lens_system)
+        except ValueError as error:
+            delete.old_camera()
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
 
         # create housing and aperture
         create.housing(outer_vertices, outer_lens_index, data.num_radial_housing_vertices)
@@ -145,6 +164,21 @@ class CAMGEN_OT_CreateCam(bpy.types.Operator):
         return {'FINISHED'}
 
 
+# ------------------------------------------------------------------------
+#    Lens list operator
+# ------------------------------------------------------------------------
+
+# updates the lens index, i.e. the focal lengths and F-numbers shown in the objective list
+class CAMGEN_OT_RefreshLensList(bpy.types.Operator):
+    bl_idname = "camgen.refreshlenslist"
+    bl_label = "Refresh Lens List"
+    bl_description = "Compute the focal lengths and F-numbers of new or modified lens files and list them in the objective selector."
+
+    def execute(self, context):
+        update.refresh_lens_index()
+        return {'FINISHED'}
+
+
 # ------------------------------------------------------------------------
 #    Calibration pattern operators
 # ------------------------------------------------------------------------
@@ -164,6 +198,43 @@ class CAMGEN_OT_CreateCalibrationPattern(bpy.types.Operator):
         return {'FINISHED'}
 
 
+# ------------------------------------------------------------------------
+#    Sensor map export operators
+# ------------------------------------------------------------------------
+
+# computes the relative illumination and vignetting maps of the current configuration and saves them - the vignetting
+# map is written next to the chosen file with the suffix _vignetting
+class CAMGEN_OT_SaveIlluminationMap(bpy.types.Operator, ExportHelper):
+    bl_idname = "camgen.saveilluminationmap"
+    bl_label = "Save Illumination Map"
+    bl_description = "Save the relative illumination and vignetting over the sensor as NumPy array (.npy) or image (.png, .exr, .tif)."
+    filename_ext = ".npy"
+    # keep image extensions chosen by the user
+    check_extension = None
+
+    def execute(self, context):
+        # check if objective loaded
+        if data.lens_system is None:
+            print("No objective has been loaded.")
+            return {'CANCELLED'}
+        cg = bpy.data.scenes[0].camera_generator
+        # lengths are given in mm, the focus distance in cm
+        sensor_width = cg.prop_sensor_width / 1000.0
+        sensor_height = cg.prop_sensor_height / 1000.0
+        distance = cg.prop_focus_distance / 100.0
+        sensor_position = cg.prop_sensor_mainlens_distance / 1000.0
+        key = illumination.illumination_key(data.objective_file, cg.prop_objective_scale, cg.prop_wavelength, cg.prop_aperture_size,
+                                            cg.prop_aperture_blades, cg.prop_aperture_angle, sensor_width, sensor_height,
+                                            distance, sensor_position, cg.prop_illumination_map_size)
+        maps = illumination.cached_illumination_map(key, sensor_width, sensor_height, distance, sensor_position, cg.prop_illumination_map_size)
+
+        filepath, extension = os.path.splitext(self.filepath)
+        io.write_sensor_map(filepath + extension, maps['relative_illumination'])
+        io.write_sensor_map(filepath + '_vignetting' + extension, maps['vignetting'])
+
+        return {'FINISHED'}
+
+
 # ------------------------------------------------------------------------
 #    Unit test execution operator
 # ------------------------------------------------------------------------
@@ -174,7 +245,7 @@ class CAMGEN_OT_RunTests(bpy.types.Operator):
     bl_description = "Runs tests"
 
     def execute(self, context):
-        test_main()
+        test_camera_generator.test_main()
         return {'FINISHED'}
 
 
@@ -189,12 +260,18 @@ class CAMGEN_OT_SaveConfig(bpy.types.Operator, ExportHelper):
     bl_description = "Save the camera configuration including MLA properties."
     filename_ext = ".csv"
 
+    export_distortion: BoolProperty(
+        name="Export Distortion",
+        description="Also save the traced radial distortion of the camera next to the configuration.",
+        default = False
+        )
+
     def execute(self, context):
         cg = bpy.data.scenes[0].camera_generator
         # the export helper asks the user for saving file location
         filepath = self.filepath
         # save camera parameters to file
-        io.write_cam_params(filepath)
+        io.write_cam_params(filepath, self.export_distortion)
 
         return {'FINISHED'}
 
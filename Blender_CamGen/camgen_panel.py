@@ -23,6 +23,7 @@ class CAMGEN_Properties(PropertyGroup):
         description = "Lens creation method.",
         items = [ ('UNIFORM', "Uniform vertex distribution", ""),
                 ('ROTATIONAL', "Rotational Surface", ""),
+                ('ADAPTIVE', "Adaptive Rotational Surface", ""),
                ],
         update = update.lens_creation_method
         )
@@ -44,6 +45,14 @@ class CAMGEN_Properties(PropertyGroup):
         max = 100
         )
 
+    prop_lens_max_deviation: FloatProperty(
+        name = "",
+        description="Maximum deviation of the lens triangles from the spherical lens surface in um.",
+        default = 1,
+        min = 0.1,
+        max = 1000
+        )
+
     prop_vertex_count_radial: IntProperty(
         name = "",
         description="Latitudinal/radial number of vertices used for lens creation.",
@@ -223,6 +232,24 @@ class CAMGEN_Properties(PropertyGroup):
         update = update.focus_distance
         )
 
+    prop_focus_mode: EnumProperty(
+        name = "",
+        description = "Criterion used for finding the sensor position when focusing.",
+        items = [ ('CURVE', "Mean axis crossing", ""),
+                ('RMS', "Minimum RMS spot", ""),
+                ('ENCIRCLED_ENERGY', "Maximum energy within half a pixel", ""),
+               ],
+        update = update.focus_mode
+        )
+
+    prop_illumination_map_size: IntProperty(
+        name = "",
+        description = "Number of pixels of the illumination map along the longer sensor side.",
+        default = 256,
+        min = 8,
+        max = 4096
+        )
+
 
 # ------------------------------------------------------------------------
 #    Main Panel
@@ -242,6 +269,7 @@ class CAMGEN_PT_Main(bpy.types.Panel):
         row = layout.row()
         row.label(text="Objective")
         row.prop(context.scene.camera_generator, "prop_objective_list")
+        row.operator('camgen.refreshlenslist', text="", icon='FILE_REFRESH')
         row = layout.row()
         row.label(text="Objective Scale")       
         row.prop(context.scene.camera_generator, "prop_objective_scale")
@@ -252,6 +280,10 @@ class CAMGEN_PT_Main(bpy.types.Panel):
             row = layout.row()
             row.label(text="Lens patch size in mm")
             row.prop(context.scene.camera_generator, "prop_lens_patch_size")
+        elif data.lens_creation_method == 'ADAPTIVE':
+            row = layout.row()
+            row.label(text="Max. surface deviation in um")
+            row.prop(context.scene.camera_generator, "prop_lens_max_deviation")
         else:
             row = layout.row()
             row.label(text="Radial Vertices per Lens")       
@@ -300,9 +332,18 @@ class CAMGEN_PT_Main(bpy.types.Panel):
         row.label(text="Focal distance in cm")
         row.prop(context.scene.camera_generator, "prop_focus_distance")
         row = layout.row()
+        row.label(text="Focus criterion")
+        row.prop(context.scene.camera_generator, "prop_focus_mode")
+        row = layout.row()
         row.label(text="")
         row.operator('camgen.createcalibrationpattern', text="Create Calibration Pattern")
         row = layout.row()
+        row.label(text="Illumination map size")
+        row.prop(context.scene.camera_generator, "prop_illumination_map_size")
+        row = layout.row()
+        row.label(text="")
+        row.operator('camgen.saveilluminationmap', text="Save Illumination Map")
+        row = layout.row()
         row.label(text="Use MLA")
         row.prop(context.scene.camera_generator, "prop_mla_enabled")
         if data.use_mla:
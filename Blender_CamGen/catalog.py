@@ -0,0 +1,170 @@
+# ------------------------------------------------------------------------
+#    Lens catalog - persistent index of first-order properties of all lens files
+# ------------------------------------------------------------------------
+
+import json
+import re
+
+from os import listdir
+from os.path import getmtime, getsize, isfile, join
+
+from . import data
+from . import io
+from . import paraxial
+from . lens_system import LensSystem
+
+# version of the index format - indices with other versions are rebuilt
+index_version = 2
+# suffix of the index file stored next to the lens directory - files inside would be listed as objectives
+index_file_suffix = '_index.json'
+
+# index entries by lens directory, i.e. the index file is read at most once per session
+lens_indices = {}
+
+# properties usable in queries, lengths are given in mm, the paraxial unvignetted field of view in degree
+query_aliases = {
+    'efl': 'efl', 'focal_length': 'efl',
+    'bfl': 'bfl',
+    'ffl': 'ffl',
+    'f_number': 'f_number', 'fnumber': 'f_number', 'f': 'f_number',
+    'fov': 'paraxial_fov', 'paraxial_fov': 'paraxial_fov',
+    'entrance_pupil': 'entrance_pupil_radius', 'exit_pupil': 'exit_pupil_radius',
+    'surfaces': 'surface_count'
+}
+
+# ------------------------------------------------------------------------
+#    Helper functions
+# ------------------------------------------------------------------------
+
+# calculates the index entry of a lens file - lengths in mm as given in the file (objective scale 1)
+def lens_properties(filepath: str):
+    objective, _ = io.read_lens_file(filepath, 1.0)
+    properties = paraxial.first_order_properties(LensSystem(objective))
+    entry = {name: (value * 1000.0 if name not in ('f_number', 'paraxial_fov') else value) for name, value in properties.items()}
+    entry['surface_count'] = len(objective)
+    return entry
+
+# returns the modification time and size of a file - an index entry is outdated if one of them changed
+def file_signature(filepath: str):
+    return [getmtime(filepath), getsize(filepath)]
+
+
+# ------------------------------------------------------------------------
+#    Index
+# ------------------------------------------------------------------------
+
+# returns the path of the index file of a lens directory
+def index_path(lens_directory: str):
+    return lens_directory.rstrip('/\\') + index_file_suffix
+
+# returns the index entries of the lens directory as stored in the index file - the file is read once per session
+def stored_entries(lens_directory: str):
+    if lens_directory not in lens_indices:
+        entries = {}
+        if isfile(index_path(lens_directory)):
+            try:
+                with open(index_path(lens_directory), 'r') as index_file:
+                    stored = json.load(index_file)
+                if stored.get('version') == index_version:
+                    entries = stored['entries']
+            except (OSError, ValueError, KeyError):
+                print("Lens index " + index_path(lens_directory) + " is invalid and will be rebuilt.")
+        lens_indices[lens_directory] = entries
+    return lens_indices[lens_directory]
+
+# returns the up-to-date entries of the stored index as dict of file name to property dict without computing missing
+# entries or writing the index file, i.e. cheap enough for UI callbacks
+def stored_lens_index(lens_directory: str = None):
+    if lens_directory is None:
+        lens_directory = data.lens_directory
+    result = {}
+    for lens_file, entry in stored_entries(lens_directory).items():
+        filepath = join(lens_directory, lens_file)
+        if entry['properties'] is not None and isfile(filepath) and entry['signature'] == file_signature(filepath):
+            result[lens_file] = entry['properties']
+    return result
+
+# returns the index of all lens files in the directory as dict of file name to property dict - entries of new or
+# modified files are (re-)computed and the index file is updated, all others are taken from the index file
+def lens_index(lens_directory: str = None):
+    if lens_directory is None:
+        lens_directory = data.lens_directory
+    entries = stored_entries(lens_directory)
+
+    lens_files = [f for f in listdir(lens_directory) if isfile(join(lens_directory, f)) and f[-3:] == 'csv']
+    changed = False
+    for lens_file in lens_files:
+        signature = file_signature(join(lens_directory, lens_file))
+        if lens_file in entries and entries[lens_file]['signature'] == signature:
+            continue
+        try:
+            entries[lens_file] = {'signature': signature, 'properties': lens_properties(join(lens_directory, lens_file))}
+        except (ValueError, IndexError, ZeroDivisionError):
+            print("Could not compute the properties of lens file " + lens_file + ".")
+            entries[lens_file] = {'signature': signature, 'properties': None}
+        changed = True
+    for lens_file in set(entries) - set(lens_files):
+        del entries[lens_file]
+        changed = True
+
+    if changed:
+        try:
+            with open(index_path(lens_directory), 'w') as index_file:
+                json.dump({'version': index_version, 'entries': entries}, index_file, indent=1)
+        except OSError:
+            print("Could not write lens index " + index_path(lens_directory) + ".")
+    return {lens_file: entry['properties'] for lens_file, entry in entries.items() if entry['properties'] is not None}
+
+# removes the index of the given (or all) lens directories from memory - the index file is kept
+def clear_lens_index(lens_directory: str = None):
+    if lens_directory is None:
+        lens_indices.clear()
+    else:
+        lens_indices.pop(lens_directory, None)
+
+
+# ------------------------------------------------------------------------
+#    Queries
+# ------------------------------------------------------------------------
+
+# parses a query like "EFL 45-55, F<2, FOV>40" into a dict of property name to (minimum, maximum) - terms are separated
+# by commas and are either a range "name a-b" or a comparison "name<b", "name<=b", "name>a", "name>=a" or "name=a"
+def parse_query(query: str):
+    ranges = {}
+    number = r'([-+]?\d*\.?\d+)'
+    for term in query.split(','):
+        term = term.strip().lower()
+        if not term:
+            continue
+        # strip units
+        term = re.sub(r'\s*(mm|deg|°)', '', term)
+        match = re.fullmatch(r'([a-z_\-\.#]+)\s*' + number + r'\s*(?:-|–|to)\s*' + number, term)
+        if match:
+            bounds = (float(match.group(2)), float(match.group(3)))
+        else:
+            match = re.fullmatch(r'([a-z_\-\.#]+)\s*(<=|>=|<|>|=)\s*' + number, term)
+            if not match:
+                raise ValueError("Invalid lens query term '" + term + "'.")
+            value = float(match.group(3))
+            bounds = {'<': (None, value), '<=': (None, value), '>': (value, None), '>=': (value, None), '=': (value, value)}[match.group(2)]
+        name = match.group(1).replace('-', '_').replace('.', '').replace('#', '')
+        if name not in query_aliases:
+            raise ValueError("Unknown lens property '" + name + "'.")
+        ranges[query_aliases[name]] = bounds
+    return ranges
+
+# returns the sorted names of all lens files whose properties lie within the given ranges - the query is either a query
+# string (see parse_query) or a dict of property name to (minimum, maximum) with None for open bounds
+def query_lenses(query, lens_directory: str = None):
+    ranges = parse_query(query) if isinstance(query, str) else query
+    result = []
+    for lens_file, properties in lens_index(lens_directory).items():
+        matches = True
+        for name, (minimum, maximum) in ranges.items():
+            value = properties[name]
+            if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+                matches = False
+                break
+        if matches:
+            result.append(lens_file)
+    return sorted(result)
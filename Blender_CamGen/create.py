@@ -8,24 +8,55 @@ import mathutils
 import numpy as np
 import inspect
 
+from collections import OrderedDict
+
 from . import calc
 from . import data
 
 from typing import Any, List, Dict, Tuple
 
+# maximum number of cached lens surface meshes - the least recently used mesh is released first
+max_cached_surface_meshes = 64
+# version of the lens surface meshes, meshes cached with another version are not reused
+surface_mesh_version = 1
+
+# names of the cached lens surface meshes by surface key
+surface_meshes = OrderedDict()
+# True once the meshes of the blend file were scanned for cached lens surfaces, see scan_surface_meshes
+surface_meshes_scanned = False
+
 # ------------------------------------------------------------------------
 #    Helper functions
 # ------------------------------------------------------------------------
 
-# creates a circle mesh
-def add_circle(config: Dict[str, Any]) -> bpy.types.Object:
-    bpy.ops.mesh.primitive_circle_add(**config['defaults'])
-    circle: bpy.types.Object = bpy.context.active_object
-    for setting, value in config.items():
-        if setting is 'defaults':
-            continue
-        setattr(circle, setting, value)
-    return circle
+# converts (faces, k) vertex indices of faces with k vertices into loop vertex indices, loop starts and loop totals
+def face_loops(faces):
+    faces = np.asarray(faces, dtype=np.int32)
+    loop_totals = np.full(len(faces), faces.shape[1], dtype=np.int32)
+    return faces.ravel(), np.arange(len(faces), dtype=np.int32) * faces.shape[1], loop_totals
+
+# loads vertices, faces and optional per loop uv coordinates into an empty mesh - all data is passed to foreach_set as
+# contiguous float32/int32 buffers, i.e. without creating Python objects per vertex or face
+def fill_mesh(mesh: bpy.types.Mesh, vertices, loop_vertices, loop_starts, loop_totals, loop_uvs=None) -> bpy.types.Mesh:
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set('co', np.ascontiguousarray(vertices, dtype=np.float32).ravel())
+    mesh.loops.add(len(loop_vertices))
+    mesh.loops.foreach_set('vertex_index', np.ascontiguousarray(loop_vertices, dtype=np.int32))
+    mesh.polygons.add(len(loop_starts))
+    mesh.polygons.foreach_set('loop_start', np.ascontiguousarray(loop_starts, dtype=np.int32))
+    mesh.polygons.foreach_set('loop_total', np.ascontiguousarray(loop_totals, dtype=np.int32))
+    if loop_uvs is not None:
+        uv_layer = mesh.uv_layers.new(name='UVMap')
+        uv_layer.data.foreach_set('uv', np.ascontiguousarray(loop_uvs, dtype=np.float32).ravel())
+    mesh.update(calc_edges=True)
+    return mesh
+
+# creates a new object with a new mesh filled with the given data (see fill_mesh) and links it to the collection
+def add_mesh_object(name: str, collection: bpy.types.Collection, vertices, loop_vertices, loop_starts, loop_totals, loop_uvs=None) -> bpy.types.Object:
+    mesh = fill_mesh(bpy.data.meshes.new(name), vertices, loop_vertices, loop_starts, loop_totals, loop_uvs)
+    mesh_object = bpy.data.objects.new(name, mesh)
+    collection.objects.link(mesh_object)
+    return mesh_object
 
 # creates refraction material for glasses
 def add_glass_material(name: str, ior: float, normal_recalculation: bool) -> bpy.types.Material:
@@ -40,114 +71,9 @@ def add_glass_material(name: str, ior: float, normal_recalculation: bool) -> bpy
         glass_material.node_tree.links.remove(glass_material.node_tree.nodes['Vector Transform.002'].outputs[0].links[0]) # reflection link
     return glass_material
 
-# finds the outer vertex, i.e. the vertex with the largest z value
-def find_outer_vertex(vertices: bpy.types.MeshVertices) -> bpy.types.MeshVertex:
-    outer_vertex = vertices[0]
-    for vertex in vertices:
-        if vertex.co.z > outer_vertex.co.z:
-            outer_vertex = vertex
-    return outer_vertex
-
-# ------------------------------------------------------------------------
-#    Single component creation
-# ------------------------------------------------------------------------
-
-# creates a flat surface for lenses without curvature
-def flat_surface(half_lens_height: float, ior: float, position: float, name: str) -> List[float]:
-    circle: bpy.types.Object = add_circle({
-        'defaults': {
-            'vertices': 64,
-            'radius': half_lens_height,
-            'fill_type': 'TRIFAN',
-            'calc_uvs': False,
-            'location': (0, 0, 0),
-            'rotation': (0, -math.pi / 2, 0)
-        },
-        'name': name,
-        'parent': bpy.data.objects['Objective']
-    })
-
-    bpy.ops.object.transform_apply()
-    circle.location[0] = position
-
-    circle.data.materials.append(add_glass_material(name, ior, False))
-
-    # flip normals
-    bpy.ops.object.mode_set(mode="EDIT")
-    bpy.ops.mesh.select_all(action='SELECT')
-    bpy.ops.mesh.flip_normals()
-
-    bpy.ops.object.mode_set(mode="OBJECT")
-
-    outer_vertex: bpy.types.MeshVertex = find_outer_vertex(circle.data.vertices)
-    return [outer_vertex.co.x, outer_vertex.co.y, outer_vertex.co.z]
-
-# creates a spherical lens surface by rotating a circle section - this leads to non-uniformly distributed vertices!
-def rotational_lens_surface(vertex_count_height: int, vertex_count_radial: int, surface_radius: float, half_lens_height: float, ior: float, position: float, name: str) -> List[float]:
-    flip = False
-    if surface_radius < 0.0:
-        flip = True
-        surface_radius = -1.0 * surface_radius
-
-    circle: bpy.types.Object = add_circle({
-        'defaults': {
-            'vertices': calc.number_of_vertices(half_lens_height, surface_radius, vertex_count_height),
-            'radius': surface_radius,
-            'location': (0, 0, 0)
-        }
-    })
-
-    # TODO: Refactor
-    bpy.ops.object.transform_apply()
-    bpy.ops.object.mode_set(mode="EDIT")
-    bpy.ops.mesh.select_all(action='DESELECT')
-    bpy.ops.object.mode_set(mode="OBJECT")
-    circle.data.vertices[0].co.x = 0.0
-    # select all vertices that should be deleted
-    for vertex in circle.data.vertices:
-        if (vertex.co.y < surface_radius - calc.sagitta(half_lens_height, surface_radius)) or (vertex.co.x > 0.0):
-            vertex.select = True
-    bpy.ops.object.mode_set(mode="EDIT")
-    bpy.ops.mesh.delete(type='VERT')
-    # select all remaining vertices to create a rotational surface
-    bpy.ops.mesh.select_all(action='SELECT')
-    # use the spin operator to create the rotational surface
-    bpy.ops.mesh.spin(steps=vertex_count_radial,
-                      angle=2.0*math.pi, axis=(0, 1, 0))
-    # remove double vertices resulting from the spinning
-    bpy.ops.mesh.select_all(action='SELECT')
-    bpy.ops.mesh.remove_doubles(threshold=0.0)
-    # flip normals for a convex surface
-    if not flip:
-        bpy.ops.mesh.select_all(action='SELECT')
-        bpy.ops.mesh.flip_normals()
-    bpy.ops.object.mode_set(mode="OBJECT")
-    # move to correct position
-    circle.rotation_euler[0] = math.pi/2.0
-    if flip:
-        circle.rotation_euler[1] = math.pi/2.0
-    else:
-        circle.rotation_euler[1] = -math.pi/2.0
-    bpy.ops.object.transform_apply()
-    circle.location[0] = position
-    # rename object and move it to 'Objective' empty
-    circle.name = name
-    circle.parent = bpy.data.objects['Objective']
-    # add glass material
-    circle.data.materials.append(add_glass_material(name, ior, True))
-    # return the outer vertex for housing creation
-    bpy.ops.object.mode_set(mode="OBJECT")
-    outer_vertex: bpy.types.MeshVertex = find_outer_vertex(circle.data.vertices)
-    return [outer_vertex.co.x, outer_vertex.co.y, outer_vertex.co.z]
-
-# creates a spherical lens surface with uniformly distributed vertices
-def uniform_lens_surface(edgelength_target: float, sphere_radius: float, half_lens_height: float, ior: float, position: float, name: str):
-    # check lens direction
-    flip = False
-    if sphere_radius < 0.0:
-        flip = True
-        sphere_radius = -1.0 * sphere_radius
-
+# calculates a spherical cap with uniformly distributed vertices on rings around the sphere tip - returns the (N, 3)
+# vertices, the (N, 2) uv coordinates, the (M, 3) int32 triangle indices (right hand order) and the vertex count per ring
+def uniform_sphere_cap(edgelength_target: float, sphere_radius: float, half_lens_height: float):
     # distance between sphere center and bottom of sphere segment
     cut_length = calc.sagitta(half_lens_height, sphere_radius) - sphere_radius
     # radius of most outer slice
@@ -157,290 +83,421 @@ def uniform_lens_surface(edgelength_target: float, sphere_radius: float, half_le
 
     # number of rings (including single-vertex sphere tip)
     ring_count = math.ceil(sphere_radius * sphere_angle / edgelength_target) + 1
-    # radius of ring as 2D-slice
-    ring_radii = np.zeros(ring_count)
-    ring_heights = np.zeros(ring_count)
-    ring_vert_counts = np.zeros(ring_count)
-    # number of vertices for each ring
-    for ring_idx in range(0,ring_count):
-        # radius of ring as 2D-slice
-        ring_radii[ring_idx] = sphere_radius * math.sin( sphere_angle * ring_idx /(ring_count-1) )
-        # height from sphere center of ring as 2D-slice
-        ring_heights [ring_idx] = sphere_radius * math.cos( sphere_angle* ring_idx /(ring_count-1) )
-        # number of vertices for each ring
-        ring_vert_counts[ring_idx] = max(math.ceil(2 * math.pi * ring_radii[ring_idx] / edgelength_target), 1)
-    
+    ring_ids = np.arange(ring_count)
+    # radius and height from sphere center of each ring as 2D-slice
+    ring_radii = sphere_radius * np.sin(sphere_angle * ring_ids / (ring_count-1))
+    ring_heights = sphere_radius * np.cos(sphere_angle * ring_ids / (ring_count-1))
+    # number of vertices for each ring and index of its first vertex
+    ring_vert_counts = np.maximum(np.ceil(2 * math.pi * ring_radii / edgelength_target), 1).astype(np.int32)
+    ring_offsets = np.concatenate(([0], np.cumsum(ring_vert_counts)[:-1])).astype(np.int32)
     # approx triangle edge lengths per ring as radian
     ring_angles = 2 * math.pi / ring_vert_counts
 
-    # overall vertex count
-    vert_count = int(np.sum(ring_vert_counts))
-    # 3-space vertex positions
-    vertices = np.zeros((3, vert_count))
+    # ring and index within the ring of all vertices except the sphere tip
+    vert_ring = np.repeat(ring_ids[1:], ring_vert_counts[1:])
+    vert_idx = np.arange(vert_ring.size, dtype=np.int32) + 1 - ring_offsets[vert_ring]
+    angles = vert_idx * ring_angles[vert_ring]
+
+    # first level is center vertex, radius 0, height of the first ring
+    vertices = np.empty((vert_ring.size + 1, 3))
+    vertices[0] = [0, 0, ring_heights[1]]
+    vertices[1:, 0] = ring_radii[vert_ring] * np.cos(angles)
+    vertices[1:, 1] = ring_radii[vert_ring] * np.sin(angles)
+    vertices[1:, 2] = ring_heights[vert_ring]
     # per vertex texture map coordinates in uv format
-    vertex_uvs = np.zeros((2, vert_count))
-    # triangle index list, right hand order
-    triangles = np.zeros((3, 4*vert_count)) # worst case: one vertex generates 4 triangles
-
-    # first level is center vertex, radius 0, height = sphere_radius
-    vertices[:, 0] = [0, 0, ring_heights[1]]
-    # debug vertex count
-    written_verts = 1
-    # for all rings, add vertices corresponding ring vertex count
-    for ring_idx in range(1, ring_count):
-        ring_vert_count = int(ring_vert_counts[ring_idx])
-        for vert_idx in range(0, ring_vert_count):
-            # ring has radius ring_radii(ring_idx) and height ring_heights(ring_idx)
-            vertices[:, written_verts+vert_idx] = [ring_radii[ring_idx] * math.cos(vert_idx * ring_angles[ring_idx]), ring_radii[ring_idx] * math.sin(vert_idx*ring_angles[ring_idx]),ring_heights[ring_idx]]
-            vertex_uvs[:, written_verts+vert_idx] = [(ring_idx-1)/(ring_count-1) * 0.5 *math.cos(vert_idx*ring_angles[ring_idx]) + 0.5, (ring_idx-1)/(ring_count-1) * 0.5 * math.sin(vert_idx*ring_angles[ring_idx]) + 0.5]
-        written_verts = written_verts + ring_vert_count
-    if written_verts != vert_count:
-        raise ValueError('Vertex count missmatch!')
-
-    # for all rings except sphere tip, create triangle indices depending on circle segment vertex distance
-    written_tris = -1
-    for ring_idx in range(1, ring_count):
-        ring_vert_count = ring_vert_counts[ring_idx]
-        ring_vert_id_offset = np.sum(ring_vert_counts[0:ring_idx])
-        last_ring_vert_count = ring_vert_counts[ring_idx-1]
-        if ring_idx > 1:
-            last_ring_vert_idx_offset = np.sum(ring_vert_counts[0:ring_idx-1])
+    vertex_uvs = np.empty((vert_ring.size + 1, 2))
+    vertex_uvs[0] = [0, 0]
+    uv_radii = (vert_ring - 1) / (ring_count - 1) * 0.5
+    vertex_uvs[1:, 0] = uv_radii * np.cos(angles) + 0.5
+    vertex_uvs[1:, 1] = uv_radii * np.sin(angles) + 0.5
+
+    # every vertex draws edges to its right neighbor and to the closest vertices of the previous ring
+    ring_vert_count = ring_vert_counts[vert_ring]
+    last_ring_vert_count = ring_vert_counts[vert_ring - 1]
+    active_vert_idx = ring_offsets[vert_ring] + vert_idx
+    next_active_vert_idx = ring_offsets[vert_ring] + (vert_idx + 1) % ring_vert_count
+    # get projection of active vertex to index range of previous ring - idx_1 and idx_2 are vertices in previous ring
+    # closest to active vertex
+    projected_idx = last_ring_vert_count * vert_idx.astype(np.float64) / ring_vert_count
+    idx_1 = np.floor(projected_idx).astype(np.int32)
+    # distance between fractional projection and floored index
+    dist = projected_idx - idx_1
+    idx_2 = ring_offsets[vert_ring - 1] + (idx_1 + 1) % last_ring_vert_count
+    idx_1 = ring_offsets[vert_ring - 1] + idx_1
+    # previous ring has only a single vertex
+    single = last_ring_vert_count == 1
+    # the previous vertex of the ring has already drawn to the same left vertex of the previous ring
+    repeated = np.zeros(vert_ring.size, dtype=bool)
+    repeated[1:] = (idx_1[1:] == idx_1[:-1]) & (vert_idx[1:] > 0)
+    repeated &= ~single
+
+    # first triangle: active, right of active and the closer (or right, if repeated) vertex of the previous ring
+    first = np.column_stack((active_vert_idx, next_active_vert_idx, np.where(single | (~repeated & (dist < 0.5)), idx_1, idx_2)))
+    # second triangle closing the gap to the previous ring
+    second = np.where((dist < 0.5)[:, None],
+                      np.column_stack((next_active_vert_idx, idx_2, idx_1)),
+                      np.column_stack((active_vert_idx, idx_2, idx_1)))
+    has_second = ~single & ~repeated
+    triangles = np.stack((first, second), axis=1)[np.column_stack((np.ones(vert_ring.size, dtype=bool), has_second))]
+    return vertices, vertex_uvs, triangles.astype(np.int32), ring_vert_counts
+
+# revolves the (N, 3) profile polyline around the x axis in the given number of steps like the spin operator - profile
+# vertices on the axis are kept once, segments touching the axis become triangles. Returns the vertices and the loop
+# vertex indices, loop starts and loop totals of the faces, whose normals point to the axis for a profile running
+# along +x at positive z
+def revolve_profile(profile, steps: int):
+    profile = np.asarray(profile, dtype=np.float64).reshape(-1, 3)
+    on_axis = (profile[:, 1] == 0.0) & (profile[:, 2] == 0.0)
+    # rotations of the spin steps about the x axis (negative angle direction as the spin operator)
+    angles = -2.0 * math.pi * np.arange(steps) / steps
+    cos, sin = np.cos(angles), np.sin(angles)
+
+    # vertex indices of all profile vertices per step - vertices on the axis share one index
+    counts = np.where(on_axis, 1, steps)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    indices = np.where(on_axis[:, None], offsets[:, None], offsets[:, None] + np.arange(steps))
+    vertices = np.empty((int(np.sum(counts)), 3))
+    vertices[:, 0] = np.repeat(profile[:, 0], counts)
+    vertices[:, 1] = np.concatenate([[y] if axis else y * cos - z * sin for (_, y, z), axis in zip(profile, on_axis)])
+    vertices[:, 2] = np.concatenate([[z] if axis else y * sin + z * cos for (_, y, z), axis in zip(profile, on_axis)])
+
+    # faces between consecutive profile vertices and steps
+    faces = []
+    for i in range(len(profile) - 1):
+        current, following = indices[i], indices[i + 1]
+        current_next, following_next = np.roll(current, -1), np.roll(following, -1)
+        if on_axis[i] and on_axis[i + 1]:
+            continue
+        if on_axis[i]:
+            faces.append(np.column_stack((following, current, following_next)))
+        elif on_axis[i + 1]:
+            faces.append(np.column_stack((following, current, current_next)))
         else:
-            # for first run offset is 0 for sphere tip vertex
-            last_ring_vert_idx_offset = 0
-
-        # keep track of indices to processed vertices in previous ring
-        last_idx_1 = 0
-
-        for vert_idx in range(0, int(ring_vert_count)):
-            # index of active vertex edges are drawn from
-            active_vert_idx = ring_vert_id_offset + vert_idx
-            # index of first vertex in ring after active one
-            next_active_vert_idx = ring_vert_id_offset + ((vert_idx + 1) % ring_vert_count)
-
-            # get projection of active vertex to index range of previous ring
-            projected_idx = last_ring_vert_count * float(vert_idx) / ring_vert_count
-            # idx_1 and idx_2 are vertices in previous ring closest to active vertex
-            idx_1 = math.floor( projected_idx )
-            # distance between fractional projection and floored index
-            dist = projected_idx - idx_1
-            # make indices relative to previous ring index offset
-            idx_2 = (idx_1 + 1) % last_ring_vert_count
-            idx_1 = last_ring_vert_idx_offset + idx_1
-            idx_2 = last_ring_vert_idx_offset + idx_2
-
-            written_tris = written_tris+1
-            if idx_1 == idx_2:
-                # previous ring has only a single vertex
-                triangles[:, written_tris] = [active_vert_idx, next_active_vert_idx, idx_1]
-            else:
-                if last_idx_1 == idx_1:
-                    # last step has drawn
-                    triangles[:, written_tris] = [active_vert_idx, next_active_vert_idx, idx_2]
-                else:
-                    if dist < 0.5:
-                        # 'left' previous ring vertex is closer to index projection
-                        # create triangle active, right of active, left in previous ring
-                        triangles[:, written_tris] = [active_vert_idx, next_active_vert_idx, idx_1]
-                        # create triangle right of active, right in previous ring, left in previous ring
-                        written_tris = written_tris+1
-                        triangles[:, written_tris] = [next_active_vert_idx, idx_2, idx_1]
-                    else:
-                        # 'right' previous ring vertex is closer to index projection
-                        # create triangle active, right of active, right in previous ring
-                        triangles[:, written_tris] = [active_vert_idx, next_active_vert_idx, idx_2]
-                        # create triangle active, right in previous ring, left in previous ring
-                        written_tris = written_tris+1
-                        triangles[:, written_tris] = [active_vert_idx, idx_2, idx_1]
-            # update last used previous ring indices
-            last_idx_1 = idx_1
-
-    # create new mesh and object
-    lens_mesh = bpy.data.meshes.new(name)
-    lens_object = bpy.data.objects.new(name, lens_mesh)
-    camera_collection = bpy.data.collections.get("Camera Collection")
-    camera_collection.objects.link(lens_object)
-    bpy.context.view_layer.objects.active = lens_object
-    # convert vertex and triangle data to Blender compatible format
-    vertices_vec = []
-    triangles_int = []
-    for vert_idx in range(0, vert_count):
-        vertices_vec.append(mathutils.Vector((vertices[0,vert_idx],vertices[1,vert_idx],vertices[2,vert_idx])))
-    for tri_idx in range(0, written_tris + 1):
-        triangles_int.append([int(triangles[0,tri_idx]), int(triangles[1,tri_idx]), int(triangles[2,tri_idx])])
-    # create mesh from the calculated and converted data
-    lens_mesh.from_pydata(vertices_vec,[],triangles_int)
-
-    # rotate the lens and flip normals according to its orientation
-    if flip:
-        lens_object.rotation_euler[1] = math.pi/2
+            faces.append(np.column_stack((following, current, current_next, following_next)))
+
+    loop_vertices = np.concatenate([face.ravel() for face in faces] + [np.zeros(0)]).astype(np.int32)
+    loop_totals = np.concatenate([np.full(len(face), face.shape[1]) for face in faces] + [np.zeros(0)]).astype(np.int32)
+    loop_starts = (np.cumsum(loop_totals) - loop_totals).astype(np.int32)
+    return vertices, loop_vertices, loop_starts, loop_totals
+
+# calculates the angles from the tip of the circle vertices within the lens height for a circle with vertex_count_height
+# vertices per half circle
+def circle_profile_angles(vertex_count_height: int, surface_radius: float, half_lens_height: float):
+    circle_vertex_count = calc.number_of_vertices(half_lens_height, surface_radius, vertex_count_height)
+    profile_angles = 2.0 * math.pi * np.arange(circle_vertex_count // 2 + 1) / circle_vertex_count
+    return profile_angles[surface_radius * np.cos(profile_angles) >= surface_radius - calc.sagitta(half_lens_height, surface_radius)]
+
+# calculates a spherical lens surface by revolving the circle vertices at the given profile angles from the tip around
+# the optical axis - the tip points to -x, or to +x for flipped lenses, and the normals point to +x as for uniform surfaces
+def revolved_sphere_cap(profile_angles, vertex_count_radial: int, surface_radius: float, flip: bool):
+    direction = 1.0 if flip else -1.0
+
+    # profile from the tip to the lens rim in the x/z plane - mirroring it for flipped lenses keeps the normals at +x
+    profile = np.zeros((len(profile_angles), 3))
+    profile[:, 0] = direction * surface_radius * np.cos(profile_angles)
+    profile[:, 2] = direction * surface_radius * np.sin(profile_angles)
+    return revolve_profile(profile, vertex_count_radial)
+
+# ------------------------------------------------------------------------
+#    Lens surface mesh cache
+# ------------------------------------------------------------------------
+
+# creates the cache key of a lens surface mesh from the creation method and its parameters - lengths are rounded to 1nm,
+# i.e. equal surfaces of symmetric designs share one mesh
+def surface_mesh_key(method: str, *parameters) -> str:
+    values = [str(round(parameter, 9)) if isinstance(parameter, float) else str(parameter) for parameter in parameters]
+    return ';'.join([str(surface_mesh_version), method] + values)
+
+# rebuilds the surface key to mesh name map from the key properties of all meshes, i.e. also meshes cached before the
+# addon or the blend file was reloaded are found - meshes not in the map yet count as least recently used
+def scan_surface_meshes():
+    global surface_meshes_scanned
+    mesh_names = {mesh['camgen_surface_key']: mesh.name for mesh in bpy.data.meshes if 'camgen_surface_key' in mesh}
+    used_keys = [key for key in surface_meshes if key in mesh_names]
+    surface_meshes.clear()
+    for key in [key for key in mesh_names if key not in used_keys] + used_keys:
+        surface_meshes[key] = mesh_names[key]
+    surface_meshes_scanned = True
+
+# forgets the surface key to mesh name map, e.g. after loading a blend file - the meshes are scanned again on the next miss
+def reset_surface_meshes():
+    global surface_meshes_scanned
+    surface_meshes.clear()
+    surface_meshes_scanned = False
+
+# returns the cached mesh of the given surface key or None - the meshes are scanned on the first miss and whenever a
+# mapped mesh was renamed or removed, other misses are answered from the map
+def cached_surface_mesh(key: str) -> bpy.types.Mesh:
+    mesh = bpy.data.meshes.get(surface_meshes.get(key, ''))
+    if mesh is None or mesh.get('camgen_surface_key') != key:
+        if key in surface_meshes or not surface_meshes_scanned:
+            scan_surface_meshes()
+        mesh = bpy.data.meshes.get(surface_meshes.get(key, ''))
+        if mesh is None:
+            return None
+    surface_meshes.move_to_end(key)
+    return mesh
+
+# adds a lens surface mesh to the cache - the fake user keeps it when the camera is deleted, the outer vertex, the
+# number of outer vertices for housing creation and the deviation from the sphere are saved with the mesh
+def cache_surface_mesh(key: str, mesh: bpy.types.Mesh, outer_vertex: List[float], housing_vertex_count: int = 0, deviation: float = 0.0):
+    mesh['camgen_surface_key'] = key
+    mesh['camgen_outer_vertex'] = outer_vertex
+    mesh['camgen_housing_vertex_count'] = housing_vertex_count
+    mesh['camgen_max_deviation'] = deviation
+    mesh.use_fake_user = True
+    surface_meshes[key] = mesh.name
+    while len(surface_meshes) > max_cached_surface_meshes:
+        release_surface_mesh(surface_meshes.popitem(last=False)[1])
+
+# releases a cached lens surface mesh - it is deleted now or with the last object using it
+def release_surface_mesh(mesh_name: str):
+    mesh = bpy.data.meshes.get(mesh_name)
+    if mesh is None:
+        return
+    mesh.use_fake_user = False
+    if mesh.users == 0:
+        bpy.data.meshes.remove(mesh)
+
+# releases all cached lens surface meshes, including meshes cached before the addon was reloaded
+def clear_surface_meshes():
+    mesh_names = set(surface_meshes.values())
+    mesh_names.update(mesh.name for mesh in bpy.data.meshes if 'camgen_surface_key' in mesh)
+    reset_surface_meshes()
+    for mesh_name in mesh_names:
+        release_surface_mesh(mesh_name)
+
+
+# ------------------------------------------------------------------------
+#    Lens surface meshes
+# ------------------------------------------------------------------------
+
+# creates the mesh of a flat surface - triangle fan of a circle with 64 vertices in the y/z plane, normals pointing
+# to +x. Returns the mesh and the outer vertex, i.e. the vertex with the largest z value, for housing creation
+def flat_surface_mesh(half_lens_height: float) -> Tuple[bpy.types.Mesh, List[float]]:
+    angles = 2.0 * math.pi * np.arange(64) / 64
+    vertices = np.zeros((65, 3))
+    vertices[:64, 1] = half_lens_height * np.cos(angles)
+    vertices[:64, 2] = -half_lens_height * np.sin(angles)
+    rim = np.arange(64, dtype=np.int32)
+    mesh = fill_mesh(bpy.data.meshes.new('Lens Surface Mesh'), vertices,
+                     *face_loops(np.column_stack((np.full(64, 64), np.roll(rim, -1), rim))))
+    return mesh, vertices[int(np.argmax(vertices[:, 2]))].tolist()
+
+# creates the mesh of a spherical lens surface by rotating a circle section - this leads to non-uniformly distributed
+# vertices! Returns the mesh and the outer vertex for housing creation
+def rotational_surface_mesh(vertex_count_height: int, vertex_count_radial: int, surface_radius: float, half_lens_height: float) -> Tuple[bpy.types.Mesh, List[float]]:
+    profile_angles = circle_profile_angles(vertex_count_height, abs(surface_radius), half_lens_height)
+    vertices, loop_vertices, loop_starts, loop_totals = revolved_sphere_cap(profile_angles, vertex_count_radial, abs(surface_radius), surface_radius < 0.0)
+    mesh = fill_mesh(bpy.data.meshes.new('Lens Surface Mesh'), vertices, loop_vertices, loop_starts, loop_totals)
+    return mesh, vertices[int(np.argmax(vertices[:, 2]))].tolist()
+
+# creates the mesh of a spherical lens surface with uniformly distributed vertices - returns the mesh, the outer vertex
+# and the number of vertices of the outer ring for housing creation
+def uniform_surface_mesh(edgelength_target: float, sphere_radius: float, half_lens_height: float) -> Tuple[bpy.types.Mesh, List[float], int]:
+    cap_vertices, vertex_uvs, triangles, ring_vert_counts = uniform_sphere_cap(edgelength_target, abs(sphere_radius), half_lens_height)
+
+    # rotate the lens such that its tip points to -x, or to +x for flipped lenses, and let the normals point to +x
+    if sphere_radius < 0.0:
+        vertices = np.column_stack((cap_vertices[:, 2], cap_vertices[:, 1], -cap_vertices[:, 0]))
     else:
-        lens_object.rotation_euler[1] = -math.pi/2
-        bpy.ops.object.mode_set(mode="EDIT")
-        bpy.ops.mesh.flip_normals()
-    # set the lens position
-    bpy.ops.object.mode_set(mode="OBJECT")
-    bpy.ops.object.transform_apply()
+        vertices = np.column_stack((-cap_vertices[:, 2], cap_vertices[:, 1], cap_vertices[:, 0]))
+        triangles = triangles[:, ::-1]
+
+    loop_vertices, loop_starts, loop_totals = face_loops(triangles)
+    mesh = fill_mesh(bpy.data.meshes.new('Lens Surface Mesh'), vertices, loop_vertices, loop_starts, loop_totals, vertex_uvs[loop_vertices])
+
+    # the outer vertex is the first vertex of the outer ring
+    outer_vertex_id = int(np.sum(ring_vert_counts[:-1]))
+    return mesh, [float(vertices[outer_vertex_id, 0]), 0.0, float(cap_vertices[outer_vertex_id, 0])], int(ring_vert_counts[-1])
+
+
+# creates the mesh of a spherical lens surface by rotating a circle section with the fewest triangles deviating at most
+# max_deviation from the sphere - returns the mesh, the outer vertex, the number of radial steps and the achieved deviation
+def adaptive_surface_mesh(max_deviation: float, surface_radius: float, half_lens_height: float) -> Tuple[bpy.types.Mesh, List[float], int, float]:
+    profile_angles, vertex_count_radial, deviation = calc.adaptive_tessellation(half_lens_height, surface_radius, max_deviation)
+    vertices, loop_vertices, loop_starts, loop_totals = revolved_sphere_cap(profile_angles, vertex_count_radial, abs(surface_radius), surface_radius < 0.0)
+    mesh = fill_mesh(bpy.data.meshes.new('Lens Surface Mesh'), vertices, loop_vertices, loop_starts, loop_totals)
+    return mesh, vertices[int(np.argmax(vertices[:, 2]))].tolist(), vertex_count_radial, deviation
+
+
+# ------------------------------------------------------------------------
+#    Single component creation
+# ------------------------------------------------------------------------
+
+# creates a lens surface object with the given mesh in the objective - the material is linked to the object since
+# surfaces of different glasses share the same mesh
+def lens_surface_object(mesh: bpy.types.Mesh, ior: float, position: float, name: str, normal_recalculation: bool) -> bpy.types.Object:
+    if len(mesh.materials) == 0:
+        mesh.materials.append(None)
+    lens_object = bpy.data.objects.new(name, mesh)
+    bpy.data.collections.get("Camera Collection").objects.link(lens_object)
+    # move to correct position
     lens_object.location[0] = position
-    # set parent
+    # move it to 'Objective' empty
     lens_object.parent = bpy.data.objects['Objective']
     # add glass material
-    lens_object.data.materials.append(add_glass_material(name, ior, True))
+    lens_object.material_slots[0].link = 'OBJECT'
+    lens_object.material_slots[0].material = add_glass_material(name, ior, normal_recalculation)
+    return lens_object
+
+# creates a flat surface for lenses without curvature
+def flat_surface(half_lens_height: float, ior: float, position: float, name: str) -> List[float]:
+    key = surface_mesh_key('FLAT', half_lens_height)
+    mesh = cached_surface_mesh(key)
+    if mesh is None:
+        mesh, outer_vertex = flat_surface_mesh(half_lens_height)
+        cache_surface_mesh(key, mesh, outer_vertex)
+    lens_surface_object(mesh, ior, position, name, False)
+    # return the outer vertex for housing creation
+    return list(mesh['camgen_outer_vertex'])
+
+# creates a spherical lens surface by rotating a circle section
+def rotational_lens_surface(vertex_count_height: int, vertex_count_radial: int, surface_radius: float, half_lens_height: float, ior: float, position: float, name: str) -> List[float]:
+    key = surface_mesh_key('RADIAL', surface_radius, half_lens_height, vertex_count_height, vertex_count_radial)
+    mesh = cached_surface_mesh(key)
+    if mesh is None:
+        mesh, outer_vertex = rotational_surface_mesh(vertex_count_height, vertex_count_radial, surface_radius, half_lens_height)
+        cache_surface_mesh(key, mesh, outer_vertex)
+    lens_surface_object(mesh, ior, position, name, True)
+    # return the outer vertex for housing creation
+    return list(mesh['camgen_outer_vertex'])
+
+# creates a spherical lens surface with uniformly distributed vertices
+def uniform_lens_surface(edgelength_target: float, sphere_radius: float, half_lens_height: float, ior: float, position: float, name: str) -> List[float]:
+    key = surface_mesh_key('UNIFORM', sphere_radius, half_lens_height, edgelength_target)
+    mesh = cached_surface_mesh(key)
+    if mesh is None:
+        mesh, outer_vertex, outer_ring_count = uniform_surface_mesh(edgelength_target, sphere_radius, half_lens_height)
+        cache_surface_mesh(key, mesh, outer_vertex, outer_ring_count)
+    lens_surface_object(mesh, ior, position, name, True)
 
     # save min number of outer ring vertices for housing creation
-    data.num_radial_housing_vertices = min(data.num_radial_housing_vertices, int(ring_vert_counts[ring_count-1]))
+    data.num_radial_housing_vertices = min(data.num_radial_housing_vertices, mesh['camgen_housing_vertex_count'])
+    # return the outer vertex for housing creation
+    return list(mesh['camgen_outer_vertex'])
+
+# creates a spherical lens surface by rotating a circle section with the fewest triangles deviating at most
+# max_deviation from the sphere
+def adaptive_lens_surface(max_deviation: float, surface_radius: float, half_lens_height: float, ior: float, position: float, name: str) -> List[float]:
+    key = surface_mesh_key('ADAPTIVE', surface_radius, half_lens_height, max_deviation)
+    mesh = cached_surface_mesh(key)
+    if mesh is None:
+        mesh, outer_vertex, vertex_count_radial, deviation = adaptive_surface_mesh(max_deviation, surface_radius, half_lens_height)
+        cache_surface_mesh(key, mesh, outer_vertex, vertex_count_radial, deviation)
+    lens_surface_object(mesh, ior, position, name, True)
 
-    # calculate outer vertex for housing creation
-    outer_vertex_id = int(np.sum(ring_vert_counts[0:ring_count-1]))
-    if flip:
-        outer_vert = [vertices[2, outer_vertex_id], 0, vertices[0, outer_vertex_id]]
-    else:
-        outer_vert = [-vertices[2, outer_vertex_id], 0, vertices[0, outer_vertex_id]]
-    return outer_vert
+    # save min number of outer ring vertices for housing creation
+    data.num_radial_housing_vertices = min(data.num_radial_housing_vertices, mesh['camgen_housing_vertex_count'])
+    # return the outer vertex for housing creation
+    return list(mesh['camgen_outer_vertex'])
+
+# calculates the housing profile from the outer lens vertices to the back of the camera on the optical axis
+def housing_profile(outer_vertices, outer_lens_index):
+    profile = np.zeros((len(outer_vertices) + 3, 3))
+    # outer lens vertices
+    profile[:len(outer_vertices)] = outer_vertices
+    profile[:len(outer_vertices), 0] += data.lens_system.center[outer_lens_index]
+    # camera housing vertices
+    last = profile[len(outer_vertices) - 1]
+    profile[len(outer_vertices)] = [last[0], last[1], 1.5 * last[2]]
+    profile[len(outer_vertices) + 1] = profile[len(outer_vertices)]
+    profile[len(outer_vertices) + 1, 0] += max(3.0 * data.lens_system.thickness[-1], last[0] - profile[0, 0])
+    profile[len(outer_vertices) + 2, 0] = profile[len(outer_vertices) + 1, 0]
+    return profile
 
 # creates the objective and camera housing
 def housing(outer_vertices, outer_lens_index, vertex_count_radial):
-    bpy.data.meshes['Housing Mesh'].vertices.add(len(outer_vertices)+3)
-    # add outer lens vertices to mesh
-    for i in range(0, len(outer_vertices)):
-        bpy.data.meshes['Housing Mesh'].vertices[i].co.x = outer_vertices[i][0] + \
-            data.objective[outer_lens_index[i]]['position']
-        bpy.data.meshes['Housing Mesh'].vertices[i].co.y = outer_vertices[i][1]
-        bpy.data.meshes['Housing Mesh'].vertices[i].co.z = outer_vertices[i][2]
-
-    # add camera housing vertices to mesh
-    bpy.data.meshes['Housing Mesh'].vertices[len(
-        outer_vertices)].co.x = bpy.data.meshes['Housing Mesh'].vertices[len(outer_vertices)-1].co.x
-    bpy.data.meshes['Housing Mesh'].vertices[len(
-        outer_vertices)].co.y = bpy.data.meshes['Housing Mesh'].vertices[len(outer_vertices)-1].co.y
-    bpy.data.meshes['Housing Mesh'].vertices[len(
-        outer_vertices)].co.z = 1.5 * bpy.data.meshes['Housing Mesh'].vertices[len(outer_vertices)-1].co.z
-
-    bpy.data.meshes['Housing Mesh'].vertices[len(outer_vertices)+1].co.x = bpy.data.meshes['Housing Mesh'].vertices[len(outer_vertices)].co.x + max(3.0 * data.objective[len(
-        data.objective)-1]['thickness'], bpy.data.meshes['Housing Mesh'].vertices[len(outer_vertices)-1].co.x-bpy.data.meshes['Housing Mesh'].vertices[0].co.x)
-    bpy.data.meshes['Housing Mesh'].vertices[len(
-        outer_vertices)+1].co.y = bpy.data.meshes['Housing Mesh'].vertices[len(outer_vertices)].co.y
-    bpy.data.meshes['Housing Mesh'].vertices[len(
-        outer_vertices)+1].co.z = bpy.data.meshes['Housing Mesh'].vertices[len(outer_vertices)].co.z
-
-    bpy.data.meshes['Housing Mesh'].vertices[len(
-        outer_vertices)+2].co.x = bpy.data.meshes['Housing Mesh'].vertices[len(outer_vertices)+1].co.x
-    bpy.data.meshes['Housing Mesh'].vertices[len(outer_vertices)+2].co.y = 0.0
-    bpy.data.meshes['Housing Mesh'].vertices[len(outer_vertices)+2].co.z = 0.0
-
-    # connect vertices
-    bpy.ops.object.mode_set(mode="OBJECT")
-    bpy.ops.object.select_all(action='DESELECT')
-    bpy.context.view_layer.objects.active = bpy.data.objects['Objective Housing']
-    for i in range(0, len(outer_vertices)+2):
-        bpy.ops.object.mode_set(mode="EDIT")
-        bpy.ops.mesh.select_all(action='DESELECT')
-        bpy.ops.object.mode_set(mode="OBJECT")
-        # select two vertices
-        bpy.data.objects['Objective Housing'].data.vertices[i].select = True
-        bpy.data.objects['Objective Housing'].data.vertices[i+1].select = True
-        bpy.ops.object.mode_set(mode="EDIT")
-        bpy.ops.mesh.edge_face_add()
-
-    # select all vertices to create a rotational surface
-    bpy.ops.object.mode_set(mode="EDIT")
-    bpy.ops.mesh.select_all(action='DESELECT')
-    bpy.ops.mesh.select_all(action='SELECT')
-    # use the spin operator to create the rotational surface
-    bpy.ops.mesh.spin(steps=vertex_count_radial, angle=2.0 *
-                      3.1415926536, axis=(1, 0, 0), center=(0, 0, 0))
-    # remove double vertices resulting from the spinning
-    bpy.ops.mesh.select_all(action='SELECT')
-    bpy.ops.mesh.remove_doubles(threshold=0.0, use_unselected=True)
-    bpy.ops.object.mode_set(mode="OBJECT")
+    vertices, loop_vertices, loop_starts, loop_totals = revolve_profile(housing_profile(outer_vertices, outer_lens_index), vertex_count_radial)
+
+    # load the revolved profile into the housing mesh
+    fill_mesh(bpy.data.meshes['Housing Mesh'], vertices, loop_vertices, loop_starts, loop_totals)
     bpy.data.objects['Objective Housing'].display_type = 'WIRE'
 
 # creates the aperture via difference modifier
 def aperture():
     # check if old opening exists and delete it
-    for current_object in bpy.data.objects:
-        current_object.select_set(False)
-        if current_object.name == 'Opening':
-            bpy.data.objects['Opening'].hide_viewport = False
-            bpy.data.objects['Opening'].hide_render = False
-            bpy.context.active_object.select_set(False)
-            current_object.select_set(True)
-            bpy.ops.object.delete()
-
-    # create circle
+    old_opening = bpy.data.objects.get('Opening')
+    if old_opening is not None:
+        old_mesh = old_opening.data
+        bpy.data.objects.remove(old_opening)
+        if old_mesh.users == 0:
+            bpy.data.meshes.remove(old_mesh)
+
+    # regular polygon prism with one vertex per blade, 1cm thick and centered at x = 0, normals pointing outwards
     num_of_blades = bpy.data.scenes[0].camera_generator.prop_aperture_blades
-    bpy.ops.mesh.primitive_circle_add(
-        vertices=num_of_blades, radius=0.5, location=(0, 0, 0))
-    # rename
-    bpy.context.active_object.name = "Opening"
-    # rotate
-    bpy.context.active_object.rotation_euler[0] = 90.0/180.0*3.1415926536
-    bpy.context.active_object.rotation_euler[2] = 90.0/180.0*3.1415926536
-
-    # switch to edit mode, add face and extrude object
-    bpy.ops.object.mode_set(mode="EDIT")
-    bpy.ops.mesh.edge_face_add()
-    bpy.ops.mesh.extrude_edges_move()
-    bpy.ops.transform.translate(value=(0.01, 0, 0))
-    bpy.ops.mesh.edge_face_add()
-    bpy.ops.mesh.select_all()
-    bpy.ops.mesh.normals_make_consistent(inside=False)
-    # switch back to object mode and reset position
-    bpy.ops.object.mode_set(mode="OBJECT")
-    bpy.context.active_object.location[0] = -0.005
-    bpy.ops.object.transform_apply()
+    angles = 2.0 * math.pi * np.arange(num_of_blades) / num_of_blades
+    ring = np.column_stack((np.zeros(num_of_blades), -0.5 * np.sin(angles), 0.5 * np.cos(angles)))
+    vertices = np.concatenate((ring - [0.005, 0.0, 0.0], ring + [0.005, 0.0, 0.0]))
+    back = np.arange(num_of_blades, dtype=np.int32)
+    front = back + num_of_blades
+    sides = np.column_stack((back, np.roll(back, -1), np.roll(front, -1), front))
+    side_loops = face_loops(sides)
+    loop_vertices = np.concatenate((back[::-1], front, side_loops[0]))
+    loop_starts = np.concatenate(([0, num_of_blades], side_loops[1] + 2 * num_of_blades))
+    loop_totals = np.concatenate(([num_of_blades, num_of_blades], side_loops[2]))
+    opening = add_mesh_object("Opening", bpy.context.collection, vertices, loop_vertices, loop_starts, loop_totals)
+
     # move object to aperture empty
-    bpy.context.active_object.parent = bpy.data.objects['Aperture']
+    opening.parent = bpy.data.objects['Aperture']
     # set difference modifier of aperture plane to use new shape
-    bpy.data.objects['Aperture Plane'].modifiers['Difference'].object = bpy.data.objects['Opening']
-    bpy.data.objects['Opening'].hide_viewport = True
-    bpy.data.objects['Opening'].hide_render = True
+    bpy.data.objects['Aperture Plane'].modifiers['Difference'].object = opening
+    opening.hide_viewport = True
+    opening.hide_render = True
     # rescale opening according to currently set scaling
-    bpy.data.objects['Opening'].scale[1] = bpy.data.scenes[0].camera_generator.prop_aperture_size/1000.0
-    bpy.data.objects['Opening'].scale[2] = bpy.data.scenes[0].camera_generator.prop_aperture_size/1000.0
+    opening.scale[1] = bpy.data.scenes[0].camera_generator.prop_aperture_size/1000.0
+    opening.scale[2] = bpy.data.scenes[0].camera_generator.prop_aperture_size/1000.0
     # rotate opening according to currently set angle
-    bpy.data.objects['Opening'].rotation_euler[0] = bpy.data.scenes[0].camera_generator.prop_aperture_angle/180.0*math.pi
+    opening.rotation_euler[0] = bpy.data.scenes[0].camera_generator.prop_aperture_angle/180.0*math.pi
 
 
 # ------------------------------------------------------------------------
 #    Multiple component creation
 # ------------------------------------------------------------------------
 
-# creates multiple lenses from list and return a list of outer vertices for housing creation
-def lenses(lens_patch_size: float, vertex_count_height: int, vertex_count_radial: int, lenses: List[Dict[str, Any]]) -> Tuple[List[List[float]], List[int]]:
-    outer_vertices, outer_lens_index = [], list(range(len(lenses)))
-
-    for index, lens in enumerate(lenses):
-        if lens['material'] == "air" and lenses[index - 1]['material'] == "air":
+# creates the lenses of the lens system and return a list of outer vertices for housing creation
+def lenses(lens_patch_size: float, vertex_count_height: int, vertex_count_radial: int, max_deviation: float, lens_system) -> Tuple[List[List[float]], List[int]]:
+    outer_vertices, outer_lens_index = [], list(range(len(lens_system)))
+    # the housing uses the fewest outer ring vertices of all lens surfaces
+    data.num_radial_housing_vertices = 120 if data.lens_creation_method in ('UNIFORM', 'ADAPTIVE') else vertex_count_radial
+
+    for index in range(len(lens_system)):
+        radius = float(lens_system.radius[index])
+        semi_aperture = float(lens_system.semi_aperture[index])
+        ior = float(lens_system.ior_ratio[0, index])
+        position = float(lens_system.center[index])
+        name = lens_system.names[index]
+        if lens_system.materials[index] == "air" and lens_system.materials[index - 1] == "air":
             outer_lens_index.remove(index)
             continue
-        if lens['radius'] == 0.0:
-            outer_vertices.append(flat_surface(
-                lens['semi_aperture'], lens['ior_ratio'], lens['position'], lens['name']))
+        if lens_system.flat[index]:
+            outer_vertices.append(flat_surface(semi_aperture, ior, position, name))
             continue
         if data.lens_creation_method == 'UNIFORM':
-            data.num_radial_housing_vertices = 120
-            outer_vertices.append(uniform_lens_surface(lens_patch_size, lens['radius'], lens['semi_aperture'], lens['ior_ratio'], lens['position'], lens['name']))
+            outer_vertices.append(uniform_lens_surface(lens_patch_size, radius, semi_aperture, ior, position, name))
+        elif data.lens_creation_method == 'ADAPTIVE':
+            outer_vertices.append(adaptive_lens_surface(max_deviation, radius, semi_aperture, ior, position, name))
         else:
-            data.num_radial_housing_vertices = vertex_count_radial
-            outer_vertices.append(rotational_lens_surface(vertex_count_height, vertex_count_radial, lens['radius'], lens['semi_aperture'], lens['ior_ratio'], lens['position'], lens['name']))
+            outer_vertices.append(rotational_lens_surface(vertex_count_height, vertex_count_radial, radius, semi_aperture, ior, position, name))
         
     return outer_vertices, outer_lens_index
 
 # creates a new calibration pattern
 def calibration_pattern():
-    # create new plane
-    bpy.ops.mesh.primitive_plane_add(size=1, rotation=(0, 0.5*3.14159, 0), location=(0, 0, 0))
-    bpy.ops.object.transform_apply()
-    calibration_pattern = bpy.context.active_object
-    calibration_pattern.name = 'Calibration Pattern'
+    camera = bpy.data.objects['Camera']
+    # unit plane in the y/z plane facing -x, i.e. a plane rotated by 90 degree around y
+    plane = np.array([[-0.5, -0.5, 0.0], [0.5, -0.5, 0.0], [0.5, 0.5, 0.0], [-0.5, 0.5, 0.0]])
+    rotation = np.array(mathutils.Euler((0.0, 0.5*3.14159, 0.0)).to_matrix())
+    # the camera location is moved into the mesh, given in the camera rotated frame
+    offset = np.array(camera.rotation_euler.to_matrix().inverted() @ camera.location)
+    vertices = plane @ rotation.T + offset
+    calibration_pattern = add_mesh_object('Calibration Pattern', bpy.context.collection, vertices,
+                                          *face_loops([[0, 1, 2, 3]]), plane[:, :2] + 0.5)
     # set material
     calibration_pattern.data.materials.append(bpy.data.materials['Calibration Pattern Material'])
-    # set location and rotation relative to camera
-    calibration_pattern.location = bpy.data.objects['Camera'].location
-    calibration_pattern.rotation_euler = bpy.data.objects['Camera'].rotation_euler
-    bpy.ops.object.transform_apply(location = True, rotation = False, scale = False, properties = False)
+    # set rotation relative to camera
+    calibration_pattern.rotation_euler = camera.rotation_euler
 
     translation = mathutils.Vector((-bpy.data.scenes[0].camera_generator.prop_focus_distance / 100.0, 0.0, 0.0))
     translation.rotate(calibration_pattern.rotation_euler) 
-    calibration_pattern.location = translation
\ No newline at end of file
+    calibration_pattern.location = translation
@@ -4,8 +4,6 @@
 
 from bpy.utils import user_resource
 
-from .io import read_dispersion_data
-
 
 # flag for de/activation of debug output and unit tests
 debug: bool = False
@@ -14,6 +12,8 @@ debug: bool = False
 addon_directory = user_resource('SCRIPTS')+'/addons/Blender_CamGen/'
 # set lens directory
 lens_directory = addon_directory+'Lenses'
+# set directory of vendor glass catalogs (*.agf) and glass aliases (aliases.csv)
+glass_directory = addon_directory+'Glasses'
 
 # cycles setup required for accurate tracing through multiple lenses
 cycles_settings: dict = {
@@ -26,11 +26,16 @@ cycles_settings: dict = {
     'blur_glossy': 0
 }
 
-# objective data
+# objective data - the list of surface dicts is used by the UI, the compiled lens system by the ray tracers
 objective = []
+lens_system = None
+objective_file = ''
 glass_data_known = False
 aperture_index = -1
 semi_aperture = -1
+# aperture shape used for polygonal clipping in the 3D ray tracer (angle in degree)
+aperture_blades = 6
+aperture_angle = 0.0
 
 # number of vertices for housing creation
 num_radial_housing_vertices = 36
@@ -40,10 +45,10 @@ lens_creation_method = 'UNIFORM'
 objective_list = ()
 objective_list_created = False
 
-# coefficients for dispersion according to Sellmeier equation: (B1, B2, B3, C1, C2, C3, IOR)
-sellmeier_data = {}
-# coefficients for dispersion according to Cauchy equation: (C1, C2, C3, C4, C5, C6, IOR)
-cauchy_data = {}
+# dispersion data is read from the material files on first access of the following attributes (see __getattr__):
+# sellmeier_data - coefficients for dispersion according to Sellmeier equation: (B1, B2, B3, C1, C2, C3, IOR)
+# cauchy_data - coefficients for dispersion according to Cauchy equation: (C1, C2, C3, C4, C5, C6, IOR)
+dispersion_files = {'sellmeier_data': 'sellmeier_materials.csv', 'cauchy_data': 'cauchy_materials.csv'}
 
 # flag which specifies whether user defined data should be used for camera creation
 use_gui_data = False
@@ -54,18 +59,28 @@ use_mla = True
 # initializes global variables
 def init():
     global objective
+    global lens_system
+    global objective_file
     global glass_data_known
     global aperture_index
     global semi_aperture
+    global aperture_blades
+    global aperture_angle
     global num_radial_housing_vertices
     global lens_creation_method
     global objective_list
     global objective_list_created
     global use_gui_data
-    global sellmeier_data
-    global cauchy_data
     global addon_directory
     global lens_directory
-    # load dispersion data
-    sellmeier_data = read_dispersion_data(addon_directory+'sellmeier_materials.csv')
-    cauchy_data = read_dispersion_data(addon_directory+'cauchy_materials.csv')
+    # dispersion data is read again on next access
+    for name in dispersion_files:
+        globals().pop(name, None)
+
+# reads the dispersion data on first access of sellmeier_data or cauchy_data, i.e. not at addon registration
+def __getattr__(name: str):
+    if name in dispersion_files:
+        from .io import read_dispersion_data
+        globals()[name] = read_dispersion_data(addon_directory + dispersion_files[name])
+        return globals()[name]
+    raise AttributeError("module '" + __name__ + "' has no attribute '" + name + "'")
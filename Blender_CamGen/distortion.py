@@ -0,0 +1,130 @@
+# ------------------------------------------------------------------------
+#    Radial distortion lookup tables and distortion model fits
+# ------------------------------------------------------------------------
+
+import numpy as np
+
+from collections import OrderedDict
+from os.path import getmtime, isfile
+
+from . import aiming
+from . import data
+from . import raytracer
+
+# maximum number of cached distortion tables - the least recently used table is dropped first
+max_cached_tables = 64
+# number of field angles of the lookup table and of the scan for the usable field
+table_sample_count = 256
+scan_sample_count = 64
+# largest traced field angle in rad
+max_field_angle = 1.55
+# number of radial Brown-Conrady coefficients (k1, k2, ...) and of odd polynomial coefficients in the field angle
+brown_conrady_terms = 3
+polynomial_terms = 4
+
+# cached distortion tables by configuration key
+distortion_tables = OrderedDict()
+
+# ------------------------------------------------------------------------
+#    Helper functions
+# ------------------------------------------------------------------------
+
+# creates the cache key for a distortion table - the lens file modification time invalidates tables of edited files
+def distortion_key(objective_file: str, objective_scale: float, wavelength: float, sensor_width: float,
+                   sensor_height: float, distance: float, sensor_position: float):
+    mtime = getmtime(objective_file) if isfile(objective_file) else 0.0
+    return (objective_file, mtime, objective_scale, wavelength, sensor_width, sensor_height, distance, sensor_position)
+
+# traces chief rays aimed through the aperture center for the given field angles - returns the object heights and the
+# signed image heights on the sensor plane, NaN for field angles without a chief ray
+def chief_ray_image_heights(field_angles, distance: float, sensor_position: float, lens_system, wavelength_index: int = 0):
+    object_heights, aimed = aiming.chief_ray_heights(field_angles, distance, lens_system, wavelength_index)
+    positions = np.column_stack((np.full(len(object_heights), -distance), object_heights, np.zeros(len(object_heights))))
+    directions = np.column_stack((np.ones(len(object_heights)), np.tan(field_angles), np.zeros(len(object_heights))))
+    positions, directions, valid = raytracer.trace_rays_3d(positions, directions, lens_system, wavelength_index)
+    image_heights = raytracer.sensor_intersections_3d(positions, directions, sensor_position)[:, 0]
+    return object_heights, np.where(aimed & valid, image_heights, np.nan)
+
+# fits y = x * (1 + c1 * x^2 + c2 * x^4 + ...) with the given number of coefficients by linear least squares - returns
+# the coefficients and the RMS residual
+def fit_radial_polynomial(x, y, terms: int):
+    basis = np.column_stack([x ** (2 * i + 3) for i in range(terms)])
+    coefficients = np.linalg.lstsq(basis, y - x, rcond=None)[0]
+    residual = float(np.sqrt(np.mean((basis @ coefficients - (y - x)) ** 2)))
+    return coefficients, residual
+
+
+# ------------------------------------------------------------------------
+#    Distortion table
+# ------------------------------------------------------------------------
+
+# traces a dense lookup table from field angle to real image height on the sensor at the given position up to the
+# given image height (in m), i.e. the sensor corner - the ideal image height follows from the local magnification on
+# the optical axis - returns a dict with the table, the relative distortion and fitted distortion models:
+# 'brown_conrady': k1, k2, ... of r_d = r_u * (1 + k1 r_u^2 + k2 r_u^4 + ...) with r_u = tan(field angle) and
+# r_d = image height / focal length (normalized pinhole coordinates)
+# 'polynomial': c1, c2, ... of r_d = t * (1 + c1 t^2 + c2 t^4 + ...) with t = field angle, suitable for wide angle lenses
+# returns None if the chief rays do not reach the sensor, e.g. for a sensor position without image
+def distortion_table(max_image_height: float, distance: float, sensor_position: float, lens_system=None,
+                     wavelength_index: int = 0, sample_count: int = None):
+    if lens_system is None:
+        lens_system = data.lens_system
+    sample_count = sample_count or table_sample_count
+
+    # pinhole focal length (camera constant) from the image heights of small field angles
+    small_angles = np.array([1e-4, 2e-4])
+    _, small_heights = chief_ray_image_heights(small_angles, distance, sensor_position, lens_system, wavelength_index)
+    focal_length = float(np.mean(small_heights / np.tan(small_angles)))
+    if not np.isfinite(focal_length) or focal_length == 0.0:
+        return None
+
+    # scan for the field angle reaching the sensor corner or the edge of the traceable field
+    scan_angles = np.linspace(0.0, max_field_angle, scan_sample_count)
+    _, scan_heights = chief_ray_image_heights(scan_angles, distance, sensor_position, lens_system, wavelength_index)
+    scan_heights = scan_heights / np.sign(focal_length)
+    usable = np.logical_and.accumulate(np.isfinite(scan_heights))
+    usable &= np.concatenate(([True], np.logical_and.accumulate(scan_heights[:-1] < max_image_height)))
+    field_limit = scan_angles[np.count_nonzero(usable) - 1]
+
+    field_angles = np.linspace(0.0, field_limit, sample_count)
+    object_heights, image_heights = chief_ray_image_heights(field_angles, distance, sensor_position, lens_system, wavelength_index)
+    ideal_heights = focal_length * np.tan(field_angles)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative_distortion = np.where(field_angles > 0.0, image_heights / ideal_heights - 1.0, 0.0)
+
+    # fit the models on the traced part of the table
+    traced = np.isfinite(image_heights)
+    if np.count_nonzero(traced) < max(brown_conrady_terms, polynomial_terms):
+        return None
+    undistorted = np.tan(field_angles[traced])
+    distorted = image_heights[traced] / focal_length
+    brown_conrady, brown_conrady_residual = fit_radial_polynomial(undistorted, distorted, brown_conrady_terms)
+    polynomial, polynomial_residual = fit_radial_polynomial(field_angles[traced], distorted, polynomial_terms)
+    return {
+        'field_angles': field_angles,
+        'object_heights': object_heights,
+        'image_heights': image_heights,
+        'ideal_heights': ideal_heights,
+        'relative_distortion': relative_distortion,
+        'focal_length': focal_length,
+        'brown_conrady': brown_conrady,
+        'brown_conrady_residual': brown_conrady_residual,
+        'polynomial': polynomial,
+        'polynomial_residual': polynomial_residual
+    }
+
+# returns the cached distortion table for the given key or traces it - None if the configuration can not be traced
+def cached_distortion_table(key, max_image_height: float, distance: float, sensor_position: float, lens_system=None,
+                            wavelength_index: int = 0):
+    if key in distortion_tables:
+        distortion_tables.move_to_end(key)
+        return distortion_tables[key]
+    table = distortion_table(max_image_height, distance, sensor_position, lens_system, wavelength_index)
+    distortion_tables[key] = table
+    while len(distortion_tables) > max_cached_tables:
+        distortion_tables.popitem(last=False)
+    return table
+
+# removes all cached distortion tables
+def clear_distortion_tables():
+    distortion_tables.clear()
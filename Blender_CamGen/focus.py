@@ -0,0 +1,259 @@
+# ------------------------------------------------------------------------
+#    Cached focus curves, i.e. sensor position as function of object distance
+# ------------------------------------------------------------------------
+
+import numpy as np
+
+from collections import OrderedDict
+from os.path import getmtime, isfile
+
+from . import aiming
+from . import data
+from . import paraxial
+from . import raytracer
+from . import sampling
+
+# maximum number of cached focus curves - the least recently used curve is dropped first
+max_cached_curves = 64
+# number of sampled object distances and traced rays per distance used for building a focus curve
+curve_sample_count = 64
+curve_ray_count = 16
+# farthest object distance in m covered by the curves (the maximum of prop_focus_distance)
+far_distance = 10000.0
+
+# cached curves by configuration key
+focus_curves = OrderedDict()
+
+# ------------------------------------------------------------------------
+#    Helper functions
+# ------------------------------------------------------------------------
+
+# calculates the slopes of the monotone piecewise cubic Hermite interpolant (Fritsch-Carlson) through the given points
+def pchip_slopes(x, y):
+    h = np.diff(x)
+    delta = np.diff(y) / h
+    slopes = np.zeros_like(y)
+    # interior slopes are weighted harmonic means of the neighboring secants - zero at local extrema
+    same_sign = delta[:-1] * delta[1:] > 0.0
+    w1 = 2.0 * h[1:] + h[:-1]
+    w2 = h[1:] + 2.0 * h[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        harmonic = (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:])
+    slopes[1:-1] = np.where(same_sign, harmonic, 0.0)
+    # one-sided three-point estimates at the end points, limited to preserve monotonicity
+    for end, (h0, h1, d0, d1) in ((0, (h[0], h[1], delta[0], delta[1])), (-1, (h[-1], h[-2], delta[-1], delta[-2]))):
+        slope = ((2.0 * h0 + h1) * d0 - h0 * d1) / (h0 + h1)
+        if np.sign(slope) != np.sign(d0):
+            slope = 0.0
+        elif np.sign(d0) != np.sign(d1) and abs(slope) > abs(3.0 * d0):
+            slope = 3.0 * d0
+        slopes[end] = slope
+    return slopes
+
+# evaluates the piecewise cubic Hermite interpolant with the given slopes - values outside are clamped to the ends
+def hermite_interpolate(x, y, slopes, query):
+    query = np.clip(query, x[0], x[-1])
+    index = np.clip(np.searchsorted(x, query) - 1, 0, len(x) - 2)
+    h = x[index + 1] - x[index]
+    t = (query - x[index]) / h
+    t2 = t * t
+    t3 = t2 * t
+    return ((2.0 * t3 - 3.0 * t2 + 1.0) * y[index] + (t3 - 2.0 * t2 + t) * h * slopes[index]
+            + (-2.0 * t3 + 3.0 * t2) * y[index + 1] + (t3 - t2) * h * slopes[index + 1])
+
+# creates the cache key for a focus curve - the lens file modification time invalidates curves of edited files
+def focus_curve_key(objective_file: str, objective_scale: float, wavelength: float, aperture_size: float):
+    mtime = getmtime(objective_file) if isfile(objective_file) else 0.0
+    return (objective_file, mtime, objective_scale, wavelength, aperture_size)
+
+
+# ------------------------------------------------------------------------
+#    Focus curve
+# ------------------------------------------------------------------------
+
+# sensor positions sampled over the inverse object distance and interpolated monotonically between the samples
+class FocusCurve:
+    def __init__(self, lens_system, wavelength_index=0):
+        # objects have to be in front of the first lens and clearly beyond the front focal point to form a real image
+        focal_distance = paraxial.front_focal_distance(lens_system, wavelength_index)
+        self.near_distance = max(0.01, 1.5 * max(0.0, -lens_system.vertex[0]), 1.5 * focal_distance)
+        # the image position is a smooth function of the inverse object distance
+        self.inverse_distances = np.linspace(1.0 / far_distance, 1.0 / self.near_distance, curve_sample_count)
+        distances = 1.0 / self.inverse_distances
+
+        # trace one fan of rays per distance in a single batch, each up to the paraxial marginal angle
+        fractions = np.arange(1, curve_ray_count + 1) / curve_ray_count
+        angles = np.outer(paraxial.marginal_angle(distances, lens_system, wavelength_index), fractions)
+        rays = np.column_stack((np.repeat(-distances, curve_ray_count), np.zeros(angles.size), angles.ravel()))
+        positions, directions, valid = raytracer.trace_rays(rays, lens_system, wavelength_index)
+
+        # mean axis crossing of each fan
+        crossing = valid & (directions[:, 1] != 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            zeroes = positions[:, 0] - positions[:, 1] * directions[:, 0] / directions[:, 1]
+        zeroes = np.where(crossing, zeroes, 0.0).reshape(-1, curve_ray_count)
+        counts = np.count_nonzero(crossing.reshape(-1, curve_ray_count), axis=1)
+        sensor_positions = paraxial.image_position(distances, lens_system, wavelength_index)
+        traced = counts > 0
+        sensor_positions[traced] = zeroes[traced].sum(axis=1) / counts[traced]
+
+        # distances without any usable sample are removed from the curve
+        usable = np.isfinite(sensor_positions)
+        self.inverse_distances = self.inverse_distances[usable]
+        self.sensor_positions = sensor_positions[usable]
+        if len(self.sensor_positions) > 2:
+            self.slopes = pchip_slopes(self.inverse_distances, self.sensor_positions)
+        else:
+            self.slopes = None
+
+    # returns the sensor position for focusing on the given distance(s) - returns -1.0 outside of the sampled range
+    def sensor_position(self, distance):
+        if self.slopes is None:
+            return -1.0
+        inverse_distance = 1.0 / np.asarray(distance, dtype=np.float64)
+        positions = hermite_interpolate(self.inverse_distances, self.sensor_positions, self.slopes, inverse_distance)
+        positions = np.where(inverse_distance > self.inverse_distances[-1], -1.0, positions)
+        return float(positions) if positions.ndim == 0 else positions
+
+
+# ------------------------------------------------------------------------
+#    Cache access
+# ------------------------------------------------------------------------
+
+# returns the cached focus curve for the given key or builds it from the lens system
+def focus_curve(key, lens_system=None, wavelength_index=0) -> FocusCurve:
+    if key in focus_curves:
+        focus_curves.move_to_end(key)
+        return focus_curves[key]
+    if lens_system is None:
+        lens_system = data.lens_system
+    curve = FocusCurve(lens_system, wavelength_index)
+    focus_curves[key] = curve
+    while len(focus_curves) > max_cached_curves:
+        focus_curves.popitem(last=False)
+    return curve
+
+# removes all cached focus curves and optimal sensor positions
+def clear_focus_curves():
+    focus_curves.clear()
+    optimal_positions.clear()
+
+# calculates the sensor position for focusing on the given distance using the cached focus curve of the configuration
+# falls back to the paraxial solver for distances outside of the curve - returns -1.0 if tracing fails
+def sensor_position_for_distance(distance, key, lens_system=None, wavelength_index=0):
+    if lens_system is None:
+        lens_system = data.lens_system
+    # check if objective loaded
+    if lens_system is None:
+        print("No objective has been loaded.")
+        return -1
+
+    position = focus_curve(key, lens_system, wavelength_index).sensor_position(distance)
+    if position == -1.0:
+        return paraxial.sensor_position_for_distance(distance, lens_system=lens_system, wavelength_index=wavelength_index)
+    return position
+
+
+# ------------------------------------------------------------------------
+#    Through-focus optimization
+# ------------------------------------------------------------------------
+
+# maximum number of cached optimal sensor positions
+max_cached_positions = 1024
+# number of rays and scanned sensor planes used by the optimizer
+optimizer_ray_count = 4096
+optimizer_scan_count = 41
+
+# cached optimal sensor positions by configuration key, distance, criterion, radius and aperture shape
+optimal_positions = OrderedDict()
+
+# calculates the fraction of rays within the given radius around the spot centroid for each of the sensor planes
+# offsets and slopes describe the (N, 2) ray heights as linear functions of the sensor position
+def encircled_energy(offsets, slopes, sensor_positions, radius: float):
+    points = offsets[None, :, :] + np.asarray(sensor_positions)[:, None, None] * slopes[None, :, :]
+    points -= points.mean(axis=1, keepdims=True)
+    return np.mean(np.einsum('pni,pni->pn', points, points) <= radius * radius, axis=1)
+
+# finds the sensor position minimizing the RMS spot radius or maximizing the encircled energy within the given radius
+# for objects at the given distance - all rays are traced once, the spot at any sensor position follows from their
+# straight continuation - the pupil is sampled with the given strategy (see sampling.strategies), a tolerance enables
+# adaptive sampling until the RMS focus converges - returns -1.0 if tracing fails
+def optimize_sensor_position(distance: float, criterion: str = 'RMS', radius: float = 0.0, lens_system=None,
+                             wavelength_index: int = 0, seed: int = 0, strategy: str = 'random',
+                             tolerance: float = None) -> float:
+    if lens_system is None:
+        lens_system = data.lens_system
+    if tolerance is not None and criterion == 'RMS':
+        position, _ = sampling.adaptive_estimate(
+            lambda points: focus_for_pupil_points(points, distance, criterion, radius, lens_system, wavelength_index),
+            strategy, tolerance, max_count=optimizer_ray_count * 16, seed=seed)
+        return position
+    pupil_points = sampling.pupil_points(strategy, optimizer_ray_count, seed)
+    return focus_for_pupil_points(pupil_points, distance, criterion, radius, lens_system, wavelength_index)
+
+# traces the given normalized pupil points and optimizes the sensor position for them, see optimize_sensor_position
+def focus_for_pupil_points(pupil_points, distance: float, criterion: str, radius: float, lens_system,
+                           wavelength_index: int = 0) -> float:
+    positions, directions = aiming.launch_rays_3d(0.0, distance, pupil_points, lens_system, wavelength_index)
+    positions, directions, valid = raytracer.trace_rays_3d(positions, directions, lens_system, wavelength_index)
+    valid &= directions[:, 0] > 0.0
+    if np.count_nonzero(valid) < 2:
+        return -1.0
+    positions, directions = positions[valid], directions[valid]
+    slopes = directions[:, 1:] / directions[:, :1]
+    offsets = positions[:, 1:] - positions[:, :1] * slopes
+
+    # the squared RMS radius is quadratic in the sensor position and has a closed form minimum
+    centered_offsets = offsets - offsets.mean(axis=0)
+    centered_slopes = slopes - slopes.mean(axis=0)
+    slope_variance = np.sum(centered_slopes * centered_slopes)
+    if slope_variance <= 0.0:
+        return -1.0
+    rms_position = -np.sum(centered_offsets * centered_slopes) / slope_variance
+    if criterion == 'RMS' or radius <= 0.0:
+        return float(rms_position)
+
+    # scan the depth of focus around the RMS optimum for the maximum encircled energy
+    rms_radius = np.sqrt(max(np.sum(centered_offsets * centered_offsets) / len(offsets) - rms_position * rms_position * slope_variance / len(offsets), 0.0))
+    half_depth = 4.0 * (rms_radius + radius) / np.sqrt(slope_variance / len(offsets))
+    scan_positions = np.linspace(rms_position - half_depth, rms_position + half_depth, optimizer_scan_count)
+    energies = encircled_energy(offsets, slopes, scan_positions, radius)
+    best = int(np.argmax(energies))
+
+    # refine within the neighboring scan steps by golden section search
+    lower = scan_positions[max(best - 1, 0)]
+    upper = scan_positions[min(best + 1, optimizer_scan_count - 1)]
+    ratio = 0.5 * (np.sqrt(5.0) - 1.0)
+    best_position, best_energy = scan_positions[best], energies[best]
+    for _ in range(20):
+        inner = np.array([upper - ratio * (upper - lower), lower + ratio * (upper - lower)])
+        inner_energies = encircled_energy(offsets, slopes, inner, radius)
+        if inner_energies[0] >= inner_energies[1]:
+            upper = inner[1]
+        else:
+            lower = inner[0]
+        candidate = int(np.argmax(inner_energies))
+        if inner_energies[candidate] > best_energy:
+            best_position, best_energy = inner[candidate], inner_energies[candidate]
+    return float(best_position)
+
+# returns the cached optimal sensor position for the configuration key or runs the optimizer
+def optimal_sensor_position(distance: float, key, criterion: str = 'RMS', radius: float = 0.0, lens_system=None,
+                            wavelength_index: int = 0) -> float:
+    if lens_system is None:
+        lens_system = data.lens_system
+    # check if objective loaded
+    if lens_system is None:
+        print("No objective has been loaded.")
+        return -1
+
+    # the traced rays are clipped by the polygonal aperture, i.e. the optimum depends on its shape
+    position_key = (key, distance, criterion, radius if criterion != 'RMS' else 0.0, data.aperture_blades, data.aperture_angle)
+    if position_key in optimal_positions:
+        optimal_positions.move_to_end(position_key)
+        return optimal_positions[position_key]
+    position = optimize_sensor_position(distance, criterion, radius, lens_system, wavelength_index)
+    optimal_positions[position_key] = position
+    while len(optimal_positions) > max_cached_positions:
+        optimal_positions.popitem(last=False)
+    return position
@@ -0,0 +1,227 @@
+# ------------------------------------------------------------------------
+#    Glass catalog - columnar store of the dispersion formulas of all known glasses
+# ------------------------------------------------------------------------
+
+import re
+import numpy as np
+
+from os import listdir
+from os.path import isdir, isfile, join
+
+from . import data
+
+# Fraunhofer d, F and C lines in um used for the refractive index nd and the Abbe number vd
+d_line = 0.5875618
+f_line = 0.4861327
+c_line = 0.6562725
+
+# all formulas are stored as n^2 = constant + sum(K * w^2 / (w^2 - L)) + sum(c * w^p), w in um, with up to
+# pole_count K/L pairs and one coefficient c per power of the wavelength
+pole_count = 5
+powers = np.array([2.0, 4.0, 6.0, -2.0, -4.0, -6.0, -8.0, -10.0, -12.0])
+
+# terms of the Zemax (AGF) dispersion formulas in the order of their coefficients: 'constant', ('K', i), ('L', i) or
+# a power of the wavelength - formulas not listed here (Herzberger, Conrady, ...) are not supported
+agf_formulas = {
+    1: ('constant', 2, -2, -4, -6, -8),                                                     # Schott
+    2: (('K', 0), ('L', 0), ('K', 1), ('L', 1), ('K', 2), ('L', 2)),                        # Sellmeier 1
+    6: (('K', 0), ('L', 0), ('K', 1), ('L', 1), ('K', 2), ('L', 2), ('K', 3), ('L', 3)),    # Sellmeier 3
+    9: ('constant', ('K', 0), ('L', 0), ('K', 1), ('L', 1)),                                # Sellmeier 4
+    10: ('constant', 2, -2, -4, -6, -8, -10, -12),                                          # Extended
+    11: (('K', 0), ('L', 0), ('K', 1), ('L', 1), ('K', 2), ('L', 2), ('K', 3), ('L', 3), ('K', 4), ('L', 4)),  # Sellmeier 5
+    12: ('constant', 2, -2, -4, -6, -8, 4, 6),                                              # Extended 2
+    13: ('constant', 2, 4, -2, -4, -6, -8, -10, -12)                                        # Extended 3
+}
+# Sellmeier formulas have an implicit constant of 1
+sellmeier_formulas = (2, 6, 11)
+
+# largest difference of the refractive index nd of a lens file to the glass of the same name in the catalog - glasses
+# differing more are treated as unknown, e.g. old glass names reused by another manufacturer
+name_match_tolerance = 0.02
+# scales of nd and vd in the distance of the nearest match for unknown glasses
+match_scale_nd = 0.01
+match_scale_vd = 1.0
+
+# the catalog, built on first use
+glass_catalog = None
+
+# ------------------------------------------------------------------------
+#    Helper functions
+# ------------------------------------------------------------------------
+
+# returns the lookup key of a glass name - upper case without separators, e.g. 'n-bk 7' and 'N-BK7' match
+def normalized_name(name: str) -> str:
+    return re.sub(r'[^0-9A-Z]', '', name.upper())
+
+# evaluates the refractive indices of the given (glasses,) coefficient columns at the given wavelengths in um -
+# returns a (glasses, wavelengths) array
+def evaluate(constant, pole_k, pole_l, power_coefficients, wavelengths):
+    w2 = np.atleast_1d(np.asarray(wavelengths, dtype=np.float64))[None, None, :] ** 2
+    n2 = constant[:, None] + np.sum(pole_k[:, :, None] * w2 / (w2 - pole_l[:, :, None]), axis=1)
+    n2 += power_coefficients @ (w2[0] ** (powers[:, None] / 2.0))
+    return np.sqrt(n2)
+
+# converts Zemax formula coefficients into the columns of the catalog - returns None for unsupported formulas
+def agf_columns(formula: int, coefficients):
+    if formula not in agf_formulas:
+        return None
+    constant = 1.0 if formula in sellmeier_formulas else 0.0
+    pole_k = np.zeros(pole_count)
+    pole_l = np.zeros(pole_count)
+    power_coefficients = np.zeros(len(powers))
+    for term, coefficient in zip(agf_formulas[formula], coefficients):
+        if term == 'constant':
+            constant = coefficient
+        elif isinstance(term, tuple):
+            (pole_k if term[0] == 'K' else pole_l)[term[1]] = coefficient
+        else:
+            power_coefficients[np.flatnonzero(powers == term)[0]] = coefficient
+    return constant, pole_k, pole_l, power_coefficients
+
+
+# ------------------------------------------------------------------------
+#    Catalog
+# ------------------------------------------------------------------------
+
+# builds the catalog from the bundled Sellmeier and Cauchy data followed by all vendor catalogs (*.agf) in the glass
+# directory - earlier glasses take precedence for equal names, aliases are taken from aliases.csv in the glass
+# directory and from vendor prefixes, i.e. 'N-SF5' is also found as 'SF5'
+def build_catalog(glass_directory: str = None):
+    from . import io
+    if glass_directory is None:
+        glass_directory = data.glass_directory
+    names, constant, pole_k, pole_l, power_coefficients = [], [], [], [], []
+
+    def add(name, columns):
+        names.append(name)
+        constant.append(columns[0])
+        pole_k.append(columns[1])
+        pole_l.append(columns[2])
+        power_coefficients.append(columns[3])
+
+    for name, (B1, B2, B3, C1, C2, C3, _ior) in data.sellmeier_data.items():
+        add(name, agf_columns(2, (B1, C1, B2, C2, B3, C3)))
+    for name, (C1, C2, C3, C4, C5, C6, _ior) in data.cauchy_data.items():
+        add(name, agf_columns(1, (C1, C2, C3, C4, C5, C6)))
+
+    catalog_files = sorted(f for f in listdir(glass_directory) if f.lower().endswith('.agf')) if isdir(glass_directory) else []
+    for catalog_file in catalog_files:
+        rows = io.read_glass_catalog(join(glass_directory, catalog_file))
+        for name, formula, coefficients in zip(rows['name'].tolist(), rows['formula'].tolist(), rows['coefficients']):
+            columns = agf_columns(formula, coefficients)
+            if columns is None:
+                print("Glass " + name + " in " + catalog_file + " uses the unsupported dispersion formula " + str(formula) + ".")
+                continue
+            add(name, columns)
+
+    catalog = {
+        'names': np.array(names, dtype=np.str_),
+        'constant': np.array(constant, dtype=np.float64),
+        'pole_k': np.array(pole_k, dtype=np.float64).reshape(-1, pole_count),
+        'pole_l': np.array(pole_l, dtype=np.float64).reshape(-1, pole_count),
+        'power_coefficients': np.array(power_coefficients, dtype=np.float64).reshape(-1, len(powers))
+    }
+    nd, nf, nc = evaluate(catalog['constant'], catalog['pole_k'], catalog['pole_l'], catalog['power_coefficients'],
+                          [d_line, f_line, c_line]).T
+    catalog['nd'] = nd
+    catalog['vd'] = (nd - 1.0) / (nf - nc)
+
+    # name lookup: exact names, normalized names, aliases and names without vendor prefix in this order of precedence
+    index = {}
+    for row, name in enumerate(names):
+        index.setdefault(name, row)
+    for row, name in enumerate(names):
+        index.setdefault(normalized_name(name), row)
+    alias_file = join(glass_directory, 'aliases.csv')
+    if isfile(alias_file):
+        for alias, name in io.read_glass_aliases(alias_file).items():
+            if name in index:
+                index.setdefault(normalized_name(alias), index[name])
+            else:
+                print("Alias " + alias + " refers to the unknown glass " + name + ".")
+    for row, name in enumerate(names):
+        if '-' in name:
+            index.setdefault(normalized_name(name[name.index('-') + 1:]), row)
+    catalog['index'] = index
+    catalog['sellmeier_data'] = data.sellmeier_data
+    catalog['cauchy_data'] = data.cauchy_data
+    return catalog
+
+# returns the catalog - it is rebuilt if the bundled dispersion data was reloaded
+def catalog():
+    global glass_catalog
+    if glass_catalog is None or glass_catalog['sellmeier_data'] is not data.sellmeier_data \
+            or glass_catalog['cauchy_data'] is not data.cauchy_data:
+        glass_catalog = build_catalog()
+    return glass_catalog
+
+# removes the catalog from memory, e.g. after adding vendor catalogs to the glass directory
+def clear_catalog():
+    global glass_catalog
+    glass_catalog = None
+
+# returns the catalog row of the glass with the given name or alias, -1 if it is unknown
+def glass_row(name: str) -> int:
+    index = catalog()['index']
+    row = index.get(name)
+    if row is None:
+        row = index.get(normalized_name(name), -1)
+    return row
+
+# returns the catalog row of the glass closest to the given refractive index nd and Abbe number vd
+def nearest_glass(nd: float, vd: float) -> int:
+    table = catalog()
+    distance = ((table['nd'] - nd) / match_scale_nd) ** 2 + ((table['vd'] - vd) / match_scale_vd) ** 2
+    return int(np.argmin(distance))
+
+
+# ------------------------------------------------------------------------
+#    Refractive indices
+# ------------------------------------------------------------------------
+
+# calculates the IORs of the given materials at the given wavelengths in um - returns a (materials, wavelengths) array
+# with 1.0 for air and NaN for unknown materials. Materials are found by name or alias - if the refractive indices nd
+# and Abbe numbers vd of the materials are given, glasses without (matching) catalog entry use the dispersion of the
+# nearest catalog glass, scaled such that nd and vd are reproduced exactly
+def ior_table(material_names, wavelengths, design_iors=None, abbe_numbers=None):
+    table = catalog()
+    wavelengths = np.atleast_1d(np.asarray(wavelengths, dtype=np.float64))
+    iors = np.full((len(material_names), len(wavelengths)), np.nan)
+
+    # per material: catalog row and n = base + (n_catalog - offset) * scale
+    rows, materials, base, offset, scale = [], [], [], [], []
+    for material, name in enumerate(material_names):
+        if name == 'air' or name == 'Air':
+            iors[material] = 1.0
+            continue
+        nd = design_iors[material] if design_iors is not None else 0.0
+        vd = abbe_numbers[material] if abbe_numbers is not None else 0.0
+        row = glass_row(name)
+        if row >= 0 and (nd <= 1.0 or abs(table['nd'][row] - nd) <= name_match_tolerance):
+            rows.append(row)
+            materials.append(material)
+            base.append(0.0)
+            offset.append(0.0)
+            scale.append(1.0)
+        elif nd > 1.0 and vd > 0.0 and len(table['names']) > 0:
+            row = nearest_glass(nd, vd)
+            rows.append(row)
+            materials.append(material)
+            base.append(nd)
+            offset.append(table['nd'][row])
+            scale.append((nd - 1.0) / vd * table['vd'][row] / (table['nd'][row] - 1.0))
+
+    if len(rows) > 0:
+        catalog_iors = evaluate(table['constant'][rows], table['pole_k'][rows], table['pole_l'][rows],
+                                table['power_coefficients'][rows], wavelengths)
+        iors[materials] = np.array(base)[:, None] + (catalog_iors - np.array(offset)[:, None]) * np.array(scale)[:, None]
+    return iors
+
+# calculates the IOR of the glass with the given name or alias at the given wavelength in um - None if it is unknown
+def ior(name: str, wavelength: float) -> float:
+    row = glass_row(name)
+    if row < 0:
+        return None
+    table = catalog()
+    return float(evaluate(table['constant'][row:row + 1], table['pole_k'][row:row + 1], table['pole_l'][row:row + 1],
+                          table['power_coefficients'][row:row + 1], wavelength)[0, 0])
@@ -0,0 +1,181 @@
+# ------------------------------------------------------------------------
+#    Relative illumination and vignetting over the sensor
+# ------------------------------------------------------------------------
+
+import math
+import numpy as np
+
+from collections import OrderedDict
+from os.path import getmtime, isfile
+
+from . import aiming
+from . import data
+from . import raytracer
+from . import sampling
+
+# maximum number of cached illumination maps - the least recently used map is dropped first
+max_cached_maps = 16
+# number of traced field angles and aperture rotations (within one blade sector) and rays per field point
+field_sample_count = 24
+azimuth_sample_count = 8
+illumination_ray_count = 4096
+# largest traced field angle in rad
+max_field_angle = 1.45
+
+# cached illumination maps by configuration key
+illumination_maps = OrderedDict()
+
+# ------------------------------------------------------------------------
+#    Helper functions
+# ------------------------------------------------------------------------
+
+# creates the cache key for an illumination map - the lens file modification time invalidates maps of edited files
+def illumination_key(objective_file: str, objective_scale: float, wavelength: float, aperture_size: float,
+                     aperture_blades: int, aperture_angle: float, sensor_width: float, sensor_height: float,
+                     distance: float, sensor_position: float, map_size: int):
+    mtime = getmtime(objective_file) if isfile(objective_file) else 0.0
+    return (objective_file, mtime, objective_scale, wavelength, aperture_size, aperture_blades, aperture_angle,
+            sensor_width, sensor_height, distance, sensor_position, map_size)
+
+# traces the pupil rays of one field angle for all aperture rotations - returns the fraction of transmitted rays and
+# the transmitted flux (relative to the object area) per aperture rotation as well as the radial image height of the
+# transmitted light on the sensor. The pupil points are mapped into the aperture polygon of every rotation, i.e. the
+# transmission is relative to the open stop area
+def trace_field(field_angle: float, distance: float, sensor_position: float, pupil_points, rotations, lens_system,
+                wavelength_index: int):
+    aim = aiming.aim_map(field_angle, distance, lens_system, wavelength_index)
+
+    transmission = np.zeros(len(rotations))
+    flux = np.zeros(len(rotations))
+    image_height = np.nan
+    for rotation_id, rotation in enumerate(rotations):
+        # a field rotated about the optical axis sees the aperture polygon rotated the other way
+        angle_deg = data.aperture_angle - math.degrees(rotation)
+        polygon_points = aiming.polygon_pupil_points(pupil_points, data.aperture_blades, angle_deg)
+        positions, directions = aim.launch(polygon_points)
+        # the object side projected solid angle of each ray is cos(theta) dOmega = |det J| dp / (1 + |s|^2)^2
+        slopes = directions[:, 1:]
+        weights = np.abs(np.linalg.det(aim.slope_jacobians(polygon_points))) / (1.0 + np.einsum('ni,ni->n', slopes, slopes)) ** 2
+        traced_positions, traced_directions, valid = raytracer.trace_rays_3d(positions, directions, lens_system, wavelength_index,
+                                                                             angle_deg=angle_deg)
+        transmission[rotation_id] = np.count_nonzero(valid) / len(valid)
+        flux[rotation_id] = np.sum(weights[valid]) / len(valid)
+        if rotation_id == 0 and np.any(valid):
+            image_height = float(np.mean(raytracer.sensor_intersections_3d(traced_positions[valid], traced_directions[valid], sensor_position)[:, 0]))
+    return transmission, flux, image_height, aim.object_height
+
+
+# ------------------------------------------------------------------------
+#    Field profile and sensor map
+# ------------------------------------------------------------------------
+
+# traces field angles up to the given image height (in m) on the sensor - returns a dict with the field angles, the
+# image heights, the vignetting (transmitted fraction of the aperture) and the relative illumination normalized to the
+# image center, both with shape (aperture rotations, field angles) for rotations evenly spaced over one blade sector
+def field_profile(max_image_height: float, distance: float, sensor_position: float, lens_system=None,
+                  wavelength_index: int = 0, ray_count: int = None, strategy: str = 'sobol'):
+    if lens_system is None:
+        lens_system = data.lens_system
+    ray_count = ray_count or illumination_ray_count
+    pupil_points = sampling.pupil_points(strategy, ray_count)
+    sector = 2.0 * math.pi / data.aperture_blades
+    rotations = np.arange(azimuth_sample_count) * sector / azimuth_sample_count
+    # the chief ray crosses the axis, i.e. the image lies on the opposite side of the object for positive heights
+    orientation = np.sign(trace_field(1e-3, distance, sensor_position, pupil_points[:1], [0.0], lens_system, wavelength_index)[2]) or -1.0
+
+    # grow the field until the sensor corner or the edge of the image circle is reached
+    field_limit = 0.02
+    while field_limit < max_field_angle:
+        image_height = trace_field(field_limit, distance, sensor_position, pupil_points[:256], [0.0], lens_system, wavelength_index)[2]
+        if not np.isfinite(image_height) or orientation * image_height >= max_image_height:
+            break
+        field_limit = min(1.5 * field_limit, max_field_angle)
+
+    field_angles = np.linspace(0.0, field_limit, field_sample_count)
+    transmission = np.zeros((len(rotations), len(field_angles)))
+    flux = np.zeros((len(rotations), len(field_angles)))
+    image_heights = np.full(len(field_angles), np.nan)
+    object_heights = np.zeros(len(field_angles))
+    for field_id, field_angle in enumerate(field_angles):
+        transmission[:, field_id], flux[:, field_id], image_heights[field_id], object_heights[field_id] = trace_field(
+            field_angle, distance, sensor_position, pupil_points, rotations, lens_system, wavelength_index)
+    image_heights *= orientation
+
+    # the irradiance is the flux divided by the image area of the object area, i.e. by the radial and tangential
+    # magnification of the (rotationally symmetric) imaging
+    with np.errstate(divide='ignore', invalid='ignore'):
+        radial = np.abs(np.gradient(image_heights, object_heights))
+        tangential = np.abs(image_heights / object_heights)
+        tangential[0] = radial[0]
+        irradiance = flux / (radial * tangential)
+        relative_illumination = irradiance / irradiance[0, 0]
+    relative_illumination[~np.isfinite(relative_illumination)] = 0.0
+    return {
+        'field_angles': field_angles,
+        'image_heights': image_heights,
+        'rotations': rotations,
+        'vignetting': transmission,
+        'relative_illumination': relative_illumination
+    }
+
+# interpolates a profile quantity to points on the sensor given by radius and azimuth - the profile repeats with the
+# blade sector in azimuth, points beyond the traced image circle receive no light
+def profile_to_points(profile, quantity, radii, azimuths):
+    heights = profile['image_heights']
+    # use the monotonic part of the traced image heights
+    usable = np.isfinite(heights)
+    usable &= np.concatenate(([True], np.diff(np.where(usable, heights, -np.inf)) > 0.0))
+    usable = np.logical_and.accumulate(usable)
+    values = profile[quantity][:, usable]
+    heights = heights[usable]
+    rotations = profile['rotations']
+    sector = 2.0 * math.pi / data.aperture_blades
+
+    # linear interpolation in azimuth between the periodic aperture rotations
+    position = np.mod(azimuths, sector) / sector * len(rotations)
+    lower = np.floor(position).astype(np.int64) % len(rotations)
+    upper = (lower + 1) % len(rotations)
+    fraction = position - np.floor(position)
+    result = np.zeros(np.shape(radii))
+    for rotation_id in range(len(rotations)):
+        radial_values = np.interp(radii, heights, values[rotation_id], right=0.0)
+        result += np.where(lower == rotation_id, 1.0 - fraction, 0.0) * radial_values
+        result += np.where(upper == rotation_id, fraction, 0.0) * radial_values
+    return result
+
+# computes relative illumination and vignetting maps over a sensor of the given width (y) and height (z) in m with
+# map_size pixels along the longer side - returns a dict with (rows, columns) arrays, rows running along z
+def illumination_map(sensor_width: float, sensor_height: float, distance: float, sensor_position: float,
+                     map_size: int = 256, lens_system=None, wavelength_index: int = 0):
+    if lens_system is None:
+        lens_system = data.lens_system
+    columns = max(int(round(map_size * sensor_width / max(sensor_width, sensor_height))), 1)
+    rows = max(int(round(map_size * sensor_height / max(sensor_width, sensor_height))), 1)
+    y = (np.arange(columns) + 0.5) / columns * sensor_width - 0.5 * sensor_width
+    z = (np.arange(rows) + 0.5) / rows * sensor_height - 0.5 * sensor_height
+    y, z = np.meshgrid(y, z)
+    radii = np.hypot(y, z)
+    azimuths = np.arctan2(z, y)
+
+    profile = field_profile(float(np.max(radii)), distance, sensor_position, lens_system, wavelength_index)
+    return {
+        'profile': profile,
+        'relative_illumination': profile_to_points(profile, 'relative_illumination', radii, azimuths),
+        'vignetting': profile_to_points(profile, 'vignetting', radii, azimuths)
+    }
+
+# returns the cached illumination map for the given key or computes it
+def cached_illumination_map(key, sensor_width: float, sensor_height: float, distance: float, sensor_position: float,
+                            map_size: int = 256, lens_system=None, wavelength_index: int = 0):
+    if key in illumination_maps:
+        illumination_maps.move_to_end(key)
+        return illumination_maps[key]
+    result = illumination_map(sensor_width, sensor_height, distance, sensor_position, map_size, lens_system, wavelength_index)
+    illumination_maps[key] = result
+    while len(illumination_maps) > max_cached_maps:
+        illumination_maps.popitem(last=False)
+    return result
+
+# removes all cached illumination maps
+def clear_illumination_maps():
+    illumination_maps.clear()
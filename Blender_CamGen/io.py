@@ -4,9 +4,11 @@
 
 import bpy
 import csv
+import math
+import numpy as np
 
-from os import listdir, read
-from os.path import isfile, join
+from os import listdir, makedirs, read, replace, stat
+from os.path import basename, dirname, isfile, join, splitext
 
 from . import calc
 from . import data
@@ -27,8 +29,8 @@ def str_to_float(string: str) -> float:
 #    Camera GUI Parameters IO
 # ------------------------------------------------------------------------
 
-# writes camera parameters to csv file at specified location
-def write_cam_params(filepath: str):
+# writes camera parameters to csv file at specified location - optionally also the radial distortion of the camera
+def write_cam_params(filepath: str, export_distortion: bool = False):
     cg = bpy.data.scenes[0].camera_generator
 
     # create/open file and save parameters to it
@@ -45,6 +47,7 @@ def write_cam_params(filepath: str):
         writer.writerow(['prop_objective_scale', cg.prop_objective_scale])
         writer.writerow(['prop_lens_creation_method', cg.prop_lens_creation_method])
         writer.writerow(['prop_lens_patch_size', cg.prop_lens_patch_size])
+        writer.writerow(['prop_lens_max_deviation', cg.prop_lens_max_deviation])
         writer.writerow(['prop_vertex_count_radial', cg.prop_vertex_count_radial])
         writer.writerow(['prop_vertex_count_height', cg.prop_vertex_count_height])
         writer.writerow(['prop_aperture_blades', cg.prop_aperture_blades])
@@ -54,6 +57,7 @@ def write_cam_params(filepath: str):
         writer.writerow(['prop_sensor_height', cg.prop_sensor_height])
         writer.writerow(['prop_pixel_size', cg.prop_pixel_size])
         writer.writerow(['prop_wavelength', cg.prop_wavelength])
+        writer.writerow(['prop_focus_mode', cg.prop_focus_mode])
         writer.writerow(['prop_focal_distance', cg.prop_focal_distance])
         writer.writerow(['prop_sensor_mainlens_distance', cg.prop_sensor_mainlens_distance])
         writer.writerow(['prop_mla_enabled', cg.prop_mla_enabled])
@@ -65,6 +69,52 @@ def write_cam_params(filepath: str):
         writer.writerow(['prop_ml_type_2_f', cg.prop_ml_type_2_f])
         writer.writerow(['prop_ml_type_3_f', cg.prop_ml_type_3_f])
 
+    # optionally save the radial distortion ground truth of the configuration next to the parameters
+    if export_distortion:
+        write_cam_distortion(splitext(filepath)[0] + '_distortion.csv')
+
+# traces the radial distortion of the current camera configuration and writes it to the given csv file - prints an
+# error and writes nothing if the configuration can not be traced, i.e. saving the camera parameters never fails on it
+def write_cam_distortion(filepath: str) -> bool:
+    cg = bpy.data.scenes[0].camera_generator
+    # lengths are given in mm, the focus distance in cm
+    sensor_width = cg.prop_sensor_width / 1000.0
+    sensor_height = cg.prop_sensor_height / 1000.0
+    distance = cg.prop_focus_distance / 100.0
+    sensor_position = cg.prop_sensor_mainlens_distance / 1000.0
+    if data.lens_system is None or not sensor_position > 0.0:
+        print("Distortion export skipped: no objective loaded or no valid sensor position.")
+        return False
+
+    # import here since the tracing modules depend on the data module, which imports this one
+    from . import distortion
+    try:
+        key = distortion.distortion_key(data.objective_file, cg.prop_objective_scale, cg.prop_wavelength, sensor_width, sensor_height,
+                                        distance, sensor_position)
+        table = distortion.cached_distortion_table(key, 0.5 * math.hypot(sensor_width, sensor_height), distance, sensor_position)
+        if table is None:
+            print("Distortion export skipped: the chief rays of the configuration can not be traced.")
+            return False
+        write_distortion_table(filepath, table)
+    except (ArithmeticError, ValueError, np.linalg.LinAlgError, OSError) as error:
+        print("Distortion export failed: " + str(error))
+        return False
+    return True
+
+# writes the coefficients of the fitted distortion models and the lookup table (field angle in rad, heights in m)
+def write_distortion_table(filepath: str, table):
+    with open(filepath, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, delimiter=';', quotechar='&', quoting=csv.QUOTE_MINIMAL)
+
+        writer.writerow(['focal_length', table['focal_length']])
+        writer.writerow(['brown_conrady'] + list(table['brown_conrady']))
+        writer.writerow(['brown_conrady_residual', table['brown_conrady_residual']])
+        writer.writerow(['polynomial'] + list(table['polynomial']))
+        writer.writerow(['polynomial_residual', table['polynomial_residual']])
+        writer.writerow(['field_angle', 'object_height', 'image_height', 'ideal_image_height', 'relative_distortion'])
+        for row in zip(table['field_angles'], table['object_heights'], table['image_heights'], table['ideal_heights'], table['relative_distortion']):
+            writer.writerow(row)
+
 
 # reads camera parameters from csv file at specified location
 def read_cam_params(filepath: str):
@@ -104,56 +154,140 @@ def read_cam_params(filepath: str):
             setattr(cg, read_property[0], read_property[1])
 
 
+# ------------------------------------------------------------------------
+#    Binary cache
+# ------------------------------------------------------------------------
+
+# Parsed csv files are stored as .npz files in a cache directory next to the csv files and additionally kept in memory,
+# both are validated against the modification time and size of the csv file.
+cache_directory_name = '__camgen_cache__'
+# version of the cached arrays - caches with other versions are ignored
+cache_version = 2
+
+# parsed files in memory by path and cache kind: (signature, arrays)
+parsed_files = {}
+# sorted directory listings by path: (directory modification time, file names)
+directory_listings = {}
+
+# returns the modification time and size of a file
+def file_signature(filepath: str):
+    file_stat = stat(filepath)
+    return np.array([file_stat.st_mtime, file_stat.st_size, cache_version], dtype=np.float64)
+
+# returns the path of the binary cache of the given kind for a csv file
+def binary_cache_path(filepath: str, kind: str) -> str:
+    return join(dirname(filepath), cache_directory_name, basename(filepath) + '.' + kind + '.npz')
+
+# returns the arrays parsed from the csv file by the given parser, taken from memory or the binary cache if the file
+# did not change - the parser returns a dict of NumPy arrays, which is stored in both caches
+def cached_arrays(filepath: str, kind: str, parser):
+    signature = file_signature(filepath)
+    key = (filepath, kind)
+    if key in parsed_files and np.array_equal(parsed_files[key][0], signature):
+        return parsed_files[key][1]
+
+    cache_path = binary_cache_path(filepath, kind)
+    arrays = None
+    if isfile(cache_path):
+        try:
+            with np.load(cache_path) as cached:
+                if np.array_equal(cached['signature'], signature):
+                    arrays = {name: cached[name] for name in cached.files if name != 'signature'}
+        except (OSError, ValueError, KeyError):
+            arrays = None
+    if arrays is None:
+        arrays = parser(filepath)
+        try:
+            makedirs(dirname(cache_path), exist_ok=True)
+            # write to a temporary file first so that concurrent readers never see partial caches
+            with open(cache_path + '.tmp', 'wb') as cache_file:
+                np.savez(cache_file, signature=signature, **arrays)
+            replace(cache_path + '.tmp', cache_path)
+        except OSError:
+            print("Could not write binary cache " + cache_path + ".")
+    parsed_files[key] = (signature, arrays)
+    return arrays
+
+# returns the sorted names of all files in the directory - the listing is cached until the directory changes
+def sorted_files(directory: str):
+    mtime = stat(directory).st_mtime
+    if directory in directory_listings and directory_listings[directory][0] == mtime:
+        return directory_listings[directory][1]
+    files = sorted(f for f in listdir(directory) if isfile(join(directory, f)))
+    directory_listings[directory] = (mtime, files)
+    return files
+
+# removes all parsed files and directory listings from memory - the binary caches on disk are kept
+def clear_parsed_files():
+    parsed_files.clear()
+    directory_listings.clear()
+
+
 # ------------------------------------------------------------------------
 #    Lenses IO
 # ------------------------------------------------------------------------
 
-# reads lens parameters from csv file
-def read_lens_file(filepath: str):
+# parses the rows of a lens file into arrays of the raw values in mm
+def parse_lens_rows(filepath: str):
+    rows = []
+    with open(filepath, 'r', newline='') as csvfile:
+        reader = csv.reader(csvfile, delimiter=';')
+        for row_idx, row in enumerate(reader):
+            # ignore the first line since it contains a parameter description
+            if row_idx < 1:
+                continue
+            rows.append(row)
+    return {
+        'radius': np.array([str_to_float(row[0]) for row in rows], dtype=np.float64),
+        'thickness': np.array([str_to_float(row[1]) for row in rows], dtype=np.float64),
+        'material': np.array([row[2].strip() for row in rows], dtype=np.str_),
+        'ior': np.array([str_to_float(row[3]) for row in rows], dtype=np.float64),
+        'abbe_number': np.array([str_to_float(row[4]) for row in rows], dtype=np.float64),
+        'semi_aperture': np.array([str_to_float(row[5]) for row in rows], dtype=np.float64)
+    }
+
+# reads lens parameters from csv file - the objective scale of the GUI is used if no scale is given
+def read_lens_file(filepath: str, scale: float = None):
+    if scale is None:
+        scale = bpy.data.scenes[0].camera_generator.prop_objective_scale
+    rows = cached_arrays(filepath, 'lens', parse_lens_rows)
     objective = []
-    reader = csv.reader(open(filepath, 'r'), delimiter=';')
-    glass_data_known = True
-    for row_idx, row in enumerate(reader):
-        # ignore the first line since it contains a parameter description
-        if row_idx < 1:
-            continue
-        ior = str_to_float(row[3])
+    for radius, thickness, material, ior, abbe_number, semi_aperture in zip(rows['radius'].tolist(), rows['thickness'].tolist(),
+                                                                           rows['material'].tolist(), rows['ior'].tolist(),
+                                                                           rows['abbe_number'].tolist(), rows['semi_aperture'].tolist()):
         if ior == 0.0:
             ior = 1.0
 
-        # get objective scale
-        scale = bpy.data.scenes[0].camera_generator.prop_objective_scale
-
         # add leading zero for surface names
         name_part = "_"
         if len(objective) < 10:
             name_part = "_0"
         objective.append({
-            'radius': scale * str_to_float(row[0]) / 1000,
-            'thickness': scale * str_to_float(row[1]) / 1000,
-            'material': row[2].strip(),
+            'radius': scale * radius / 1000,
+            'thickness': scale * thickness / 1000,
+            'material': material,
             'ior': ior,
+            'abbe_number': abbe_number,
             'ior_wavelength': ior,
             'ior_ratio': ior,
-            'semi_aperture': scale * str_to_float(row[5]) / 1000,
+            'semi_aperture': scale * semi_aperture / 1000,
             'position': 0.0,
-            'name': "Surface"+name_part+str(len(objective)+1)+"_"+row[2].strip()
+            'name': "Surface"+name_part+str(len(objective)+1)+"_"+material
         })
 
-        lens = objective[len(objective)-1]
-        if lens['material'] != 'air' and lens['material'] != 'Air':
-            if calc.ior(lens['material'], 0.5) == None:
-                glass_data_known = False
+    # glasses are known if they are found in the glass catalog by name or by their nd and vd
+    iors = calc.ior_table([lens['material'] for lens in objective], [0.5], [lens['ior'] for lens in objective],
+                          [lens['abbe_number'] for lens in objective])
+    glass_data_known = not np.any(np.isnan(iors))
 
     return objective, glass_data_known
 
-# 
-def load_lens_file(lens_directory):
+# returns the path of the lens file currently selected in the objective list
+def lens_file_path(lens_directory):
     cg = bpy.data.scenes[0].camera_generator
     objective_id = int(cg.prop_objective_list[10:])
-    # create a list of available lens files
-    lensfiles = [f for f in listdir(lens_directory) if isfile(join(lens_directory, f))]
-    lensfiles.sort()
+    # list of available lens files
+    lensfiles = sorted_files(lens_directory)
     file = ''
     for counter, lensfile in enumerate(lensfiles):
         # check if file ends with .csv
@@ -161,19 +295,74 @@ def load_lens_file(lens_directory):
         if file_ending == 'csv' and counter == objective_id:
             file = lensfile
             break
+    return join(lens_directory, file)
+
+# reads the lens file currently selected in the objective list
+def load_lens_file(lens_directory):
     # read lens parameters
-    return read_lens_file(join(lens_directory,file))
+    return read_lens_file(lens_file_path(lens_directory))
 
-# read dispersion parameters for Sellmeier and Cauchy equation from given files
-def read_dispersion_data(dispersion_file: str):
-    # Sellmeier type data:
-    dispersion_data = {}
+# parses dispersion parameters into an array of material names and a (materials, 7) coefficient array
+def parse_dispersion_rows(dispersion_file: str):
+    names = []
+    coefficients = []
     with open(dispersion_file, newline='') as csvfile:
         reader = csv.reader(csvfile, delimiter=',', quotechar='&')
         for row in reader:
-            dispersion_data[row[0]] = (float(row[1]),float(row[2]),float(row[3]),float(row[4]),float(row[5]),float(row[6]),float(row[7]))
+            names.append(row[0])
+            coefficients.append([float(value) for value in row[1:8]])
+    return {'name': np.array(names, dtype=np.str_), 'coefficients': np.array(coefficients, dtype=np.float64).reshape(-1, 7)}
+
+# read dispersion parameters for Sellmeier and Cauchy equation from given files
+def read_dispersion_data(dispersion_file: str):
+    # Sellmeier type data:
+    rows = cached_arrays(dispersion_file, 'dispersion', parse_dispersion_rows)
+    return {name: tuple(coefficients) for name, coefficients in zip(rows['name'].tolist(), rows['coefficients'].tolist())}
+
+# ------------------------------------------------------------------------
+#    Glass catalogs IO
+# ------------------------------------------------------------------------
 
-    return dispersion_data
+# parses a Zemax glass catalog (AGF) into arrays of the glass names, dispersion formula ids and the (glasses, 10)
+# formula coefficients - vendors ship these files either as UTF-16 or as 8 bit text
+def parse_glass_catalog(catalog_file: str):
+    with open(catalog_file, 'rb') as agf_file:
+        content = agf_file.read()
+    if content[:2] in (b'\xff\xfe', b'\xfe\xff'):
+        text = content.decode('utf-16')
+    else:
+        text = content.decode('latin-1')
+    names = []
+    formulas = []
+    coefficients = []
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) > 2 and fields[0] == 'NM':
+            names.append(fields[1])
+            formulas.append(int(float(fields[2])))
+            coefficients.append([0.0] * 10)
+        elif len(fields) > 1 and fields[0] == 'CD' and len(coefficients) > 0:
+            values = [float(value) for value in fields[1:11]]
+            coefficients[-1][:len(values)] = values
+    return {
+        'name': np.array(names, dtype=np.str_),
+        'formula': np.array(formulas, dtype=np.int64),
+        'coefficients': np.array(coefficients, dtype=np.float64).reshape(-1, 10)
+    }
+
+# reads a Zemax glass catalog (AGF)
+def read_glass_catalog(catalog_file: str):
+    return cached_arrays(catalog_file, 'glass', parse_glass_catalog)
+
+# reads glass aliases from a csv file with one "alias,glass name" pair per line
+def read_glass_aliases(alias_file: str):
+    aliases = {}
+    with open(alias_file, newline='') as csvfile:
+        reader = csv.reader(csvfile, delimiter=',')
+        for row in reader:
+            if len(row) > 1:
+                aliases[row[0].strip()] = row[1].strip()
+    return aliases
 
 # ------------------------------------------------------------------------
 #    Additional Blender resources IO
@@ -189,4 +378,37 @@ def load_basic_camera(path: str):
     for materials in ['Glass Material', 'MLA Hex Material', 'MLA Rect Material', 'Calibration Pattern Material']:
         bpy.data.materials[materials].use_fake_user = True
 
-    bpy.context.view_layer.active_layer_collection = bpy.context.view_layer.layer_collection.children['Camera Collection']
\ No newline at end of file
+    bpy.context.view_layer.active_layer_collection = bpy.context.view_layer.layer_collection.children['Camera Collection']
+
+
+# ------------------------------------------------------------------------
+#    Sensor map IO
+# ------------------------------------------------------------------------
+
+# image formats by file extension for exporting sensor maps as images
+image_formats = {'.png': 'PNG', '.exr': 'OPEN_EXR', '.tif': 'TIFF', '.tiff': 'TIFF', '.hdr': 'HDR'}
+
+# writes a (rows, columns) or (rows, columns, channels) map over the sensor to the specified location - .npy files
+# keep the raw array, image files store up to three channels in RGB with the first row at the bottom
+def write_sensor_map(filepath: str, values):
+    values = np.asarray(values, dtype=np.float32)
+    extension = splitext(filepath)[1].lower()
+    if extension == '.npy':
+        np.save(filepath, values)
+        return
+    if extension not in image_formats:
+        print("Unsupported sensor map format " + extension + ".")
+        return
+
+    if values.ndim == 2:
+        values = values[:, :, None]
+    rows, columns, channels = values.shape
+    pixels = np.ones((rows, columns, 4), dtype=np.float32)
+    # single channel maps are written as gray images
+    pixels[:, :, :3] = values[:, :, [min(i, channels - 1) for i in range(3)]]
+    image = bpy.data.images.new('Sensor Map', columns, rows, alpha=False, float_buffer=True)
+    image.pixels.foreach_set(pixels.ravel())
+    image.filepath_raw = filepath
+    image.file_format = image_formats[extension]
+    image.save()
+    bpy.data.images.remove(image)
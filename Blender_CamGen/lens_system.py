@@ -0,0 +1,135 @@
+# ------------------------------------------------------------------------
+#    Compiled objective representation used for ray tracing
+# ------------------------------------------------------------------------
+
+import numpy as np
+
+from . import calc
+
+from typing import Any, Dict, List, Sequence
+
+# ------------------------------------------------------------------------
+#    Helper functions
+# ------------------------------------------------------------------------
+
+# returns a read-only contiguous float64 copy of the given values
+def frozen_array(values) -> np.ndarray:
+    array = np.ascontiguousarray(values, dtype=np.float64)
+    array.flags.writeable = False
+    return array
+
+
+# ------------------------------------------------------------------------
+#    Lens system
+# ------------------------------------------------------------------------
+
+# float array attributes of a lens system, e.g. for packing it into a single buffer
+array_slots = ('radius', 'curvature', 'thickness', 'center', 'vertex', 'semi_aperture', 'semi_aperture_squared',
+               'design_ior', 'design_abbe', 'wavelengths', 'ior', 'ior_ratio')
+
+# immutable struct-of-arrays view of an objective - built once from the io.read_lens_file output, all per surface
+# quantities are stored as read-only NumPy arrays indexed by surface, IOR arrays additionally by wavelength
+class LensSystem:
+    __slots__ = ('names', 'materials', 'count', 'radius', 'curvature', 'thickness', 'center', 'vertex',
+                 'semi_aperture', 'semi_aperture_squared', 'flat', 'design_ior', 'design_abbe', 'wavelengths', 'ior', 'ior_ratio',
+                 'aperture_index')
+
+    # objective: list of surface dicts as returned by io.read_lens_file
+    # wavelengths: wavelengths in micrometers for the IOR rows - None uses the IORs stored in the objective
+    def __init__(self, objective: List[Dict[str, Any]], wavelengths: Sequence[float] = None):
+        set_slot = object.__setattr__
+        set_slot(self, 'names', tuple(lens['name'] for lens in objective))
+        set_slot(self, 'materials', tuple(lens['material'] for lens in objective))
+        set_slot(self, 'count', len(objective))
+
+        radius = frozen_array([lens['radius'] for lens in objective])
+        semi_aperture = frozen_array([lens['semi_aperture'] for lens in objective])
+        set_slot(self, 'radius', radius)
+        set_slot(self, 'thickness', frozen_array([lens['thickness'] for lens in objective]))
+        set_slot(self, 'semi_aperture', semi_aperture)
+        set_slot(self, 'flat', np.equal(radius, 0.0))
+        self.flat.flags.writeable = False
+        set_slot(self, 'curvature', frozen_array(np.divide(1.0, radius, out=np.zeros_like(radius), where=~self.flat)))
+        set_slot(self, 'semi_aperture_squared', frozen_array(semi_aperture * semi_aperture))
+
+        # surface positions relative to the aperture - center is the sphere center, vertex the intersection with the axis
+        aperture_index = calc.aperture_index(self.materials)
+        center = calc.surface_positions(radius, self.thickness, semi_aperture, aperture_index)
+        set_slot(self, 'aperture_index', aperture_index)
+        set_slot(self, 'center', frozen_array(center))
+        set_slot(self, 'vertex', frozen_array(center - radius))
+
+        # IORs of the media behind each surface per wavelength and the resulting ratios used for refraction
+        set_slot(self, 'design_ior', frozen_array([lens['ior'] for lens in objective]))
+        set_slot(self, 'design_abbe', frozen_array([lens.get('abbe_number', 0.0) for lens in objective]))
+        if wavelengths is None:
+            set_slot(self, 'wavelengths', frozen_array([]))
+            ior = [[lens['ior_wavelength'] for lens in objective]]
+        else:
+            set_slot(self, 'wavelengths', frozen_array(wavelengths))
+            # glasses missing in the catalog are matched by nd and vd, unknown ones keep their stored IOR for all wavelengths
+            ior = calc.ior_table(self.materials, self.wavelengths, self.design_ior, self.design_abbe).T
+            ior = np.where(np.isnan(ior), self.design_ior, ior)
+        set_slot(self, 'ior', frozen_array(ior))
+        set_slot(self, 'ior_ratio', frozen_array(calc.ior_ratios(self.ior)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('LensSystem is immutable')
+
+    def __len__(self) -> int:
+        return self.count
+
+    # returns a new lens system with IORs evaluated at the given wavelengths in micrometers
+    def with_wavelengths(self, wavelengths: Sequence[float]) -> 'LensSystem':
+        return LensSystem(self.as_objective(), wavelengths)
+
+    # packs all per surface arrays into one contiguous float64 buffer - returns the buffer and the layout which
+    # from_packed needs besides the buffer, e.g. for sharing the lens system between processes
+    def packed(self):
+        layout = {'names': self.names, 'materials': self.materials, 'aperture_index': self.aperture_index, 'arrays': {}}
+        offset = 0
+        for slot in array_slots:
+            values = getattr(self, slot)
+            layout['arrays'][slot] = (offset, values.shape)
+            offset += values.size
+        buffer = np.empty(offset, dtype=np.float64)
+        for slot in array_slots:
+            start, shape = layout['arrays'][slot]
+            buffer[start:start + int(np.prod(shape))] = getattr(self, slot).ravel()
+        return buffer, layout
+
+    # creates a lens system whose arrays are read-only views of a buffer created by packed
+    @classmethod
+    def from_packed(cls, buffer, layout) -> 'LensSystem':
+        lens_system = object.__new__(cls)
+        set_slot = object.__setattr__
+        set_slot(lens_system, 'names', tuple(layout['names']))
+        set_slot(lens_system, 'materials', tuple(layout['materials']))
+        set_slot(lens_system, 'count', len(layout['names']))
+        set_slot(lens_system, 'aperture_index', layout['aperture_index'])
+        for slot, (start, shape) in layout['arrays'].items():
+            values = buffer[start:start + int(np.prod(shape))].reshape(shape)
+            values.flags.writeable = False
+            set_slot(lens_system, slot, values)
+        flat = np.equal(lens_system.radius, 0.0)
+        flat.flags.writeable = False
+        set_slot(lens_system, 'flat', flat)
+        return lens_system
+
+    # creates the dict view of the objective for the Blender UI - IORs are taken from the given wavelength row
+    def as_objective(self, wavelength_index: int = 0) -> List[Dict[str, Any]]:
+        objective = []
+        for i in range(self.count):
+            objective.append({
+                'radius': float(self.radius[i]),
+                'thickness': float(self.thickness[i]),
+                'material': self.materials[i],
+                'ior': float(self.design_ior[i]),
+                'abbe_number': float(self.design_abbe[i]),
+                'ior_wavelength': float(self.ior[wavelength_index, i]),
+                'ior_ratio': float(self.ior_ratio[wavelength_index, i]),
+                'semi_aperture': float(self.semi_aperture[i]),
+                'position': float(self.center[i]),
+                'name': self.names[i]
+            })
+        return objective
@@ -0,0 +1,173 @@
+# ------------------------------------------------------------------------
+#    Multi-process ray tracing with shared-memory ray buffers
+# ------------------------------------------------------------------------
+
+import multiprocessing
+import numpy as np
+import os
+import time
+
+from multiprocessing import shared_memory
+from multiprocessing import util
+
+from . import data
+from . import raytracer
+from . lens_system import LensSystem
+
+# number of rays per task handed to a worker process
+shard_size = 1 << 17
+
+# shared buffers and lens system attached by a worker process
+worker_state = {}
+
+# ------------------------------------------------------------------------
+#    Helper functions
+# ------------------------------------------------------------------------
+
+# returns the multiprocessing context used for the worker pool - workers are forked since the add-on modules can only
+# be imported inside Blender, None if forking is not available on this platform
+def pool_context():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+# creates a shared memory block holding a copy of the given array (or zeros for the given shape and dtype)
+def create_shared_array(shape, dtype, values=None):
+    size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+    memory = shared_memory.SharedMemory(create=True, size=size)
+    array = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+    if values is not None:
+        array[...] = values
+    return memory, array
+
+# attaches to a shared memory block and returns it together with its array view - the block is owned and unlinked by
+# the creating process, so the attachment is not tracked where Python allows it (3.13+), older versions register it
+# with the resource tracker that forked workers share with the parent, which is cleared by the parent's unlink
+def attach_shared_array(name, shape, dtype):
+    try:
+        memory = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+# releases the array views and closes the shared memory handles of a worker process
+def close_worker():
+    buffers = [value for value in worker_state.values() if isinstance(value, tuple) and len(value) == 2
+               and isinstance(value[0], shared_memory.SharedMemory)]
+    worker_state.clear()
+    for memory, _ in buffers:
+        memory.close()
+
+# pool initializer - attaches all shared buffers once per worker process and closes them again when the worker exits -
+# workers only see the arguments handed to them and must not touch bpy state, which is not safe to use after a fork
+def init_worker(buffers, layout, semi_aperture, blades, angle_deg, wavelength_index):
+    for key, (name, shape, dtype) in buffers.items():
+        worker_state[key] = attach_shared_array(name, shape, dtype)
+    worker_state['lens_system'] = LensSystem.from_packed(worker_state['lens'][1], layout)
+    worker_state['settings'] = (blades, angle_deg, wavelength_index)
+    data.semi_aperture = semi_aperture
+    util.Finalize(None, close_worker, exitpriority=10)
+
+# worker task - traces the rays of one shard and writes the results into the shared output buffers
+def trace_shard(start, stop):
+    blades, angle_deg, wavelength_index = worker_state['settings']
+    positions, directions, valid = raytracer.trace_rays_3d(worker_state['positions'][1][start:stop],
+                                                           worker_state['directions'][1][start:stop],
+                                                           worker_state['lens_system'], wavelength_index, blades, angle_deg)
+    worker_state['out_positions'][1][start:stop] = positions
+    worker_state['out_directions'][1][start:stop] = directions
+    worker_state['out_valid'][1][start:stop] = valid
+    return start
+
+
+# ------------------------------------------------------------------------
+#    Parallel tracing
+# ------------------------------------------------------------------------
+
+# traces 3D rays like raytracer.trace_rays_3d, but shards them across a pool of worker processes - rays, results and
+# the lens prescription are exchanged via shared memory and every shard writes to its own index range, so the merged
+# result does not depend on the scheduling - multiple processes are opt-in, by default or if forking is not available
+# the rays are traced in the calling process, processes=0 uses one process per CPU
+def trace_rays_3d_parallel(positions, directions, lens_system=None, wavelength_index=0, processes=1):
+    if lens_system is None:
+        lens_system = data.lens_system
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    if processes == 0:
+        processes = os.cpu_count() or 1
+    if processes == 1 or len(positions) <= shard_size:
+        return raytracer.trace_rays_3d(positions, directions, lens_system, wavelength_index)
+    context = pool_context()
+    if context is None:
+        return raytracer.trace_rays_3d(positions, directions, lens_system, wavelength_index)
+
+    ray_count = len(positions)
+    lens_buffer, layout = lens_system.packed()
+    shared = {
+        'lens': create_shared_array(lens_buffer.shape, np.float64, lens_buffer),
+        'positions': create_shared_array(positions.shape, np.float64, positions),
+        'directions': create_shared_array(directions.shape, np.float64, directions),
+        'out_positions': create_shared_array((ray_count, 3), np.float64),
+        'out_directions': create_shared_array((ray_count, 3), np.float64),
+        'out_valid': create_shared_array((ray_count,), np.bool_)
+    }
+    try:
+        buffers = {key: (memory.name, array.shape, array.dtype.str) for key, (memory, array) in shared.items()}
+        init_arguments = (buffers, layout, data.semi_aperture, data.aperture_blades, data.aperture_angle, wavelength_index)
+        shards = [(start, min(start + shard_size, ray_count)) for start in range(0, ray_count, shard_size)]
+        with context.Pool(processes, initializer=init_worker, initargs=init_arguments) as pool:
+            pool.starmap(trace_shard, shards)
+            # let the workers exit regularly, so that they run their finalizers before the blocks are unlinked
+            pool.close()
+            pool.join()
+        return shared['out_positions'][1].copy(), shared['out_directions'][1].copy(), shared['out_valid'][1].copy()
+    finally:
+        for memory, _ in shared.values():
+            memory.close()
+            memory.unlink()
+
+
+# ------------------------------------------------------------------------
+#    Benchmark
+# ------------------------------------------------------------------------
+
+# measures the throughput of the parallel tracer for the given process counts on random rays through the loaded lens
+# system and prints a scaling report - returns a list of dicts with process count, time, rays per second and speedup
+def benchmark(ray_count: int = 4000000, process_counts=None, lens_system=None, seed: int = 0):
+    if lens_system is None:
+        lens_system = data.lens_system
+    # more processes than CPUs only add overhead
+    if process_counts is None:
+        cpu_count = os.cpu_count() or 1
+        process_counts = sorted({count for count in (1, 2, 4) if count <= cpu_count} | {cpu_count})
+
+    # rays from an on-axis point into the cone of the first lens
+    rng = np.random.default_rng(seed)
+    distance = 1.0
+    cone = lens_system.semi_aperture[0] / (lens_system.vertex[0] + distance)
+    positions = np.zeros((ray_count, 3))
+    positions[:, 0] = -distance
+    directions = np.column_stack((np.ones(ray_count), rng.uniform(-cone, cone, (ray_count, 2))))
+
+    report = []
+    reference = None
+    for process_count in process_counts:
+        start = time.perf_counter()
+        result = trace_rays_3d_parallel(positions, directions, lens_system, processes=process_count)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = result
+        # the merge is deterministic, i.e. the results have to equal the first run exactly
+        identical = np.array_equal(reference[2], result[2]) and np.array_equal(reference[0][reference[2]], result[0][result[2]])
+        report.append({
+            'processes': process_count,
+            'seconds': elapsed,
+            'rays_per_second': ray_count / elapsed,
+            'speedup': report[0]['seconds'] / elapsed if report else 1.0,
+            'identical': identical
+        })
+
+    print("Processes | Time in s | Rays per s | Speedup | Identical")
+    for entry in report:
+        print(f"{entry['processes']:9d} | {entry['seconds']:9.3f} | {entry['rays_per_second']:10.3e} | {entry['speedup']:7.2f} | {entry['identical']}")
+    return report
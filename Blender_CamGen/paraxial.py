@@ -0,0 +1,284 @@
+# ------------------------------------------------------------------------
+#    Paraxial (first-order) optics based on ray transfer matrices
+# ------------------------------------------------------------------------
+
+import math
+import numpy as np
+
+from . import data
+from . import raytracer
+
+# ------------------------------------------------------------------------
+#    Ray transfer matrices
+# ------------------------------------------------------------------------
+
+# The paraxial ray state is (height, IOR * angle) so that all matrices have unit determinant. All matrices are
+# returned for every wavelength row of the lens system, i.e. with shape (wavelengths, 2, 2).
+
+# creates a stack of translation matrices over the given distances in media with the given IORs
+def translation_matrices(distances, iors):
+    distances = np.broadcast_to(np.asarray(distances, dtype=np.float64), np.shape(iors))
+    matrices = np.zeros(np.shape(iors) + (2, 2))
+    matrices[..., 0, 0] = 1.0
+    matrices[..., 1, 1] = 1.0
+    matrices[..., 0, 1] = distances / iors
+    return matrices
+
+# creates the refraction matrices of all surfaces - shape (wavelengths, surfaces, 2, 2)
+def refraction_matrices(lens_system):
+    iors_before = np.ones_like(lens_system.ior)
+    iors_before[:, 1:] = lens_system.ior[:, :-1]
+    matrices = np.zeros(lens_system.ior.shape + (2, 2))
+    matrices[..., 0, 0] = 1.0
+    matrices[..., 1, 1] = 1.0
+    matrices[..., 1, 0] = -(lens_system.ior - iors_before) * lens_system.curvature
+    return matrices
+
+# calculates the matrix from the first surface vertex (before refraction) to the vertex of surface end_index (before
+# refraction) - end_index None covers all surfaces and ends after the refraction at the last vertex
+def system_matrix(lens_system, end_index=None):
+    refractions = refraction_matrices(lens_system)
+    matrix = np.broadcast_to(np.eye(2), (len(lens_system.ior), 2, 2))
+    last = lens_system.count if end_index is None else end_index
+    for i in range(0, last):
+        matrix = refractions[:, i] @ matrix
+        if i < lens_system.count - 1:
+            matrix = translation_matrices(lens_system.thickness[i], lens_system.ior[:, i]) @ matrix
+    return matrix
+
+# calculates the matrix from the first surface vertex to the aperture plane at x = 0
+def stop_matrix(lens_system):
+    if lens_system.aperture_index == -1:
+        # the aperture lies in front of the objective
+        return translation_matrices(-lens_system.vertex[0], np.ones(len(lens_system.ior)))
+    return system_matrix(lens_system, lens_system.aperture_index)
+
+
+# ------------------------------------------------------------------------
+#    Focusing
+# ------------------------------------------------------------------------
+
+# calculates the paraxial image position on the optical axis for objects at the given distance(s) in front of the
+# aperture plane - works on scalars and arrays, infinite distances are supported
+def image_position(distance, lens_system=None, wavelength_index=0):
+    if lens_system is None:
+        lens_system = data.lens_system
+    (a, b), (c, d) = system_matrix(lens_system)[wavelength_index]
+    image_ior = lens_system.ior[wavelength_index, -1]
+    distance = np.asarray(distance, dtype=np.float64)
+    object_distance = lens_system.vertex[0] + distance
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # image distance behind the last vertex - a paraxial ray from the axis crosses it again after -y/u
+        image_distance = np.where(np.isinf(distance), -image_ior * a / c,
+                                  -image_ior * (a * object_distance + b) / (c * object_distance + d))
+    position = lens_system.vertex[-1] + image_distance
+    return float(position) if position.ndim == 0 else position
+
+# calculates the object distance in front of the aperture plane that is imaged to infinity (front focal point)
+def front_focal_distance(lens_system=None, wavelength_index=0) -> float:
+    if lens_system is None:
+        lens_system = data.lens_system
+    _, (c, d) = system_matrix(lens_system)[wavelength_index]
+    if c == 0.0:
+        return math.inf
+    return float(-d / c - lens_system.vertex[0])
+
+# calculates the largest object space angle of an on-axis ray passing the aperture in paraxial approximation - works on
+# scalars and arrays of distances
+def marginal_angle(distance, lens_system=None, wavelength_index=0):
+    if lens_system is None:
+        lens_system = data.lens_system
+    (a, b), _ = stop_matrix(lens_system)[wavelength_index]
+    object_distance = lens_system.vertex[0] + np.asarray(distance, dtype=np.float64)
+    # the ray has to pass the first lens as well as the aperture (taking into account the tracer's aperture margin)
+    height_per_angle = np.abs(a * object_distance + b)
+    with np.errstate(divide='ignore'):
+        max_angle = np.minimum(np.arctan2(lens_system.semi_aperture[0], object_distance),
+                               np.arctan(raytracer.meridional_aperture_radius() / height_per_angle))
+    return float(max_angle) if max_angle.ndim == 0 else max_angle
+
+# calculates the starting heights at the object plane of rays with the given field angle(s) that pass the center of
+# the aperture in paraxial approximation (chief rays)
+def chief_ray_height(field_angle, distance, lens_system=None, wavelength_index=0):
+    if lens_system is None:
+        lens_system = data.lens_system
+    (a, b), _ = stop_matrix(lens_system)[wavelength_index]
+    slope = np.tan(field_angle)
+    object_distance = lens_system.vertex[0] + distance
+    # the ray height at the first vertex has to vanish at the aperture
+    return -b * slope / a - object_distance * slope
+
+# calculates the sensor position for focusing on the given distance in O(surfaces) using the paraxial image position
+# if refine is set, a few real rays aimed through the aperture replace the paraxial result by their mean axis crossing
+# returns -1.0 if no image is formed
+def sensor_position_for_distance(distance, refine=True, ray_count=8, lens_system=None, wavelength_index=0):
+    if lens_system is None:
+        lens_system = data.lens_system
+    # check if objective loaded
+    if lens_system is None:
+        print("No objective has been loaded.")
+        return -1
+
+    position = image_position(distance, lens_system, wavelength_index)
+    if not math.isfinite(position):
+        return -1
+    if not refine:
+        return position
+
+    # trace a small fan of rays up to the paraxial marginal angle
+    angles = marginal_angle(distance, lens_system, wavelength_index) * np.arange(1, ray_count + 1) / ray_count
+    rays = np.column_stack((np.full(ray_count, -distance), np.zeros(ray_count), angles))
+    positions, directions, valid = raytracer.trace_rays(rays, lens_system, wavelength_index)
+    refined_position = raytracer.calculate_sensor_pos_batch(positions, directions, valid)
+    if refined_position == -1:
+        return position
+    return refined_position
+
+
+# ------------------------------------------------------------------------
+#    Cardinal points
+# ------------------------------------------------------------------------
+
+# calculates the first-order properties of the lens system for objects at infinity - positions are given on the optical
+# axis relative to the aperture plane, the stop radius defaults to the semi aperture of the aperture surface (or of the
+# first surface if the aperture lies in front of the objective) - returns a dict with effective (efl), back (bfl) and
+# front (ffl) focal lengths, focal points, principal planes, entrance and exit pupil positions and radii, the F-number
+# and the paraxial unvignetted field of view (paraxial_fov), i.e. the full field angle in degree for which the paraxial
+# chief ray passes all semi apertures - real rays and vignetting of the marginal rays are not taken into account
+def first_order_properties(lens_system=None, stop_radius: float = None, wavelength_index=0):
+    if lens_system is None:
+        lens_system = data.lens_system
+    (a, b), (c, d) = system_matrix(lens_system)[wavelength_index]
+    image_ior = lens_system.ior[wavelength_index, -1]
+    if stop_radius is None:
+        stop_radius = lens_system.semi_aperture[max(lens_system.aperture_index, 0)]
+
+    efl = -1.0 / c
+    rear_focal_point = lens_system.vertex[-1] - image_ior * a / c
+    front_focal_point = lens_system.vertex[0] + d / c
+
+    # the pupils are the images of the aperture through the front and the rear group
+    (stop_a, stop_b), (stop_c, stop_d) = stop_matrix(lens_system)[wavelength_index]
+    rear = np.array([[a, b], [c, d]]) @ np.array([[stop_d, -stop_b], [-stop_c, stop_a]])
+    entrance_pupil_position = lens_system.vertex[0] + stop_b / stop_a
+    entrance_pupil_radius = stop_radius / abs(stop_a)
+    exit_pupil_position = lens_system.vertex[-1] - image_ior * rear[0, 1] / rear[1, 1]
+    exit_pupil_radius = stop_radius / abs(rear[1, 1])
+
+    # paraxial chief ray heights on all surfaces per unit field angle tangent
+    chief_ray = np.array([-stop_b / stop_a, 1.0])
+    chief_heights = np.abs([(system_matrix(lens_system, i)[wavelength_index] @ chief_ray)[0] for i in range(lens_system.count)])
+    usable = chief_heights > 1e-12 * np.max(lens_system.semi_aperture)
+    field_tangent = np.min(lens_system.semi_aperture[usable] / chief_heights[usable]) if np.any(usable) else math.inf
+    return {
+        'efl': float(efl),
+        'bfl': float(rear_focal_point - lens_system.vertex[-1]),
+        'ffl': float(lens_system.vertex[0] - front_focal_point),
+        'front_focal_point': float(front_focal_point),
+        'rear_focal_point': float(rear_focal_point),
+        'front_principal_plane': float(front_focal_point + efl),
+        'rear_principal_plane': float(rear_focal_point - efl),
+        'entrance_pupil_position': float(entrance_pupil_position),
+        'entrance_pupil_radius': float(entrance_pupil_radius),
+        'exit_pupil_position': float(exit_pupil_position),
+        'exit_pupil_radius': float(exit_pupil_radius),
+        'f_number': float(abs(efl) / (2.0 * entrance_pupil_radius)),
+        'paraxial_fov': float(2.0 * math.degrees(math.atan(field_tangent)))
+    }
+
+# ------------------------------------------------------------------------
+#    Third-order aberrations
+# ------------------------------------------------------------------------
+
+# wavelengths in um of the d, F and C lines - the chromatic terms use the IOR difference between F and C
+seidel_wavelengths = (0.5876, 0.4861, 0.6563)
+
+# calculates the Seidel sums of a batch of lens systems from one paraxial marginal and one paraxial chief ray trace
+# all per surface arrays have shape (..., surfaces) for any leading batch shape, e.g. perturbed variants of a design:
+# curvature, thickness and ior (medium behind each surface), dispersion is the F - C IOR difference of the medium
+# behind each surface - first_vertex is the position of the first vertex relative to the aperture plane, the aperture
+# (aperture_index, -1 in front of the objective) has the given semi aperture - objects at the given distance in front
+# of the aperture plane (infinity supported) are seen under the given field angle
+# returns a dict of per surface contributions with shape (..., surfaces) and their sums over all surfaces: spherical
+# aberration (S1), coma (S2), astigmatism (S3), Petzval curvature (S4), distortion (S5), longitudinal (CL) and
+# transverse (CT) chromatic aberration as well as the Lagrange invariant - positive S1 means undercorrected spherical
+# aberration, the transverse ray aberrations at the paraxial image are S / (2 * n' * u') for the final marginal ray angle
+def seidel_coefficients_batch(curvature, thickness, ior, dispersion, first_vertex, aperture_index: int,
+                              semi_aperture, field_angle, distance=math.inf):
+    curvature = np.asarray(curvature, dtype=np.float64)
+    thickness = np.asarray(thickness, dtype=np.float64)
+    ior = np.asarray(ior, dtype=np.float64)
+    dispersion = np.asarray(dispersion, dtype=np.float64)
+    batch_shape = np.broadcast_shapes(curvature.shape, thickness.shape, ior.shape, dispersion.shape)[:-1]
+    surface_count = curvature.shape[-1]
+    ior_before = np.ones(batch_shape + (surface_count,))
+    ior_before[..., 1:] = ior[..., :-1]
+
+    # paraxial trace of the state (height, IOR * angle) from the first vertex - returns heights and angles before and
+    # after refraction per surface
+    def trace(y, nu):
+        heights, angles, refracted_angles = [], [], []
+        for i in range(surface_count):
+            heights.append(y)
+            angles.append(nu / ior_before[..., i])
+            nu = nu - y * curvature[..., i] * (ior[..., i] - ior_before[..., i])
+            refracted_angles.append(nu / ior[..., i])
+            y = y + thickness[..., i] * nu / ior[..., i]
+        return np.stack(heights, axis=-1), np.stack(angles, axis=-1), np.stack(refracted_angles, axis=-1)
+
+    # aperture plane reached by the unit rays (height 1, angle 0) and (height 0, angle 1)
+    first_vertex = np.broadcast_to(np.asarray(first_vertex, dtype=np.float64), batch_shape)
+    if aperture_index == -1:
+        a, b = np.ones(batch_shape), -first_vertex
+    else:
+        a = trace(np.ones(batch_shape), np.zeros(batch_shape))[0][..., aperture_index]
+        b = trace(np.zeros(batch_shape), np.ones(batch_shape))[0][..., aperture_index]
+
+    # marginal ray from the axial object point to the aperture rim, chief ray through the aperture center
+    if math.isinf(distance):
+        marginal_height, marginal_angle = semi_aperture / a, np.zeros(batch_shape)
+    else:
+        object_distance = first_vertex + distance
+        marginal_angle = semi_aperture / (a * object_distance + b)
+        marginal_height = marginal_angle * object_distance
+    chief_angle = np.full(batch_shape, math.tan(field_angle))
+    chief_height = -b * chief_angle / a
+
+    y, u, refracted_u = trace(marginal_height, marginal_angle)
+    chief_y, chief_u, _ = trace(chief_height, chief_angle)
+    lagrange_invariant = chief_angle * marginal_height - marginal_angle * chief_height
+
+    # refraction invariants and per surface contributions
+    refraction = ior_before * (u + y * curvature)
+    chief_refraction = ior_before * (chief_u + chief_y * curvature)
+    angle_change = refracted_u / ior - u / ior_before
+    s1 = -refraction * refraction * y * angle_change
+    s2 = -refraction * chief_refraction * y * angle_change
+    s3 = -chief_refraction * chief_refraction * y * angle_change
+    s4 = -lagrange_invariant[..., None] ** 2 * curvature * (1.0 / ior - 1.0 / ior_before)
+    # surfaces without marginal ray refraction (A = 0) do not contribute to the distortion in this form
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s5 = np.where(refraction != 0.0, chief_refraction / refraction * (s3 + s4), 0.0)
+    dispersion_before = np.zeros(batch_shape + (surface_count,))
+    dispersion_before[..., 1:] = dispersion[..., :-1]
+    dispersion_change = dispersion / ior - dispersion_before / ior_before
+    cl = refraction * y * dispersion_change
+    ct = chief_refraction * y * dispersion_change
+
+    coefficients = {'S1': s1, 'S2': s2, 'S3': s3, 'S4': s4, 'S5': s5, 'CL': cl, 'CT': ct}
+    result = {name + '_surfaces': values for name, values in coefficients.items()}
+    result.update({name: values.sum(axis=-1) for name, values in coefficients.items()})
+    result['lagrange_invariant'] = lagrange_invariant
+    return result
+
+# calculates the Seidel sums of the lens system (see seidel_coefficients_batch) for the current aperture - the
+# chromatic terms are evaluated from the IORs at the F and C lines, the monochromatic ones at the given wavelength row
+def seidel_coefficients(field_angle: float, distance=math.inf, lens_system=None, wavelength_index=0):
+    if lens_system is None:
+        lens_system = data.lens_system
+    line_iors = lens_system.with_wavelengths(seidel_wavelengths[1:]).ior
+    first_vertex = lens_system.vertex[0]
+    return seidel_coefficients_batch(lens_system.curvature, lens_system.thickness, lens_system.ior[wavelength_index],
+                                     line_iors[0] - line_iors[1], first_vertex, lens_system.aperture_index,
+                                     data.semi_aperture, field_angle, distance)
@@ -1,7 +1,18 @@
 import math
+import numpy as np
 
 from . import data
 
+# fraction of the aperture radius passed by the meridional (2D) tracer - a meridional ray stands for all azimuths of
+# the rotationally symmetric objective, the margin approximates the inradius of the polygonal aperture (e.g. 0.87 for
+# 6 blades), which only the 3D tracer clips exactly. Meridional rays between 0.9 and 1.0 of the aperture radius are
+# therefore vignetted by trace_rays but may pass trace_rays_3d
+meridional_aperture_margin = 0.9
+
+# returns the radius of the circular aperture used by the meridional tracers and the paraxial marginal ray
+def meridional_aperture_radius() -> float:
+    return meridional_aperture_margin * data.semi_aperture
+
 # dot product for 2d vectors
 def dot(v, w):
     return v[0]*w[0]+v[1]*w[1]
@@ -15,15 +26,15 @@ def angle(v, w):
         signed_angle = signed_angle + 2.0 * math.pi
     return signed_angle
 
-# calculates the intersection of a ray and a lens surface
-def calculate_new_position(ray, lens):
+# calculates the intersection of a ray and the lens surface with the given index
+def calculate_new_position(ray, lens_system, index):
     # get lens surface data
-    center = lens['position']
-    radius = lens['radius']
+    center = float(lens_system.center[index])
+    radius = float(lens_system.radius[index])
     flip = (radius < 0.0)
     if flip:
         radius = - radius
-    height = lens['semi_aperture']
+    height = float(lens_system.semi_aperture[index])
 
     # ray hitting a spherical surface
     if radius > 0.0:
@@ -55,13 +66,14 @@ def calculate_new_position(ray, lens):
         return [center, ray[1] + math.tan(ray[2]) * (center - ray[0]), ray[2]]
 
 # calculate new ray direction based on Snell's law
-def calculate_new_direction(ray, lens):
+def calculate_new_direction(ray, lens_system, index, wavelength_index=0):
     # get lens surface data
-    ior = lens['ior_ratio']
-    normal = [lens['position']-ray[0],-ray[1]]
-    if lens['radius'] < 0.0:
+    ior = float(lens_system.ior_ratio[wavelength_index, index])
+    radius = float(lens_system.radius[index])
+    normal = [float(lens_system.center[index])-ray[0],-ray[1]]
+    if radius < 0.0:
         normal = [-normal[0], -normal[1]]
-    if lens['radius'] == 0.0:
+    if radius == 0.0:
         normal = [1.0, 0.0]
 
     direction = [math.cos(ray[2]), math.sin(ray[2])]
@@ -84,12 +96,12 @@ def calculate_new_direction(ray, lens):
     return [ray[0], ray[1], new_angle + normal_angle]
 
 # trace ray through one surface - returns a ray with angle 180.0 if tracing fails
-def trace_step(ray, lens):
-    new_pos_ray = calculate_new_position(ray, lens)
+def trace_step(ray, lens_system, index, wavelength_index=0):
+    new_pos_ray = calculate_new_position(ray, lens_system, index)
     if new_pos_ray[2] == 180.0:
         return new_pos_ray
     else:
-        traced_ray = calculate_new_direction(new_pos_ray, lens)
+        traced_ray = calculate_new_direction(new_pos_ray, lens_system, index, wavelength_index)
         return traced_ray
 
 # check if ray passes through aperture
@@ -97,21 +109,22 @@ def check_aperture(ray):
     # calculate intersection of ray and aperture plane
     intersection = ray[1] - ray[0]*math.tan(ray[2])
     # rays close to the aperture are ignored to take into account the non-circle aperture shape 
-    return (math.fabs(intersection) < 0.9*data.semi_aperture) 
+    return (math.fabs(intersection) < meridional_aperture_radius())
 
-# trace a ray through all lens surfaces - returns -1.0 if tracing fails
-def trace_single_ray(ray):
-    #print("")
-    #print("New Ray!")
+# trace a ray through all surfaces of the lens system, which defaults to the currently loaded one - returns a ray
+# with angle 180.0 if tracing fails
+def trace_single_ray(ray, lens_system=None, wavelength_index=0):
+    if lens_system is None:
+        lens_system = data.lens_system
     new_ray = ray
 
-    if data.aperture_index == -1:
+    if lens_system.aperture_index == -1:
         if not check_aperture(ray):
             return [0,0,180.0]
 
-    for i in range(0, len(data.objective)):
-        if i != data.aperture_index:
-            new_ray = trace_step(ray, data.objective[i])
+    for i in range(0, lens_system.count):
+        if i != lens_system.aperture_index:
+            new_ray = trace_step(ray, lens_system, i, wavelength_index)
             ray = new_ray
             if ray[2] == 180.0:
                 break
@@ -145,35 +158,292 @@ def calculate_sensor_pos(rays):
 def sensor_position_for_distance(distance):
 
     # check if objective loaded
-    if len(data.objective) == 0:
+    if data.lens_system is None:
         print("No objective has been loaded.")
         return -1
 
-    # set ray starting position
-    position = [-distance, 0.0]
-
     # calculate maximum ray angle with respect to the x-axis
-    max_direction = [data.objective[0]['position'] - data.objective[0]['radius'] + distance, data.objective[0]['semi_aperture']]
+    max_direction = [data.lens_system.vertex[0] + distance, data.lens_system.semi_aperture[0]]
     max_angle = angle([1,0], max_direction)
 
+    # trace a fan of rays covering the same angles the former bisection could reach and keep the largest angle
+    # below which all rays pass the objective
+    fan_angles = max_angle * np.arange(1, 257) / 256.0
+    _, _, fan_valid = trace_rays(np.column_stack((np.full(256, -distance), np.zeros(256), fan_angles)))
+    failed = np.flatnonzero(~fan_valid)
+    if len(failed) == 0:
+        best_angle = max_angle
+    elif failed[0] == 0:
+        return -1
+    else:
+        best_angle = fan_angles[failed[0] - 1]
+
     # trace rays starting from desired distance
-    collected_rays = []
-    current_angle = max_angle
-    best_angle = 0
-    for i in range(1, 10):
-        traced_ray = trace_single_ray([position[0], position[1], current_angle])
-        if traced_ray[2] != 180.0:
-            best_angle = current_angle
-            current_angle = current_angle + (1.0/math.pow(2.0, i))*max_angle
-            if current_angle > max_angle:
-                break
+    angles = best_angle * np.arange(1, 41) / 40.0
+    positions, directions, valid = trace_rays(np.column_stack((np.full(40, -distance), np.zeros(40), angles)))
+
+    return calculate_sensor_pos_batch(positions, directions, valid)
+
+
+# ------------------------------------------------------------------------
+#    Batch ray tracing
+# ------------------------------------------------------------------------
+
+# wraps angles to the interval [-pi, pi] in the same way as angle()
+def wrap_angles(angles):
+    angles = np.where(angles > math.pi, angles - 2.0 * math.pi, angles)
+    return np.where(angles < -math.pi, angles + 2.0 * math.pi, angles)
+
+# trace a batch of rays given by x, y and angle arrays through one surface of the lens system - invalid rays are
+# marked in the valid mask
+def trace_step_batch(x, y, ray_angles, valid, lens_system, index, wavelength_index=0):
+    # get lens surface data
+    center = lens_system.center[index]
+    radius = lens_system.radius[index]
+    height = lens_system.semi_aperture[index]
+    cos_angles = np.cos(ray_angles)
+    sin_angles = np.sin(ray_angles)
+
+    # rays hitting a spherical surface
+    if radius != 0.0:
+        # calculate intersection of surface and rays
+        p_c_x = x - center
+        pc = p_c_x * p_c_x + y * y
+        pcv = p_c_x * cos_angles + y * sin_angles
+        squared = radius * radius - pc + pcv * pcv
+        root = np.sqrt(np.maximum(squared, 0.0))
+        if radius < 0.0:
+            lambd = - pcv + root
         else:
-            current_angle = current_angle - (1.0/math.pow(2.0, i))*max_angle
+            lambd = - pcv - root
+        x = x + lambd * cos_angles
+        y = y + lambd * sin_angles
+        valid = valid & (squared >= 0.0) & (lambd >= 0.0) & (np.abs(y) <= height)
 
-    for i in range(1, 41):
-        resulting_ray = trace_single_ray([position[0], position[1], float(i)/40.0 * best_angle])
-        
-        if resulting_ray[2] != 180.0:
-            collected_rays.append(resulting_ray)
+        normal_x = center - x
+        normal_y = -y
+        if radius < 0.0:
+            normal_x = -normal_x
+            normal_y = -normal_y
+        normal_angles = np.arctan2(normal_y, normal_x)
+    # rays hitting a flat surface
+    else:
+        y = y + np.tan(ray_angles) * (center - x)
+        x = np.full_like(x, center)
+        normal_angles = np.zeros_like(x)
+
+    # apply Snell's law
+    incident_angles = wrap_angles(np.arctan2(sin_angles, cos_angles) - normal_angles)
+    sin_of_angles = lens_system.ior_ratio[wavelength_index, index] * np.sin(np.abs(incident_angles))
+    # reflection instead of transmission
+    valid = valid & (np.abs(sin_of_angles) <= 1.0)
+    new_angles = np.copysign(np.arcsin(np.clip(sin_of_angles, -1.0, 1.0)), incident_angles)
+
+    return x, y, new_angles + normal_angles, valid
+
+# check which rays of a batch pass through the aperture
+def check_aperture_batch(x, y, ray_angles):
+    # calculate intersection of rays and aperture plane
+    intersections = y - x * np.tan(ray_angles)
+    # rays close to the aperture are ignored to take into account the non-circle aperture shape
+    return np.abs(intersections) < meridional_aperture_radius()
+
+# trace a batch of rays given as (N, 3) array of [x, y, angle] rows through all surfaces of the lens system, which
+# defaults to the currently loaded one - the wavelength index selects the IOR row for all rays or, given as (N,) array,
+# for each ray - returns (N, 2) positions, (N, 2) unit directions and the (N,) mask of successfully traced rays
+def trace_rays(rays, lens_system=None, wavelength_index=0):
+    if lens_system is None:
+        lens_system = data.lens_system
+    rays = np.asarray(rays, dtype=np.float64).reshape(-1, 3)
+    x = rays[:, 0].copy()
+    y = rays[:, 1].copy()
+    ray_angles = rays[:, 2].copy()
+    valid = np.ones(len(rays), dtype=bool)
+
+    if lens_system.aperture_index == -1:
+        valid = check_aperture_batch(x, y, ray_angles)
+
+    for i in range(0, lens_system.count):
+        if i != lens_system.aperture_index:
+            x, y, ray_angles, valid = trace_step_batch(x, y, ray_angles, valid, lens_system, i, wavelength_index)
+        else: # check which rays pass through aperture
+            valid = valid & check_aperture_batch(x, y, ray_angles)
+
+    positions = np.column_stack((x, y))
+    directions = np.column_stack((np.cos(ray_angles), np.sin(ray_angles)))
+    positions[~valid] = np.nan
+    directions[~valid] = np.nan
+    return positions, directions, valid
+
+# trace a batch of rays for all wavelengths of the lens system in one vectorized pass - returns (W, N, 2) positions,
+# (W, N, 2) unit directions and the (W, N) mask of successfully traced rays for W wavelength rows
+def trace_rays_polychromatic(rays, lens_system=None):
+    if lens_system is None:
+        lens_system = data.lens_system
+    rays = np.asarray(rays, dtype=np.float64).reshape(-1, 3)
+    wavelength_count = len(lens_system.ior)
+    wavelength_indices = np.repeat(np.arange(wavelength_count), len(rays))
+    positions, directions, valid = trace_rays(np.tile(rays, (wavelength_count, 1)), lens_system, wavelength_indices)
+    return positions.reshape(wavelength_count, -1, 2), directions.reshape(wavelength_count, -1, 2), valid.reshape(wavelength_count, -1)
+
+# calculate the optimal sensor position as mean axis crossing of the valid traced rays - returns -1 if no ray crosses the axis
+def calculate_sensor_pos_batch(positions, directions, valid):
+    crossing = valid & (directions[:, 1] != 0.0)
+    if not np.any(crossing):
+        return -1
+    zeroes = positions[crossing, 0] - positions[crossing, 1] * directions[crossing, 0] / directions[crossing, 1]
+    return float(np.mean(zeroes))
+
+
+# ------------------------------------------------------------------------
+#    3D skew ray tracing
+# ------------------------------------------------------------------------
+
+# number of rays traced at once by the 3D tracer - small chunks keep the temporary arrays in cache
+chunk_size_3d = 1 << 16
+
+# checks which points (y, z) of the aperture plane lie inside the regular n-blade aperture polygon with the given
+# circumradius - the first polygon vertex points in z direction and the polygon is rotated by angle (in degree)
+def inside_aperture_polygon(y, z, circumradius, blades, angle_deg):
+    sector = 2.0 * math.pi / blades
+    # angle between point and the normal of the closest polygon edge
+    first_edge_normal = 0.5 * math.pi + angle_deg / 180.0 * math.pi + 0.5 * sector
+    relative_angles = np.mod(np.arctan2(z, y) - first_edge_normal + 0.5 * sector, sector) - 0.5 * sector
+    return np.hypot(y, z) * np.cos(relative_angles) <= circumradius * math.cos(0.5 * sector)
+
+# calculates the ray parameters for reaching the plane x = position - rays parallel to the plane get NaN
+def distance_to_plane_3d(x, dx, position):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (position - x) / dx
+
+# trace a batch of 3D rays given by component arrays through one surface of the lens system using the vector form
+# of Snell's law
+def trace_step_3d(x, y, z, dx, dy, dz, valid, lens_system, index, wavelength_index=0):
+    # get lens surface data
+    center = lens_system.center[index]
+    radius = lens_system.radius[index]
+
+    # rays hitting a spherical surface
+    if radius != 0.0:
+        # calculate intersection of surface and rays
+        p_c_x = x - center
+        pcv = p_c_x * dx + y * dy + z * dz
+        squared = radius * radius - (p_c_x * p_c_x + y * y + z * z) + pcv * pcv
+        valid &= squared >= 0.0
+        root = np.sqrt(np.maximum(squared, 0.0, out=squared), out=squared)
+        if radius < 0.0:
+            lambd = root - pcv
+        else:
+            lambd = - pcv - root
+        valid &= lambd >= 0.0
+    # rays hitting a flat surface
+    else:
+        lambd = distance_to_plane_3d(x, dx, center)
+        valid &= np.isfinite(lambd)
+    x = x + lambd * dx
+    y = y + lambd * dy
+    z = z + lambd * dz
+
+    # rays hitting the surface outside of its semi aperture are blocked by the housing
+    valid &= y * y + z * z <= lens_system.semi_aperture_squared[index]
+
+    # surface normals point in the direction of the optical axis
+    if radius != 0.0:
+        scale = 1.0 / radius
+        normal_x = (center - x) * scale
+        normal_y = y * -scale
+        normal_z = z * -scale
+        cos_incident = normal_x * dx + normal_y * dy + normal_z * dz
+    else:
+        normal_x = 1.0
+        normal_y = 0.0
+        normal_z = 0.0
+        cos_incident = dx.copy()
+    # rays arriving from behind the surface see the flipped normal
+    flip = np.where(cos_incident < 0.0, -1.0, 1.0)
+    cos_incident *= flip
+
+    # apply Snell's law
+    ior = lens_system.ior_ratio[wavelength_index, index]
+    cos_squared = 1.0 - ior * ior * (1.0 - cos_incident * cos_incident)
+    # reflection instead of transmission
+    valid &= cos_squared >= 0.0
+    cos_transmitted = np.sqrt(np.maximum(cos_squared, 0.0))
+    normal_scale = (cos_transmitted - ior * cos_incident) * flip
+    dx = ior * dx + normal_scale * normal_x
+    dy = ior * dy + normal_scale * normal_y
+    dz = ior * dz + normal_scale * normal_z
+
+    return x, y, z, dx, dy, dz, valid
+
+# check which rays pass through the polygonal aperture located at x = 0
+def check_aperture_3d(x, y, z, dx, dy, dz, blades, angle_deg):
+    lambd = distance_to_plane_3d(x, dx, 0.0)
+    with np.errstate(invalid='ignore'):
+        return np.isfinite(lambd) & inside_aperture_polygon(y + lambd * dy, z + lambd * dz, data.semi_aperture, blades, angle_deg)
+
+# trace a batch of 3D rays through all surfaces of the lens system, starting at the (N, 3) positions with (N, 3)
+# directions - the wavelength index is used as in trace_rays - returns positions and unit directions after the last surface and the (N,) mask of successfully traced rays
+def trace_rays_3d(positions, directions, lens_system=None, wavelength_index=0, blades=None, angle_deg=None):
+    if lens_system is None:
+        lens_system = data.lens_system
+    if blades is None:
+        blades = data.aperture_blades
+    if angle_deg is None:
+        angle_deg = data.aperture_angle
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+
+    out_positions = np.empty_like(positions)
+    out_directions = np.empty_like(directions)
+    out_valid = np.empty(len(positions), dtype=bool)
+
+    # trace in chunks to keep the temporary arrays small
+    for start in range(0, len(positions), chunk_size_3d):
+        chunk = slice(start, start + chunk_size_3d)
+        x, y, z = positions[chunk].T
+        dx, dy, dz = (directions[chunk] / np.linalg.norm(directions[chunk], axis=1)[:, None]).T
+        chunk_wavelength_index = wavelength_index if np.ndim(wavelength_index) == 0 else wavelength_index[chunk]
+
+        if lens_system.aperture_index == -1:
+            valid = check_aperture_3d(x, y, z, dx, dy, dz, blades, angle_deg)
+        else:
+            valid = np.ones(len(x), dtype=bool)
+
+        for i in range(0, lens_system.count):
+            if i != lens_system.aperture_index:
+                x, y, z, dx, dy, dz, valid = trace_step_3d(x, y, z, dx, dy, dz, valid, lens_system, i, chunk_wavelength_index)
+            else: # check which rays pass through aperture
+                valid &= check_aperture_3d(x, y, z, dx, dy, dz, blades, angle_deg)
+
+        out_positions[chunk] = np.column_stack((x, y, z))
+        out_directions[chunk] = np.column_stack((dx, dy, dz))
+        out_valid[chunk] = valid
+
+    out_positions[~out_valid] = np.nan
+    out_directions[~out_valid] = np.nan
+    return out_positions, out_directions, out_valid
+
+# trace a batch of 3D rays through the surfaces in front of the aperture and returns where they cross the aperture
+# plane x = 0 as (N, 2) y/z coordinates and the (N,) mask of rays reaching it - the aperture itself does not clip
+def trace_to_stop_3d(positions, directions, lens_system=None, wavelength_index=0):
+    if lens_system is None:
+        lens_system = data.lens_system
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    x, y, z = positions.T
+    dx, dy, dz = (directions / np.linalg.norm(directions, axis=1)[:, None]).T
+    valid = np.ones(len(x), dtype=bool)
+    for i in range(0, max(lens_system.aperture_index, 0)):
+        x, y, z, dx, dy, dz, valid = trace_step_3d(x, y, z, dx, dy, dz, valid, lens_system, i, wavelength_index)
+    lambd = distance_to_plane_3d(x, dx, 0.0)
+    valid &= np.isfinite(lambd)
+    with np.errstate(invalid='ignore'):
+        points = np.column_stack((y + lambd * dy, z + lambd * dz))
+    points[~valid] = np.nan
+    return points, valid
 
-    return calculate_sensor_pos(collected_rays)
\ No newline at end of file
+# calculates where traced 3D rays hit the sensor plane x = sensor_position - returns (N, 2) y/z coordinates
+def sensor_intersections_3d(positions, directions, sensor_position):
+    lambd = distance_to_plane_3d(positions[:, 0], directions[:, 0], sensor_position)
+    return positions[:, 1:] + lambd[:, None] * directions[:, 1:]
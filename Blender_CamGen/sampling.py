@@ -0,0 +1,223 @@
+# ------------------------------------------------------------------------
+#    Pupil sampling strategies and convergence based adaptive sampling
+# ------------------------------------------------------------------------
+
+import numpy as np
+
+# All strategies return points on the unit disk (normalized pupil coordinates) representing equal pupil areas. The
+# progressive strategies extend a sample set deterministically: the points for offset o and count n are the points
+# o to o + n of one infinite sequence. The layouts are regenerated for every count, but can be generated in parts.
+progressive_strategies = ('random', 'halton', 'sobol')
+layout_strategies = ('grid', 'stratified', 'hexapolar', 'ring')
+
+# ------------------------------------------------------------------------
+#    Helper functions
+# ------------------------------------------------------------------------
+
+# maps points of the unit square to the unit disk preserving area and stratification (Shirley's concentric mapping)
+def square_to_disk(u, v):
+    a = 2.0 * u - 1.0
+    b = 2.0 * v - 1.0
+    first = np.abs(a) > np.abs(b)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        radius = np.where(first, a, b)
+        angle = np.where(first, 0.25 * np.pi * b / a, 0.5 * np.pi - 0.25 * np.pi * a / b)
+    angle = np.where(radius == 0.0, 0.0, angle)
+    return np.column_stack((radius * np.cos(angle), radius * np.sin(angle)))
+
+# calculates the radical inverse of the given integers in the given base, i.e. the van der Corput sequence
+def radical_inverse(indices, base: int):
+    indices = np.array(indices, dtype=np.int64)
+    result = np.zeros(len(indices))
+    factor = 1.0 / base
+    while np.any(indices > 0):
+        result += (indices % base) * factor
+        indices //= base
+        factor /= base
+    return result
+
+# direction numbers of the first two Sobol dimensions (32 bit) - the second dimension uses the primitive polynomial
+# x + 1 with initial direction number 1, i.e. m_i = 2 * m_(i-1) xor m_(i-1)
+def sobol_direction_numbers():
+    first = np.array([1 << (31 - i) for i in range(32)], dtype=np.uint64)
+    m = 1
+    second = []
+    for i in range(32):
+        second.append(m << (31 - i))
+        m = (2 * m) ^ m
+    return first, np.array(second, dtype=np.uint64) & np.uint64(0xFFFFFFFF)
+
+sobol_directions = sobol_direction_numbers()
+
+# number of random points drawn from one generator - random samples are reproducible per block of the sequence
+random_block_size = 1 << 16
+
+
+# ------------------------------------------------------------------------
+#    Sampling strategies
+# ------------------------------------------------------------------------
+
+# uniformly distributed random points - every block of the sequence has its own generator seeded by seed and block id
+def random_points(count: int, seed: int = 0, offset: int = 0):
+    blocks = []
+    for block in range(offset // random_block_size, (offset + count - 1) // random_block_size + 1 if count > 0 else 0):
+        rng = np.random.default_rng([seed, block])
+        radii = np.sqrt(rng.random(random_block_size))
+        angles = 2.0 * np.pi * rng.random(random_block_size)
+        blocks.append(np.column_stack((radii * np.cos(angles), radii * np.sin(angles))))
+    if not blocks:
+        return np.zeros((0, 2))
+    start = offset % random_block_size
+    return np.concatenate(blocks)[start:start + count]
+
+# Halton sequence in bases 2 and 3 - the seed applies a random toroidal shift (Cranley-Patterson rotation)
+def halton_points(count: int, seed: int = 0, offset: int = 0):
+    indices = np.arange(offset + 1, offset + count + 1)
+    shift = np.random.default_rng(seed).random(2) if seed else np.zeros(2)
+    u = (radical_inverse(indices, 2) + shift[0]) % 1.0
+    v = (radical_inverse(indices, 3) + shift[1]) % 1.0
+    return square_to_disk(u, v)
+
+# two dimensional Sobol sequence - the seed applies a random digital shift which keeps the stratification
+def sobol_points(count: int, seed: int = 0, offset: int = 0):
+    indices = np.arange(offset + 1, offset + count + 1, dtype=np.uint64)
+    shift = np.random.default_rng(seed).integers(0, 1 << 32, 2, dtype=np.uint64) if seed else np.zeros(2, dtype=np.uint64)
+    u = np.full(count, shift[0], dtype=np.uint64)
+    v = np.full(count, shift[1], dtype=np.uint64)
+    for bit in range(32):
+        mask = ((indices >> np.uint64(bit)) & np.uint64(1)).astype(bool)
+        u[mask] ^= sobol_directions[0][bit]
+        v[mask] ^= sobol_directions[1][bit]
+    return square_to_disk(u / 2.0 ** 32, v / 2.0 ** 32)
+
+# number of square grid points along one axis and row ranges of the grid points inside the disk - returns the side
+# length, the first column and the point count of every row
+def grid_rows(layout_count: int):
+    side = max(int(np.ceil(np.sqrt(layout_count * 4.0 / np.pi))), 1)
+    coordinates = (np.arange(side) + 0.5) / side * 2.0 - 1.0
+    half_widths = np.sqrt(np.maximum(1.0 - coordinates * coordinates, 0.0))
+    first = np.searchsorted(coordinates, -half_widths, side='left')
+    counts = np.searchsorted(coordinates, half_widths, side='right') - first
+    return side, first, counts
+
+# centers of a square grid clipped to the disk - returns about layout_count points
+def grid_points(count: int, seed: int = 0, offset: int = 0, layout_count: int = None):
+    side, first, counts = grid_rows(layout_count)
+    row_starts = np.cumsum(counts) - counts
+    indices = np.arange(offset, min(offset + count, int(np.sum(counts))))
+    rows = np.searchsorted(row_starts, indices, side='right') - 1
+    columns = first[rows] + indices - row_starts[rows]
+    return np.column_stack(((rows + 0.5) / side * 2.0 - 1.0, (columns + 0.5) / side * 2.0 - 1.0))
+
+# one random point in each cell of a square grid of strata mapped to the disk - returns about layout_count points,
+# every block of cells has its own generator seeded by seed and block id
+def stratified_points(count: int, seed: int = 0, offset: int = 0, layout_count: int = None):
+    side = max(int(round(np.sqrt(layout_count))), 1)
+    cells = np.arange(offset, min(offset + count, side * side))
+    if len(cells) == 0:
+        return np.zeros((0, 2))
+    jitter = []
+    for block in range(cells[0] // random_block_size, cells[-1] // random_block_size + 1):
+        jitter.append(np.random.default_rng([seed, block]).random((random_block_size, 2)))
+    jitter = np.concatenate(jitter)[cells - (cells[0] // random_block_size) * random_block_size]
+    u = (cells // side + jitter[:, 0]) / side
+    v = (cells % side + jitter[:, 1]) / side
+    return square_to_disk(u, v)
+
+# number of rings of the hexapolar layout with at least layout_count points
+def hexapolar_rings(layout_count: int) -> int:
+    rings = 0
+    while 1 + 3 * rings * (rings + 1) < layout_count:
+        rings += 1
+    return rings
+
+# center point and rings at equidistant radii with 6 points per ring index, i.e. approximately equal areas per point
+# returns at least layout_count points
+def hexapolar_points(count: int, seed: int = 0, offset: int = 0, layout_count: int = None):
+    rings = hexapolar_rings(layout_count)
+    indices = np.arange(offset, min(offset + count, 1 + 3 * rings * (rings + 1)))
+    # ring r > 0 starts at point 1 + 3 r (r - 1) and has 6 r points
+    ring_ids = np.searchsorted(1 + 3 * np.arange(1, rings + 2) * np.arange(rings + 1), indices, side='right')
+    ring_counts = np.maximum(6 * ring_ids, 1)
+    angles = 2.0 * np.pi * (indices - 1 - 3 * ring_ids * (ring_ids - 1)) / ring_counts
+    radii = ring_ids / max(rings, 1)
+    return np.column_stack((radii * np.cos(angles), radii * np.sin(angles)))
+
+# number of rings and points per ring of the ring layout
+def ring_layout(layout_count: int):
+    rings = max(int(round(np.sqrt(layout_count / (2.0 * np.pi)))), 1)
+    return rings, max(int(np.ceil(layout_count / rings)), 1)
+
+# equal area rings with the same number of evenly spaced points per ring, staggered between neighboring rings
+def ring_points(count: int, seed: int = 0, offset: int = 0, layout_count: int = None):
+    rings, per_ring = ring_layout(layout_count)
+    indices = np.arange(offset, min(offset + count, rings * per_ring))
+    ring_ids = indices // per_ring
+    radii = np.sqrt((ring_ids + 0.5) / rings)
+    angles = 2.0 * np.pi * (indices % per_ring + 0.5 * (ring_ids % 2)) / per_ring
+    return np.column_stack((radii * np.cos(angles), radii * np.sin(angles)))
+
+# number of points of the layout strategies generated for the requested count
+layout_sizes = {
+    'grid': lambda layout_count: int(np.sum(grid_rows(layout_count)[2])),
+    'stratified': lambda layout_count: max(int(round(np.sqrt(layout_count))), 1) ** 2,
+    'hexapolar': lambda layout_count: 1 + 3 * hexapolar_rings(layout_count) * (hexapolar_rings(layout_count) + 1),
+    'ring': lambda layout_count: ring_layout(layout_count)[0] * ring_layout(layout_count)[1]
+}
+
+strategies = {
+    'random': random_points,
+    'halton': halton_points,
+    'sobol': sobol_points,
+    'grid': grid_points,
+    'stratified': stratified_points,
+    'hexapolar': hexapolar_points,
+    'ring': ring_points
+}
+
+# returns normalized pupil points of the given strategy - the same arguments always give the same points. Layouts are
+# generated for layout_count points (by default count) and may have slightly more or fewer points, see layout_size -
+# points offset to offset + count of the layout are returned, i.e. large layouts can be generated chunk by chunk
+def pupil_points(strategy: str, count: int, seed: int = 0, offset: int = 0, layout_count: int = None):
+    if strategy not in strategies:
+        raise ValueError("Unknown pupil sampling strategy '" + strategy + "'.")
+    if strategy in progressive_strategies:
+        return strategies[strategy](count, seed, offset)
+    if layout_count is None:
+        layout_count, count, offset = count, layout_size(strategy, count), 0
+    return strategies[strategy](count, seed, offset, layout_count)
+
+# returns the number of points of the given strategy for the requested count - exact for progressive strategies
+def layout_size(strategy: str, count: int) -> int:
+    if strategy not in strategies:
+        raise ValueError("Unknown pupil sampling strategy '" + strategy + "'.")
+    if strategy in progressive_strategies:
+        return count
+    return layout_sizes[strategy](count)
+
+
+# ------------------------------------------------------------------------
+#    Adaptive sampling
+# ------------------------------------------------------------------------
+
+# evaluates estimator(points) on growing pupil sample sets until the estimate changes by at most the relative tolerance
+# in two consecutive steps - progressive strategies extend the previous set, layouts are regenerated with twice the
+# points - returns the final estimate and the number of sampled pupil points
+def adaptive_estimate(estimator, strategy: str = 'sobol', tolerance: float = 1e-3, initial_count: int = 256,
+                      max_count: int = 1 << 20, seed: int = 0):
+    points = pupil_points(strategy, initial_count, seed)
+    estimate = estimator(points)
+    count = initial_count
+    stable_steps = 0
+    while count < max_count and stable_steps < 2:
+        count = min(2 * count, max_count)
+        if strategy in progressive_strategies:
+            points = np.concatenate((points, pupil_points(strategy, count - len(points), seed, len(points))))
+        else:
+            points = pupil_points(strategy, count, seed)
+        previous, estimate = estimate, estimator(points)
+        if abs(estimate - previous) <= tolerance * abs(estimate):
+            stable_steps += 1
+        else:
+            stable_steps = 0
+    return estimate, len(points)
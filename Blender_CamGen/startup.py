@@ -0,0 +1,64 @@
+# ------------------------------------------------------------------------
+#    Addon startup - lazily imported modules and registration timing report
+# ------------------------------------------------------------------------
+
+import importlib.util
+import sys
+import time
+import types
+
+from contextlib import contextmanager
+
+# registration steps and their durations in ms, in the order they were timed
+timings = []
+
+# ------------------------------------------------------------------------
+#    Lazy imports
+# ------------------------------------------------------------------------
+
+# returns the addon module with the given name - modules not imported yet are only executed on first attribute access,
+# i.e. their own imports (NumPy, ...) are deferred until the module is actually used
+def lazy_import(name: str):
+    full_name = __package__ + '.' + name
+    if full_name in sys.modules:
+        return sys.modules[full_name]
+    spec = importlib.util.find_spec(full_name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[full_name] = module
+    loader.exec_module(module)
+    setattr(sys.modules[__package__], name, module)
+    return module
+
+# returns the addon module with the given name if it was executed already, None if it was not imported or is a lazily
+# imported module that was not used yet - a lazy module becomes a plain module on first attribute access
+def loaded_module(name: str):
+    module = sys.modules.get(__package__ + '.' + name)
+    return module if type(module) is types.ModuleType else None
+
+
+# ------------------------------------------------------------------------
+#    Timing report
+# ------------------------------------------------------------------------
+
+# context manager adding the duration of the enclosed step to the timing report
+@contextmanager
+def timed(step: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(step, start)
+
+# adds a step measured from the given perf_counter start time to the timing report
+def record(step: str, start: float):
+    timings.append((step, 1000.0 * (time.perf_counter() - start)))
+
+# returns the timing report as text - one line per step and the total
+def report() -> str:
+    lines = ["Camera Generator startup:"]
+    for step, duration in timings:
+        lines.append("  %-28s %8.2f ms" % (step, duration))
+    lines.append("  %-28s %8.2f ms" % ("total", sum(duration for _, duration in timings)))
+    return "\n".join(lines)
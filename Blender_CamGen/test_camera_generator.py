@@ -1,9 +1,32 @@
 import unittest
 import sys
 import bpy
+import math
+import numpy as np
+import shutil
+import tempfile
 
+from os import mkdir, stat, utime
+from os.path import isfile, join
+
+from . import aiming
+from . import analysis
+from . import calc
+from . import catalog
 from . import camera_generator
+from . import create
 from . import data
+from . import distortion
+from . import focus
+from . import glass
+from . import illumination
+from . import io
+from . import parallel
+from . import paraxial
+from . import raytracer
+from . import sampling
+from . import startup
+from . lens_system import LensSystem
 
 class TestCameraGenerator(unittest.TestCase):
     def test_str_to_float(self):
@@ -44,13 +67,752 @@ class TestCameraGenerator(unittest.TestCase):
             ReferenceError, camera_generator.delete_recursive, object1)
 
 
+# test case base class using the D-Gauss objective as currently loaded objective
+class ObjectiveTestCase(unittest.TestCase):
+    def setUp(self):
+        # keep the currently loaded objective and load the test objective instead
+        self.loaded = (data.objective, data.lens_system, data.glass_data_known, data.aperture_index, data.semi_aperture)
+        objective, data.glass_data_known = io.read_lens_file(join(data.lens_directory, 'D-Gauss F1.4 45deg_Mandler USP2975673 p351.csv'))
+        data.lens_system = LensSystem(objective)
+        data.objective, data.aperture_index = data.lens_system.as_objective(), data.lens_system.aperture_index
+        data.semi_aperture = data.objective[data.aperture_index]['semi_aperture']
+
+    def tearDown(self):
+        data.objective, data.lens_system, data.glass_data_known, data.aperture_index, data.semi_aperture = self.loaded
+
+
+class TestRaytracer(ObjectiveTestCase):
+    def test_trace_rays_matches_single_ray(self):
+        rng = np.random.default_rng(0)
+        rays = np.column_stack((np.full(200, -0.5), rng.uniform(-0.03, 0.03, 200), rng.uniform(-0.2, 0.2, 200)))
+        positions, directions, valid = raytracer.trace_rays(rays)
+        for ray, position, direction, is_valid in zip(rays, positions, directions, valid):
+            traced_ray = raytracer.trace_single_ray(list(ray))
+            self.assertEqual(traced_ray[2] != 180.0, is_valid)
+            if is_valid:
+                self.assertAlmostEqual(traced_ray[0], position[0])
+                self.assertAlmostEqual(traced_ray[1], position[1])
+                self.assertAlmostEqual(np.cos(traced_ray[2]), direction[0])
+
+    def test_trace_rays_3d_matches_meridional_tracer(self):
+        # on-axis and off-axis fans within the meridional aperture margin, i.e. passing both aperture tests
+        marginal_angle = paraxial.marginal_angle(10.0)
+        fan = np.linspace(-0.8, 0.8, 41) * marginal_angle
+        rays = np.concatenate((np.column_stack((np.full(41, -10.0), np.zeros(41), fan)),
+                               np.column_stack((np.full(41, -10.0), np.full(41, paraxial.chief_ray_height(0.1, 10.0)), 0.1 + 0.5 * fan))))
+        positions, directions, valid = raytracer.trace_rays(rays)
+        positions_3d, directions_3d, valid_3d = raytracer.trace_rays_3d(np.column_stack((rays[:, :2], np.zeros(len(rays)))),
+                                                                        np.column_stack((np.cos(rays[:, 2]), np.sin(rays[:, 2]), np.zeros(len(rays)))))
+        self.assertTrue(np.all(valid))
+        np.testing.assert_array_equal(valid, valid_3d)
+        directions_3d /= np.linalg.norm(directions_3d, axis=1)[:, None]
+        np.testing.assert_allclose(positions_3d[:, :2], positions, rtol=0.0, atol=1e-12)
+        np.testing.assert_allclose(directions_3d[:, :2], directions, rtol=0.0, atol=1e-10)
+        np.testing.assert_array_equal(positions_3d[:, 2], 0.0)
+
+    def test_trace_rays_polychromatic_matches_single_wavelength(self):
+        lens_system = data.lens_system.with_wavelengths([0.45, 0.55, 0.65])
+        rays = np.column_stack((np.full(50, -1.0), np.linspace(-0.01, 0.01, 50), np.linspace(-0.02, 0.02, 50)))
+        positions, directions, valid = raytracer.trace_rays_polychromatic(rays, lens_system)
+        for wavelength_index in range(3):
+            single_positions, single_directions, single_valid = raytracer.trace_rays(rays, lens_system, wavelength_index)
+            np.testing.assert_array_equal(valid[wavelength_index], single_valid)
+            np.testing.assert_allclose(positions[wavelength_index], single_positions)
+            np.testing.assert_allclose(directions[wavelength_index], single_directions)
+        # the polychromatic best focus lies between the foci of the single wavelengths
+        chromatic = analysis.chromatic_focus(10.0, [0.45, 0.55, 0.65], [1.0, 1.0, 1.0])
+        self.assertTrue(np.min(chromatic['focus']) <= chromatic['best_focus'] <= np.max(chromatic['focus']))
+
+    def test_trace_rays_3d_parallel_matches_serial(self):
+        rng = np.random.default_rng(0)
+        positions = np.column_stack((np.full(5000, -1.0), np.zeros((5000, 2))))
+        directions = np.column_stack((np.ones(5000), rng.uniform(-0.04, 0.04, (5000, 2))))
+        shard_size = parallel.shard_size
+        try:
+            # small shards to spread the rays over both processes
+            parallel.shard_size = 1000
+            parallel_result = parallel.trace_rays_3d_parallel(positions, directions, processes=2)
+        finally:
+            parallel.shard_size = shard_size
+        serial_result = raytracer.trace_rays_3d(positions, directions)
+        self.assertTrue(np.any(serial_result[2]))
+        for parallel_values, serial_values in zip(parallel_result, serial_result):
+            np.testing.assert_array_equal(parallel_values, serial_values)
+
+    def test_trace_rays_3d_parallel_is_opt_in(self):
+        positions = np.column_stack((np.full(2000, -1.0), np.zeros((2000, 2))))
+        directions = np.column_stack((np.ones(2000), np.linspace(-0.04, 0.04, 4000).reshape(2000, 2)))
+        shard_size, pool_context = parallel.shard_size, parallel.pool_context
+        try:
+            # without an explicit process count no worker pool may be created
+            parallel.shard_size = 100
+            parallel.pool_context = None
+            result = parallel.trace_rays_3d_parallel(positions, directions)
+        finally:
+            parallel.shard_size, parallel.pool_context = shard_size, pool_context
+        for values, serial_values in zip(result, raytracer.trace_rays_3d(positions, directions)):
+            np.testing.assert_array_equal(values, serial_values)
+
+    def test_inside_aperture_polygon(self):
+        # square aperture with vertices on the y and z axes
+        y = np.array([0.0, 0.99, 0.45, 0.6])
+        z = np.array([0.99, 0.0, 0.45, 0.6])
+        np.testing.assert_array_equal(raytracer.inside_aperture_polygon(y, z, 1.0, 4, 0.0), [True, True, True, False])
+        # rotated by 45 degree the square edges are parallel to the axes
+        np.testing.assert_array_equal(raytracer.inside_aperture_polygon(y, z, 1.0, 4, 45.0), [False, False, True, True])
+
+
+class TestFocus(ObjectiveTestCase):
+    def test_focus_curve_cache(self):
+        key = ('test objective', 0.0, 1.0, 587.6, 10.0)
+        curve = focus.focus_curve(key)
+        self.assertIs(focus.focus_curve(key), curve)
+        # curves follow the paraxial image position and move away from the objective for closer objects
+        self.assertAlmostEqual(curve.sensor_position(10.0), paraxial.image_position(10.0, data.lens_system), delta=1e-4)
+        self.assertGreater(curve.sensor_position(0.5), curve.sensor_position(1.0))
+        # the least recently used curve is dropped first
+        max_cached_curves = focus.max_cached_curves
+        try:
+            focus.max_cached_curves = 1
+            focus.focus_curve(key + ('other',))
+            self.assertNotIn(key, focus.focus_curves)
+        finally:
+            focus.max_cached_curves = max_cached_curves
+            focus.clear_focus_curves()
+
+
+    def test_optimal_sensor_position_depends_on_aperture_shape(self):
+        loaded_shape = (data.aperture_blades, data.aperture_angle)
+        key = ('test objective', 0.0, 1.0, 587.6, 10.0)
+        try:
+            data.aperture_blades, data.aperture_angle = 6, 0.0
+            six_blades = focus.optimal_sensor_position(10.0, key)
+            data.aperture_blades = 3
+            three_blades = focus.optimal_sensor_position(10.0, key)
+            self.assertNotAlmostEqual(six_blades, three_blades, places=6)
+            self.assertAlmostEqual(three_blades, focus.optimize_sensor_position(10.0))
+        finally:
+            data.aperture_blades, data.aperture_angle = loaded_shape
+            focus.clear_focus_curves()
+
+
+class TestAnalysis(ObjectiveTestCase):
+    def test_spot_analysis_layout_chunks(self):
+        chunk_size = analysis.chunk_size
+        try:
+            analysis.chunk_size = 100
+            chunked_result = analysis.spot_analysis([0.0], [0.109], 10.0, ray_count=1000, strategy='hexapolar')[0]
+        finally:
+            analysis.chunk_size = chunk_size
+        result = analysis.spot_analysis([0.0], [0.109], 10.0, ray_count=1000, strategy='hexapolar')[0]
+        self.assertEqual(chunked_result['ray_count'], sampling.layout_size('hexapolar', 1000))
+        np.testing.assert_allclose(chunked_result['rms_radii'], result['rms_radii'])
+        self.assertRaises(ValueError, analysis.spot_analysis, [0.0], [0.109], 10.0, ray_count=0)
+
+    def test_spot_analysis_encircled_energy_range(self):
+        chunk_size = analysis.chunk_size
+        try:
+            # the first chunk of a hexapolar layout only covers the pupil center
+            analysis.chunk_size = 10
+            hexapolar_result = analysis.spot_analysis([0.1], [0.109], 10.0, ray_count=1000, strategy='hexapolar')[0]
+        finally:
+            analysis.chunk_size = chunk_size
+        result = analysis.spot_analysis([0.1], [0.109], 10.0, ray_count=1000, strategy='random')[0]
+        np.testing.assert_array_equal(hexapolar_result['radii'], result['radii'])
+        self.assertAlmostEqual(hexapolar_result['encircled_energy'][0, -1], 1.0, delta=0.02)
+
+    def test_spot_analysis_independent_of_chunk_size(self):
+        results = analysis.spot_analysis([0.0, 0.1], [0.109], 10.0, ray_count=5000)
+        chunk_size = analysis.chunk_size
+        try:
+            analysis.chunk_size = 777
+            chunked_results = analysis.spot_analysis([0.0, 0.1], [0.109], 10.0, ray_count=5000)
+        finally:
+            analysis.chunk_size = chunk_size
+        for result, chunked_result in zip(results, chunked_results):
+            self.assertEqual(result['ray_count'], 5000)
+            self.assertEqual(result['transmission'], chunked_result['transmission'])
+            np.testing.assert_allclose(result['rms_radii'], chunked_result['rms_radii'])
+            np.testing.assert_allclose(result['centroids'], chunked_result['centroids'])
+
+    def test_pupil_points_fill_aperture_polygon(self):
+        blades, angle = data.aperture_blades, data.aperture_angle
+        try:
+            for data.aperture_blades, data.aperture_angle in ((6, 0.0), (5, 33.0), (3, 10.0)):
+                # equal area samples of the disk stay equal area samples of the polygon, i.e. their centroid stays in the center
+                points = aiming.polygon_pupil_points(sampling.pupil_points('sobol', 4096), data.aperture_blades, data.aperture_angle)
+                self.assertTrue(np.all(raytracer.inside_aperture_polygon(points[:, 0], points[:, 1], 1.0 + 1e-9, data.aperture_blades, data.aperture_angle)))
+                np.testing.assert_allclose(np.mean(points, axis=0), 0.0, atol=1e-2)
+                # aimed rays of the on-axis field are not clipped by the aperture blades
+                self.assertGreater(analysis.spot_analysis([0.0], [0.109], 10.0, ray_count=4096, strategy='sobol')[0]['transmission'], 0.99)
+        finally:
+            data.aperture_blades, data.aperture_angle = blades, angle
+
+
+class TestIllumination(ObjectiveTestCase):
+    def test_vignetting_on_axis(self):
+        profile = illumination.field_profile(0.018, 10.0, 0.109, ray_count=1024)
+        # the whole stop polygon is open on axis for every aperture rotation
+        np.testing.assert_allclose(profile['vignetting'][:, 0], 1.0, atol=5e-3)
+        self.assertEqual(profile['relative_illumination'][0, 0], 1.0)
+        self.assertTrue(np.all(profile['vignetting'] <= 1.0))
+
+
+class TestDistortion(ObjectiveTestCase):
+    def test_distortion_export_is_optional(self):
+        cg = bpy.data.scenes[0].camera_generator
+        settings = (cg.prop_sensor_width, cg.prop_sensor_height, cg.prop_focus_distance, cg.prop_sensor_mainlens_distance)
+        try:
+            cg.prop_sensor_width, cg.prop_sensor_height, cg.prop_focus_distance, cg.prop_sensor_mainlens_distance = 36.0, 24.0, 1000.0, 109.0
+            with tempfile.TemporaryDirectory() as directory:
+                filepath = join(directory, 'camera.csv')
+                io.write_cam_params(filepath)
+                self.assertTrue(isfile(filepath))
+                self.assertFalse(isfile(join(directory, 'camera_distortion.csv')))
+                io.write_cam_params(filepath, export_distortion=True)
+                self.assertTrue(isfile(join(directory, 'camera_distortion.csv')))
+                # configurations which can not be traced do not stop the parameters from being saved
+                data.lens_system = None
+                io.write_cam_params(join(directory, 'untraced.csv'), export_distortion=True)
+                self.assertTrue(isfile(join(directory, 'untraced.csv')))
+                self.assertFalse(isfile(join(directory, 'untraced_distortion.csv')))
+        finally:
+            cg.prop_sensor_width, cg.prop_sensor_height, cg.prop_focus_distance, cg.prop_sensor_mainlens_distance = settings
+            distortion.clear_distortion_tables()
+
+
+class TestCalc(unittest.TestCase):
+    def test_adaptive_tessellation_deviation(self):
+        max_deviation = 1e-6
+        for half_lens_height, surface_radius in ((0.01, 0.02), (0.01, -0.05), (0.02, 0.5), (0.005, 0.0051)):
+            profile_angles, radial_steps, deviation = calc.adaptive_tessellation(half_lens_height, surface_radius, max_deviation)
+            self.assertLessEqual(deviation, max_deviation)
+            self.assertLessEqual(calc.revolved_cap_deviation(abs(surface_radius), profile_angles, radial_steps), max_deviation)
+            # a tighter bound needs more facets
+            finer_angles, finer_steps, _ = calc.adaptive_tessellation(half_lens_height, surface_radius, 0.1 * max_deviation)
+            self.assertGreater((2 * len(finer_angles) - 3) * finer_steps, (2 * len(profile_angles) - 3) * radial_steps)
+            # the face budget is never exceeded
+            self.assertLessEqual((2 * len(profile_angles) - 3) * radial_steps, 1 << 21)
+        self.assertRaises(ValueError, calc.adaptive_tessellation, 0.01, 0.02, 1e-9, max_faces=10000)
+
+
+class TestParaxial(unittest.TestCase):
+    def test_thick_lens_back_focal_length(self):
+        # biconvex thick lens with known first-order properties
+        r1, r2, t, n = 0.1, -0.1, 0.005, 1.5
+        objective = [
+            {'radius': r1, 'thickness': t, 'material': 'glass', 'ior': n, 'ior_wavelength': n, 'semi_aperture': 0.01, 'name': 'Surface_01'},
+            {'radius': r2, 'thickness': 0.1, 'material': 'air', 'ior': 1.0, 'ior_wavelength': 1.0, 'semi_aperture': 0.01, 'name': 'Surface_02'}
+        ]
+        lens_system = LensSystem(objective)
+        focal_length = 1.0 / ((n - 1.0) * (1.0 / r1 - 1.0 / r2 + (n - 1.0) * t / (n * r1 * r2)))
+        back_focal_length = focal_length * (1.0 - (n - 1.0) * t / (n * r1))
+        self.assertAlmostEqual(paraxial.image_position(np.inf, lens_system) - lens_system.vertex[-1], back_focal_length)
+        # finite distances follow the thick lens equation relative to the principal planes
+        self.assertGreater(paraxial.image_position(1.0, lens_system), paraxial.image_position(np.inf, lens_system))
+        # the rear principal plane lies one focal length in front of the rear focal point
+        properties = paraxial.first_order_properties(lens_system)
+        self.assertAlmostEqual(properties['efl'], focal_length)
+        self.assertAlmostEqual(properties['bfl'], back_focal_length)
+        self.assertAlmostEqual(properties['rear_principal_plane'], properties['rear_focal_point'] - focal_length)
+
+
+# reference construction of the uniform sphere cap with per vertex loops as used before the vectorized
+# create.uniform_sphere_cap - returns the (N, 3) vertices and the (M, 3) triangles
+def loop_sphere_cap(edgelength_target: float, sphere_radius: float, half_lens_height: float):
+    cut_length = calc.sagitta(half_lens_height, sphere_radius) - sphere_radius
+    sphere_angle = math.asin(math.sqrt(sphere_radius * sphere_radius - cut_length * cut_length) / sphere_radius)
+    ring_count = math.ceil(sphere_radius * sphere_angle / edgelength_target) + 1
+    ring_radii = [sphere_radius * math.sin(sphere_angle * i / (ring_count - 1)) for i in range(ring_count)]
+    ring_heights = [sphere_radius * math.cos(sphere_angle * i / (ring_count - 1)) for i in range(ring_count)]
+    ring_vert_counts = [max(math.ceil(2 * math.pi * radius / edgelength_target), 1) for radius in ring_radii]
+
+    vertices = [[0, 0, ring_heights[1]]]
+    for ring_idx in range(1, ring_count):
+        ring_angle = 2 * math.pi / ring_vert_counts[ring_idx]
+        for vert_idx in range(ring_vert_counts[ring_idx]):
+            vertices.append([ring_radii[ring_idx] * math.cos(vert_idx * ring_angle), ring_radii[ring_idx] * math.sin(vert_idx * ring_angle), ring_heights[ring_idx]])
+
+    triangles = []
+    for ring_idx in range(1, ring_count):
+        ring_vert_count = ring_vert_counts[ring_idx]
+        last_ring_vert_count = ring_vert_counts[ring_idx - 1]
+        ring_offset = sum(ring_vert_counts[:ring_idx])
+        last_ring_offset = sum(ring_vert_counts[:ring_idx - 1]) if ring_idx > 1 else 0
+        last_idx_1 = 0
+        for vert_idx in range(ring_vert_count):
+            active = ring_offset + vert_idx
+            next_active = ring_offset + (vert_idx + 1) % ring_vert_count
+            projected_idx = last_ring_vert_count * float(vert_idx) / ring_vert_count
+            idx_1 = math.floor(projected_idx)
+            dist = projected_idx - idx_1
+            idx_2 = last_ring_offset + (idx_1 + 1) % last_ring_vert_count
+            idx_1 = last_ring_offset + idx_1
+            if idx_1 == idx_2:
+                triangles.append([active, next_active, idx_1])
+            elif last_idx_1 == idx_1:
+                triangles.append([active, next_active, idx_2])
+            elif dist < 0.5:
+                triangles += [[active, next_active, idx_1], [next_active, idx_2, idx_1]]
+            else:
+                triangles += [[active, next_active, idx_2], [active, idx_2, idx_1]]
+            last_idx_1 = idx_1
+    return np.array(vertices), np.array(triangles)
+
+# calculates the (unnormalized) face normals of a mesh given by vertices and loops with Newell's method
+def face_normals(vertices, loop_vertices, loop_starts, loop_totals):
+    normals = []
+    for start, total in zip(loop_starts, loop_totals):
+        face = vertices[loop_vertices[start:start + total]]
+        normals.append(np.sum(np.cross(face, np.roll(face, -1, axis=0)), axis=0))
+    return np.array(normals)
+
+
+class TestCreate(unittest.TestCase):
+    def test_uniform_sphere_cap_matches_loop_construction(self):
+        for edgelength_target, sphere_radius, half_lens_height in ((0.002, 0.05, 0.02), (0.0005, 0.03, 0.012)):
+            vertices, _, triangles, _ = create.uniform_sphere_cap(edgelength_target, sphere_radius, half_lens_height)
+            loop_vertices, loop_triangles = loop_sphere_cap(edgelength_target, sphere_radius, half_lens_height)
+            self.assertEqual(vertices.shape, loop_vertices.shape)
+            self.assertEqual(triangles.shape, loop_triangles.shape)
+            np.testing.assert_allclose(vertices, loop_vertices, rtol=0.0, atol=1e-12)
+            np.testing.assert_array_equal(triangles, loop_triangles)
+
+    def test_revolved_sphere_cap(self):
+        surface_radius, steps = 0.05, 32
+        profile_angles = create.circle_profile_angles(16, surface_radius, 0.02)
+        for flip in (False, True):
+            vertices, loop_vertices, loop_starts, loop_totals = create.revolved_sphere_cap(profile_angles, steps, surface_radius, flip)
+            # one tip vertex, triangles around the tip and quads between all other profile vertices
+            self.assertEqual(len(vertices), 1 + (len(profile_angles) - 1) * steps)
+            self.assertEqual(len(loop_starts), (len(profile_angles) - 1) * steps)
+            self.assertEqual(np.count_nonzero(loop_totals == 3), steps)
+            self.assertEqual(len(loop_vertices), int(np.sum(loop_totals)))
+            np.testing.assert_allclose(np.linalg.norm(vertices, axis=1), surface_radius)
+            np.testing.assert_allclose(np.max(np.abs(vertices[:, 0])), surface_radius)
+            # normals point to +x for both orientations of the tip
+            self.assertTrue(np.all(face_normals(vertices, loop_vertices, loop_starts, loop_totals)[:, 0] > 0.0))
+
+
+class TestMeshes(unittest.TestCase):
+    def test_face_loops(self):
+        loop_vertices, loop_starts, loop_totals = create.face_loops([[0, 1, 2], [2, 1, 3]])
+        np.testing.assert_array_equal(loop_vertices, [0, 1, 2, 2, 1, 3])
+        np.testing.assert_array_equal(loop_starts, [0, 3])
+        np.testing.assert_array_equal(loop_totals, [3, 3])
+        self.assertEqual(loop_vertices.dtype, np.int32)
+
+    def test_fill_mesh(self):
+        # a quad and a triangle with per loop uv coordinates
+        vertices = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [0.0, 1.0, 0.0], [2.0, 0.0, 0.0]])
+        loop_vertices = np.array([0, 1, 2, 3, 1, 4, 2])
+        loop_uvs = np.arange(14, dtype=np.float64).reshape(7, 2) / 14.0
+        mesh = create.fill_mesh(bpy.data.meshes.new('CamGen Test Mesh'), vertices, loop_vertices, [0, 4], [4, 3], loop_uvs)
+        try:
+            self.assertEqual(len(mesh.vertices), 5)
+            self.assertEqual(len(mesh.polygons), 2)
+            self.assertEqual([list(polygon.vertices) for polygon in mesh.polygons], [[0, 1, 2, 3], [1, 4, 2]])
+            coordinates = np.zeros(15, dtype=np.float32)
+            mesh.vertices.foreach_get('co', coordinates)
+            np.testing.assert_allclose(coordinates.reshape(5, 3), vertices)
+            uvs = np.zeros(14, dtype=np.float32)
+            mesh.uv_layers['UVMap'].data.foreach_get('uv', uvs)
+            np.testing.assert_allclose(uvs.reshape(7, 2), loop_uvs, rtol=1e-6)
+            # the edges are calculated from the faces, the shared edge exists once
+            self.assertEqual(len(mesh.edges), 6)
+        finally:
+            bpy.data.meshes.remove(mesh)
+
+    def test_surface_mesh_key(self):
+        key = create.surface_mesh_key('RADIAL', 0.05, 0.02, 16, 32)
+        # lengths equal to 1nm give the same key, other parameters or methods do not
+        self.assertEqual(key, create.surface_mesh_key('RADIAL', 0.05 + 1e-12, 0.1 * 0.2, 16, 32))
+        self.assertNotEqual(key, create.surface_mesh_key('RADIAL', 0.05 + 1e-8, 0.02, 16, 32))
+        self.assertNotEqual(key, create.surface_mesh_key('RADIAL', 0.05, 0.02, 16, 33))
+        self.assertNotEqual(key, create.surface_mesh_key('ADAPTIVE', 0.05, 0.02, 16, 32))
+        self.assertTrue(key.startswith(str(create.surface_mesh_version) + ';'))
+
+    def test_surface_mesh_cache_eviction(self):
+        # run on an empty cache, the cached meshes of the scene are kept
+        cached_meshes, max_cached_meshes = create.surface_meshes.copy(), create.max_cached_surface_meshes
+        create.surface_meshes.clear()
+        create.max_cached_surface_meshes = 2
+        keys = [create.surface_mesh_key('TEST', float(i)) for i in range(3)]
+        mesh_names = []
+        try:
+            for i, key in enumerate(keys):
+                mesh = bpy.data.meshes.new('CamGen Test Surface')
+                mesh_names.append(mesh.name)
+                create.cache_surface_mesh(key, mesh, [float(i), 0.0, 0.0], 8, 1e-6)
+                self.assertTrue(mesh.use_fake_user)
+                # the least recently used mesh is evicted, i.e. the first one after the second is used again
+                if i == 1:
+                    self.assertIs(create.cached_surface_mesh(keys[0]), bpy.data.meshes[mesh_names[0]])
+            self.assertIsNone(bpy.data.meshes.get(mesh_names[1]))
+            self.assertIsNone(create.cached_surface_mesh(keys[1]))
+            mesh = create.cached_surface_mesh(keys[2])
+            self.assertEqual(mesh.name, mesh_names[2])
+            self.assertEqual(list(mesh['camgen_outer_vertex']), [2.0, 0.0, 0.0])
+            self.assertEqual(mesh['camgen_housing_vertex_count'], 8)
+            self.assertEqual(list(create.surface_meshes), [keys[0], keys[2]])
+        finally:
+            for mesh_name in mesh_names:
+                create.release_surface_mesh(mesh_name)
+            create.surface_meshes.clear()
+            create.surface_meshes.update(cached_meshes)
+            create.max_cached_surface_meshes = max_cached_meshes
+
+    def test_surface_mesh_scan(self):
+        cached_meshes, scanned = create.surface_meshes.copy(), create.surface_meshes_scanned
+        keys = [create.surface_mesh_key('TEST', float(i)) for i in range(3)]
+        meshes = [bpy.data.meshes.new('CamGen Test Surface') for _ in keys]
+        mesh_names = [mesh.name for mesh in meshes]
+        try:
+            # meshes of a loaded blend file are found by the first scan
+            meshes[0]['camgen_surface_key'] = keys[0]
+            create.reset_surface_meshes()
+            self.assertIs(create.cached_surface_mesh(keys[0]), meshes[0])
+            self.assertTrue(create.surface_meshes_scanned)
+            # later misses do not scan again, renamed mapped meshes do
+            meshes[1]['camgen_surface_key'] = keys[1]
+            self.assertIsNone(create.cached_surface_mesh(keys[1]))
+            create.surface_meshes[keys[0]] = 'CamGen Renamed Surface'
+            self.assertIs(create.cached_surface_mesh(keys[0]), meshes[0])
+            self.assertIs(create.cached_surface_mesh(keys[1]), meshes[1])
+            self.assertIsNone(create.cached_surface_mesh(keys[2]))
+        finally:
+            for mesh_name in mesh_names:
+                create.release_surface_mesh(mesh_name)
+            create.surface_meshes.clear()
+            create.surface_meshes.update(cached_meshes)
+            create.surface_meshes_scanned = scanned
+
+
+class TestHousing(ObjectiveTestCase):
+    def test_housing_profile(self):
+        outer_vertices = [[0.0, 0.0, 0.02], [0.001, 0.0, 0.021], [0.002, 0.0, 0.018]]
+        profile = create.housing_profile(outer_vertices, [0, 1, 2])
+        self.assertEqual(profile.shape, (len(outer_vertices) + 3, 3))
+        # lens rims moved to their surfaces, the housing ends on the optical axis behind the last lens
+        np.testing.assert_allclose(profile[:3, 0], np.array(outer_vertices)[:, 0] + data.lens_system.center[:3])
+        np.testing.assert_allclose(profile[-1, 1:], 0.0)
+        self.assertGreater(profile[-1, 0], profile[2, 0])
+        np.testing.assert_allclose(profile[3, 2], 1.5 * profile[2, 2])
+
+    def test_revolve_profile_to_axis(self):
+        steps = 24
+        profile = create.housing_profile([[0.0, 0.0, 0.02], [0.001, 0.0, 0.021]], [0, 1])
+        vertices, loop_vertices, loop_starts, loop_totals = create.revolve_profile(profile, steps)
+        # the vertex on the axis is kept once and closes the housing with a triangle fan
+        self.assertEqual(len(vertices), (len(profile) - 1) * steps + 1)
+        self.assertEqual(len(loop_starts), (len(profile) - 1) * steps)
+        self.assertEqual(np.count_nonzero(loop_totals == 3), steps)
+        np.testing.assert_allclose(np.hypot(vertices[:-1, 1], vertices[:-1, 2]), np.repeat(np.hypot(profile[:-1, 1], profile[:-1, 2]), steps))
+        # the profile runs along +x at positive z, i.e. the normals of the outer housing wall point to the axis
+        normals = face_normals(vertices, loop_vertices, loop_starts, loop_totals)
+        centers = np.array([np.mean(vertices[loop_vertices[start:start + total]], axis=0) for start, total in zip(loop_starts, loop_totals)])
+        wall = np.abs(normals[:, 0]) < 1e-9 * np.linalg.norm(normals, axis=1)
+        self.assertTrue(np.any(wall))
+        self.assertTrue(np.all(np.einsum('ij,ij->i', normals[wall, 1:], centers[wall, 1:]) < 0.0))
+
+
+class TestSeidel(ObjectiveTestCase):
+    def test_thin_lens_sums(self):
+        # thin lenses at the stop with the object at infinity, S1 following Welford's thin lens formula with the shape
+        # factor B and the conjugate factor C = -1, the Petzval sum is H^2 * power / n
+        n, height = 1.5, 0.01
+        for c1, c2 in ((10.0, -10.0), (20.0, 0.0), (12.5, 1.0 / 0.3)):
+            result = paraxial.seidel_coefficients_batch([0.0, c1, c2], [0.0, 1e-7, 0.1], [1.0, n, 1.0], np.zeros(3), 0.0, 0,
+                                                        height, 0.05)
+            power = (n - 1.0) * (c1 - c2)
+            shape = (c1 + c2) / (c1 - c2)
+            s1 = height ** 4 * power ** 3 / 4.0 * ((n / (n - 1.0)) ** 2 + (n + 2.0) / (n * (n - 1.0) ** 2) * (shape - 2.0 * (n * n - 1.0) / (n + 2.0)) ** 2 - n / (n + 2.0))
+            self.assertAlmostEqual(result['S1'] / s1, 1.0, places=5)
+            self.assertAlmostEqual(result['S4'] / (result['lagrange_invariant'] ** 2 * power / n), 1.0, places=9)
+
+    def test_stop_at_center_of_curvature(self):
+        # the chief ray passes the center of curvature undeviated, i.e. the surface adds no coma and astigmatism
+        result = paraxial.seidel_coefficients_batch([0.0, -1.0 / 0.05], [0.05, 0.1], [1.0, 1.5], np.zeros(2), 0.0, 0, 0.01, 0.1)
+        self.assertAlmostEqual(result['S2'], 0.0, places=15)
+        self.assertAlmostEqual(result['S3'], 0.0, places=15)
+        self.assertGreater(abs(result['S1']), 0.0)
+
+    def test_batch_matches_single_lens_system(self):
+        lens_system = data.lens_system
+        line_iors = lens_system.with_wavelengths(paraxial.seidel_wavelengths[1:]).ior
+        # the loaded objective and a variant with longer air gaps evaluated in one batch
+        thickness = np.stack((lens_system.thickness, lens_system.thickness * np.where(np.array(lens_system.materials) == 'air', 1.1, 1.0)))
+        batch = paraxial.seidel_coefficients_batch(lens_system.curvature, thickness, lens_system.ior[0], line_iors[0] - line_iors[1],
+                                                   lens_system.vertex[0], lens_system.aperture_index, data.semi_aperture, 0.1, 10.0)
+        single = paraxial.seidel_coefficients(0.1, 10.0)
+        variant = paraxial.seidel_coefficients_batch(lens_system.curvature, thickness[1], lens_system.ior[0], line_iors[0] - line_iors[1],
+                                                     lens_system.vertex[0], lens_system.aperture_index, data.semi_aperture, 0.1, 10.0)
+        for name in ('S1', 'S2', 'S3', 'S4', 'S5', 'CL', 'CT', 'lagrange_invariant', 'S1_surfaces'):
+            np.testing.assert_allclose(batch[name][0], single[name], rtol=1e-12, atol=1e-18)
+            np.testing.assert_allclose(batch[name][1], variant[name], rtol=1e-12, atol=1e-18)
+
+
+class TestCatalog(unittest.TestCase):
+    def test_parse_query(self):
+        self.assertEqual(catalog.parse_query("EFL 45-55, F<2, FOV>40"), {'efl': (45.0, 55.0), 'f_number': (None, 2.0), 'paraxial_fov': (40.0, None)})
+        self.assertEqual(catalog.parse_query("focal_length 50mm to 85 mm,f-number>=1.4"), {'efl': (50.0, 85.0), 'f_number': (1.4, None)})
+        self.assertEqual(catalog.parse_query("#surfaces = 6, fov <= 60deg,"), {'surface_count': (6.0, 6.0), 'paraxial_fov': (None, 60.0)})
+        self.assertEqual(catalog.parse_query(""), {})
+        self.assertRaises(ValueError, catalog.parse_query, "EFL about 50")
+        self.assertRaises(ValueError, catalog.parse_query, "weight<2")
+
+    def test_query_lenses(self):
+        lens_files = ['D-Gauss F1.4 45deg_Mandler USP2975673 p351.csv', 'D-Gauss6 F1.25 12.4deg_Werfeli USP2771006 p304.csv']
+        with tempfile.TemporaryDirectory() as directory:
+            lens_directory = join(directory, 'Lenses')
+            mkdir(lens_directory)
+            for lens_file in lens_files:
+                shutil.copy(join(data.lens_directory, lens_file), lens_directory)
+            try:
+                # the stored index neither computes entries nor writes the index file
+                self.assertEqual(catalog.stored_lens_index(lens_directory), {})
+                self.assertFalse(isfile(lens_directory + catalog.index_file_suffix))
+                self.assertEqual(catalog.query_lenses("EFL 90-110", lens_directory), sorted(lens_files))
+                self.assertEqual(catalog.query_lenses("F<1.35", lens_directory), [lens_files[1]])
+                self.assertEqual(catalog.query_lenses({'surface_count': (13, None)}, lens_directory), [lens_files[0]])
+                # queries of a new session are answered from the stored index file
+                self.assertTrue(isfile(lens_directory + catalog.index_file_suffix))
+                catalog.clear_lens_index(lens_directory)
+                self.assertEqual(catalog.stored_lens_index(lens_directory), catalog.lens_index(lens_directory))
+                self.assertEqual(catalog.query_lenses("F<1.35", lens_directory), [lens_files[1]])
+                self.assertEqual(catalog.query_lenses("FOV>1", lens_directory), catalog.query_lenses({'paraxial_fov': (1.0, None)}, lens_directory))
+            finally:
+                catalog.clear_lens_index(lens_directory)
+
+
+class TestIO(unittest.TestCase):
+    def test_binary_cache_invalidation(self):
+        parsed = []
+        # parser counting its calls, returning the numbers of the file
+        def parser(filepath):
+            parsed.append(filepath)
+            return {'values': np.loadtxt(filepath, delimiter=';', ndmin=1)}
+
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = join(directory, 'values.csv')
+            with open(filepath, 'w') as csvfile:
+                csvfile.write('1.0;2.0\n')
+            try:
+                np.testing.assert_array_equal(io.cached_arrays(filepath, 'test', parser)['values'], [1.0, 2.0])
+                self.assertEqual(len(parsed), 1)
+                self.assertTrue(isfile(io.binary_cache_path(filepath, 'test')))
+                # served from memory, then from the binary cache
+                io.cached_arrays(filepath, 'test', parser)
+                io.clear_parsed_files()
+                np.testing.assert_array_equal(io.cached_arrays(filepath, 'test', parser)['values'], [1.0, 2.0])
+                self.assertEqual(len(parsed), 1)
+                # a modified file is parsed again, also if only its modification time changed
+                with open(filepath, 'w') as csvfile:
+                    csvfile.write('3.0;4.0\n')
+                mtime = stat(filepath).st_mtime
+                utime(filepath, (mtime + 10.0, mtime + 10.0))
+                np.testing.assert_array_equal(io.cached_arrays(filepath, 'test', parser)['values'], [3.0, 4.0])
+                self.assertEqual(len(parsed), 2)
+                utime(filepath, (mtime + 20.0, mtime + 20.0))
+                io.clear_parsed_files()
+                io.cached_arrays(filepath, 'test', parser)
+                self.assertEqual(len(parsed), 3)
+            finally:
+                io.clear_parsed_files()
+
+
+class TestData(unittest.TestCase):
+    def test_lazy_dispersion_data(self):
+        data.init()
+        self.assertNotIn('sellmeier_data', vars(data))
+        self.assertNotIn('cauchy_data', vars(data))
+        # the first access reads the material file and keeps the result as module attribute
+        sellmeier_data = data.sellmeier_data
+        self.assertGreater(len(sellmeier_data), 0)
+        self.assertIs(vars(data)['sellmeier_data'], sellmeier_data)
+        self.assertIs(data.sellmeier_data, sellmeier_data)
+        self.assertNotIn('cauchy_data', vars(data))
+        self.assertRaises(AttributeError, getattr, data, 'unknown_data')
+        self.assertFalse(hasattr(data, 'unknown_data'))
+
+    def test_lazy_import(self):
+        self.assertIs(startup.lazy_import('calc'), calc)
+        self.assertIs(startup.lazy_import('paraxial'), startup.lazy_import('paraxial'))
+
+
+class TestSampling(unittest.TestCase):
+    def test_pupil_points(self):
+        for strategy in sampling.strategies:
+            points = sampling.pupil_points(strategy, 500, 7)
+            # seeded strategies are deterministic and all points lie on the unit disk
+            np.testing.assert_array_equal(points, sampling.pupil_points(strategy, 500, 7))
+            self.assertTrue(np.all(np.einsum('ni,ni->n', points, points) <= 1.0 + 1e-12))
+        # progressive strategies extend previous sample sets
+        for strategy in sampling.progressive_strategies:
+            extended = np.concatenate((sampling.pupil_points(strategy, 200, 7), sampling.pupil_points(strategy, 300, 7, 200)))
+            np.testing.assert_array_equal(extended, sampling.pupil_points(strategy, 500, 7))
+        # layouts can be generated in parts
+        for strategy in sampling.layout_strategies:
+            layout = sampling.pupil_points(strategy, 1000, 7)
+            self.assertEqual(len(layout), sampling.layout_size(strategy, 1000))
+            parts = [sampling.pupil_points(strategy, 97, 7, offset, 1000) for offset in range(0, len(layout), 97)]
+            np.testing.assert_array_equal(np.concatenate(parts), layout)
+
+
+# refractive index of the Zemax dispersion formulas written out term by term - wavelength in um
+def agf_formula_ior(formula: int, c, w: float) -> float:
+    w2 = w * w
+    if formula == 1:
+        n2 = c[0] + c[1] * w2 + c[2] / w2 + c[3] / w2 ** 2 + c[4] / w2 ** 3 + c[5] / w2 ** 4
+    elif formula in (2, 6, 11):
+        terms = {2: 3, 6: 4, 11: 5}[formula]
+        n2 = 1.0 + sum(c[2 * i] * w2 / (w2 - c[2 * i + 1]) for i in range(terms))
+    elif formula == 9:
+        n2 = c[0] + c[1] * w2 / (w2 - c[2]) + c[3] * w2 / (w2 - c[4])
+    elif formula == 10:
+        n2 = c[0] + c[1] * w2 + sum(c[i + 1] / w2 ** i for i in range(1, 7))
+    elif formula == 12:
+        n2 = c[0] + c[1] * w2 + sum(c[i + 1] / w2 ** i for i in range(1, 5)) + c[6] * w2 ** 2 + c[7] * w2 ** 3
+    else:
+        n2 = c[0] + c[1] * w2 + c[2] * w2 ** 2 + sum(c[i + 2] / w2 ** i for i in range(1, 7))
+    return math.sqrt(n2)
+
+# refractive index of the bundled Sellmeier data
+def sellmeier_ior(material_name: str, wavelength: float) -> float:
+    B1, B2, B3, C1, C2, C3, _ior = data.sellmeier_data[material_name]
+    w2 = wavelength * wavelength
+    return math.sqrt(1.0 + B1 * w2 / (w2 - C1) + B2 * w2 / (w2 - C2) + B3 * w2 / (w2 - C3))
+
+# refractive index of the bundled Cauchy data
+def cauchy_ior(material_name: str, wavelength: float) -> float:
+    C1, C2, C3, C4, C5, C6, _ior = data.cauchy_data[material_name]
+    w2 = wavelength * wavelength
+    return math.sqrt(C1 + C2 * w2 + C3 / w2 + C4 / w2 ** 2 + C5 / w2 ** 3 + C6 / w2 ** 4)
+
+# writes a Zemax glass catalog with the given (name, formula, coefficients) glasses
+def write_agf(filepath: str, glasses, encoding: str = 'latin-1'):
+    lines = ['CC test catalog']
+    for name, formula, coefficients in glasses:
+        lines.append('NM ' + name + ' ' + str(formula) + ' 0 1.5 60.0 0 0')
+        lines.append('CD ' + ' '.join(repr(coefficient) for coefficient in coefficients))
+    with open(filepath, 'w', encoding=encoding) as agf_file:
+        agf_file.write('\n'.join(lines) + '\n')
+
+
+class TestGlass(unittest.TestCase):
+    def setUp(self):
+        self.catalog = glass.glass_catalog
+
+    def tearDown(self):
+        glass.glass_catalog = self.catalog
+
+    def test_parse_glass_catalog(self):
+        glasses = [('N-TEST1', 2, [1.03961212, 0.00600069867, 0.231792344, 0.0200179144, 1.01046945, 103.560653]),
+                   ('TEST2', 1, [2.27187, -0.008333884, 0.0119425, 0.0001494434, 8.303797e-6, -2.694974e-7])]
+        with tempfile.TemporaryDirectory() as directory:
+            for encoding in ('latin-1', 'utf-16'):
+                filepath = join(directory, encoding + '.agf')
+                write_agf(filepath, glasses, encoding)
+                rows = io.parse_glass_catalog(filepath)
+                self.assertEqual(rows['name'].tolist(), ['N-TEST1', 'TEST2'])
+                self.assertEqual(rows['formula'].tolist(), [2, 1])
+                # coefficients are padded to 10 values per glass
+                self.assertEqual(rows['coefficients'].shape, (2, 10))
+                np.testing.assert_array_equal(rows['coefficients'][0, :6], glasses[0][2])
+                np.testing.assert_array_equal(rows['coefficients'][1, 6:], 0.0)
+
+    def test_agf_formulas(self):
+        wavelengths = [0.4, glass.d_line, 0.7, 1.0]
+        coefficients = {
+            1: [2.27, -0.0083, 0.0119, 1.5e-4, 8.3e-6, -2.7e-7],
+            2: [1.04, 0.006, 0.23, 0.02, 1.01, 103.6],
+            6: [1.04, 0.006, 0.23, 0.02, 1.01, 103.6, 0.01, 0.03],
+            9: [1.2, 1.1, 0.01, 0.5, 100.0],
+            10: [2.27, -0.0083, 0.0119, 1.5e-4, 8.3e-6, -2.7e-7, 1e-8, -1e-9],
+            11: [1.04, 0.006, 0.23, 0.02, 1.01, 103.6, 0.01, 0.03, 0.005, 0.05],
+            12: [2.27, -0.0083, 0.0119, 1.5e-4, 8.3e-6, -2.7e-7, 1e-4, -1e-5],
+            13: [2.27, -0.0083, 1e-4, 0.0119, 1.5e-4, 8.3e-6, -2.7e-7, 1e-8, -1e-9]
+        }
+        self.assertEqual(set(coefficients), set(glass.agf_formulas))
+        for formula, values in coefficients.items():
+            columns = glass.agf_columns(formula, values)
+            iors = glass.evaluate(*[np.array([column]) for column in columns], wavelengths)[0]
+            for ior, wavelength in zip(iors, wavelengths):
+                self.assertAlmostEqual(ior, agf_formula_ior(formula, values, wavelength), places=12)
+        # unsupported formulas, e.g. Herzberger
+        self.assertIsNone(glass.agf_columns(3, [1.0] * 6))
+
+    def test_build_catalog(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write_agf(join(directory, 'vendor.agf'), [('N-TEST1', 2, [1.2, 0.01, 0.2, 0.02, 1.0, 100.0]),
+                                                      ('BK7', 2, [1.5, 0.01, 0.2, 0.02, 1.0, 100.0]),
+                                                      ('HERZ', 3, [1.0] * 6)])
+            with open(join(directory, 'aliases.csv'), 'w') as alias_file:
+                alias_file.write('MY GLASS,N-TEST1\nLOST,UNKNOWN\n')
+            glass.glass_catalog = glass.build_catalog(directory)
+        table = glass.glass_catalog
+        row = glass.glass_row('N-TEST1')
+        self.assertGreaterEqual(row, 0)
+        # unsupported formulas are skipped, the bundled data takes precedence over vendor catalogs
+        self.assertNotIn('HERZ', table['names'].tolist())
+        self.assertAlmostEqual(calc.ior('BK7', 0.5), sellmeier_ior('BK7', 0.5))
+        # normalized names, aliases and names without vendor prefix
+        self.assertEqual(glass.glass_row('n-test 1'), row)
+        self.assertEqual(glass.glass_row('my-glass'), row)
+        self.assertEqual(glass.glass_row('TEST1'), row)
+        self.assertEqual(glass.glass_row('LOST'), -1)
+        self.assertAlmostEqual(table['nd'][row], agf_formula_ior(2, [1.2, 0.01, 0.2, 0.02, 1.0, 100.0], glass.d_line))
+        # air is not looked up in the catalog, unknown names without nd and vd stay unknown
+        iors = calc.ior_table(['air', 'Air', 'MY GLASS', 'unknown glass'], [0.5, 0.6])
+        np.testing.assert_array_equal(iors[:2], 1.0)
+        np.testing.assert_allclose(iors[2], [agf_formula_ior(2, [1.2, 0.01, 0.2, 0.02, 1.0, 100.0], w) for w in (0.5, 0.6)])
+        self.assertTrue(np.all(np.isnan(iors[3])))
+
+    def test_ior_table_matches_dispersion_data(self):
+        wavelengths = [0.4, 0.4861327, 0.5875618, 0.6562725, 0.8]
+        # the Sellmeier data precedes the Cauchy data for equal names
+        cauchy_names = [name for name in data.cauchy_data if name not in data.sellmeier_data]
+        names = list(data.sellmeier_data) + cauchy_names
+        iors = calc.ior_table(names, wavelengths)
+        expected = [[sellmeier_ior(name, w) for w in wavelengths] for name in data.sellmeier_data]
+        expected += [[cauchy_ior(name, w) for w in wavelengths] for name in cauchy_names]
+        np.testing.assert_allclose(iors, expected, rtol=1e-12)
+
+    def test_nearest_match_reproduces_nd_and_vd(self):
+        iors = calc.ior_table(['unknown glass'], [glass.d_line, glass.f_line, glass.c_line], [1.7], [30.0])[0]
+        self.assertAlmostEqual(iors[0], 1.7)
+        self.assertAlmostEqual((iors[0] - 1.0) / (iors[1] - iors[2]), 30.0)
+        # without nd and vd unknown glasses stay unknown
+        self.assertTrue(np.isnan(calc.ior_table(['unknown glass'], [0.5])[0, 0]))
+
+    def test_normalized_names(self):
+        self.assertEqual(glass.glass_row('bk-7'), glass.glass_row('BK7'))
+        self.assertAlmostEqual(calc.ior('bk7', 0.5), calc.ior('BK7', 0.5))
+
+
 def test_main():
     import os
     path = os.path.dirname(__file__)
     sys.path.append(path)
 
     test_cases = [
-        TestCameraGenerator
+        TestCameraGenerator,
+        TestRaytracer,
+        TestFocus,
+        TestAnalysis,
+        TestIllumination,
+        TestDistortion,
+        TestCalc,
+        TestParaxial,
+        TestSeidel,
+        TestSampling,
+        TestCreate,
+        TestMeshes,
+        TestHousing,
+        TestCatalog,
+        TestIO,
+        TestData,
+        TestGlass
     ]
 
     suite = unittest.TestSuite()
@@ -5,23 +5,30 @@ import mathutils
 from os import listdir
 from os.path import isfile, join
 
-from . raytracer import sensor_position_for_distance
+from bpy.app.handlers import persistent
 
-from . import calc
-from . import create
 from . import data
+from . startup import lazy_import, loaded_module
+
+# modules depending on NumPy are loaded on first use to keep the addon registration fast
+calc = lazy_import('calc')
+catalog = lazy_import('catalog')
+create = lazy_import('create')
+focus = lazy_import('focus')
 
 # ------------------------------------------------------------------------
 #    Helper functions
 # ------------------------------------------------------------------------
 
 # scans the lens folder for csv files containing lens data. The files are then listed in the objective list selector.
+# focal lengths and F-numbers are only taken from the stored lens index, which is built by refresh_lens_index
 def find_items(self, context):
     # check if list was already created
     if (not data.objective_list_created):
         # get all files in the lenses dir
         lensfiles = [f for f in listdir(data.lens_directory) if isfile(join(data.lens_directory, f))]
         lensfiles.sort()
+        lens_index = catalog.stored_lens_index(data.lens_directory)
         result = ()
         counter = 0
         for lensfile in lensfiles:
@@ -30,13 +37,30 @@ def find_items(self, context):
             if file_ending == "csv":
                 # find "_" which separates lens name and author/company name
                 separator = lensfile.find("_")
-                # add objective entry to list
-                result = result + (('OBJECTIVE_'+str(counter),lensfile[:separator],lensfile),)
+                # add objective entry to list - the name shows the focal length and F-number from the lens catalog
+                name = lensfile[:separator]
+                if lensfile in lens_index:
+                    name += " (f = %.0f mm, F/%.1f)" % (lens_index[lensfile]['efl'], lens_index[lensfile]['f_number'])
+                result = result + (('OBJECTIVE_'+str(counter),name,lensfile),)
                 counter = counter + 1
         data.objective_list_created = True
         data.objective_list = result
     return data.objective_list
 
+# computes the lens index entries of new or modified lens files, writes the index file and lists the objectives again
+def refresh_lens_index():
+    catalog.clear_lens_index(data.lens_directory)
+    catalog.lens_index(data.lens_directory)
+    data.objective_list_created = False
+
+# forgets the cached lens surface meshes of the previous blend file after loading another one - the meshes of the
+# loaded file are found by the next lookup
+@persistent
+def load_post(*args):
+    create_module = loaded_module('create')
+    if create_module is not None:
+        create_module.reset_surface_meshes()
+
 # ------------------------------------------------------------------------
 #    Update functions
 # ------------------------------------------------------------------------
@@ -99,6 +123,7 @@ def sensor_mainlens_distance(self, context):
         bpy.data.objects['MLA'].location[0] = cg.prop_sensor_mainlens_distance / 1000.0 - cg.prop_mla_sensor_dist / 1000.0
 
 def aperture_blades(self, context):
+    data.aperture_blades = bpy.data.scenes[0].camera_generator.prop_aperture_blades
     if 'Aperture Plane' in bpy.data.objects:
         create.aperture()
 
@@ -110,6 +135,7 @@ def aperture_size(self, context):
         data.semi_aperture = cg.prop_aperture_size / 2000.0
 
 def aperture_angle(self, context):
+    data.aperture_angle = bpy.data.scenes[0].camera_generator.prop_aperture_angle
     if 'Opening' in bpy.data.objects:
         bpy.data.objects['Opening'].rotation_euler[0] = bpy.data.scenes[0].camera_generator.prop_aperture_angle/180.0*math.pi
 
@@ -121,36 +147,20 @@ def wavelength(self,context):
         return
 
     # check whether objective is available
-    if len(data.objective) == 0:
+    if data.lens_system is None:
         return
     else:
         wavelength_um = bpy.data.scenes[0].camera_generator.prop_wavelength/1000.0
-        iors = []
-        for lens in data.objective:
-            if lens['material'] == 'air' or lens['material'] == 'Air':
-                iors.append(1.0)
-            else:
-                new_ior = calc.ior(lens['material'], wavelength_um)
-                if new_ior == None:
-                    iors.clear()
-                    break
-                else:
-                    iors.append(new_ior)
-        
-        if len(iors) > 0:
-            counter = 0
-            for lens in data.objective:
-                lens['ior_wavelength'] = iors[counter]
-                counter = counter + 1
+        # recompile the lens system for the new wavelength and update the objective's IORs accordingly
+        data.lens_system = data.lens_system.with_wavelengths([wavelength_um])
+        for lens, ior, ior_ratio in zip(data.objective, data.lens_system.ior[0], data.lens_system.ior_ratio[0]):
+            lens['ior_wavelength'] = float(ior)
+            lens['ior_ratio'] = float(ior_ratio)
 
-            for i in range(len(data.objective)-1, 0, -1):
-                data.objective[i]['ior_ratio'] = data.objective[i-1]['ior_wavelength']/data.objective[i]['ior_wavelength']
-            data.objective[0]['ior_ratio'] = 1.0/data.objective[0]['ior_wavelength']
-
-            for lens in data.objective:
-                for object in bpy.data.objects:
-                    if object.name == lens['name']:
-                        bpy.data.materials[object.material_slots[0].name].node_tree.nodes['IOR'].outputs[0].default_value = lens['ior_ratio']
+        for lens in data.objective:
+            for object in bpy.data.objects:
+                if object.name == lens['name']:
+                    bpy.data.materials[object.material_slots[0].name].node_tree.nodes['IOR'].outputs[0].default_value = lens['ior_ratio']
 
 def fresnel_reflection_enabled(self,context):
     # check whether objective is available
@@ -279,8 +289,13 @@ def mla_type(self, context):
 def focus_distance(self, context):
     if 'MLA' in bpy.data.objects:
         cg = bpy.data.scenes[0].camera_generator
-        # calculate the new sensor distance
-        sensor_position = sensor_position_for_distance(cg.prop_focus_distance / 100.0)
+        # calculate the new sensor distance from the cached results for the current configuration
+        key = focus.focus_curve_key(data.objective_file, cg.prop_objective_scale, cg.prop_wavelength, cg.prop_aperture_size)
+        if cg.prop_focus_mode == 'CURVE':
+            sensor_position = focus.sensor_position_for_distance(cg.prop_focus_distance / 100.0, key)
+        else:
+            # pixel size is given in mm
+            sensor_position = focus.optimal_sensor_position(cg.prop_focus_distance / 100.0, key, cg.prop_focus_mode, cg.prop_pixel_size / 2000.0)
         if sensor_position != -1.0:
             cg.prop_sensor_mainlens_distance = sensor_position * 1000.0
             sensor_mainlens_distance(self, context)
@@ -289,4 +304,7 @@ def focus_distance(self, context):
             calibration_pattern = bpy.data.objects['Calibration Pattern']
             translation = mathutils.Vector((-bpy.data.scenes[0].camera_generator.prop_focus_distance / 100.0, 0.0, 0.0))
             translation.rotate(calibration_pattern.rotation_euler) 
-            calibration_pattern.location = translation
\ No newline at end of file
+            calibration_pattern.location = translation
+
+def focus_mode(self, context):
+    focus_distance(self, context)